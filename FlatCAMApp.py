@@ -37,6 +37,8 @@ from FlatCAMObj import *
 from PlotCanvas import *
 from FlatCAMGUI import *
 from FlatCAMCommon import LoudDict
+from FlatCAMCache import ParseCache
+from FlatCAMProjectFile import ProjectWriter, ProjectReader, is_binary_project, split_attrs, decode_json
 from FlatCAMPostProc import load_postprocessors
 from FlatCAMEditor import FlatCAMGeoEditor, FlatCAMExcEditor
 from FlatCAMProcess import *
@@ -386,6 +388,7 @@ class App(QtCore.QObject):
             "geometry_extracut": self.geometry_defaults_form.geometry_group.extracut_cb,
             "geometry_circle_steps": self.geometry_defaults_form.geometry_group.circle_steps_entry,
             "cncjob_plot": self.cncjob_defaults_form.cncjob_group.plot_cb,
+            "cncjob_plot_exact": self.cncjob_defaults_form.cncjob_group.plot_exact_cb,
             "cncjob_tooldia": self.cncjob_defaults_form.cncjob_group.tooldia_entry,
             "cncjob_coords_decimals": self.cncjob_defaults_form.cncjob_group.coords_dec_entry,
             "cncjob_fr_decimals": self.cncjob_defaults_form.cncjob_group.fr_dec_entry,
@@ -507,6 +510,7 @@ class App(QtCore.QObject):
             "geometry_circle_steps": 64,
 
             "cncjob_plot": True,
+            "cncjob_plot_exact": False,
             "cncjob_tooldia": 0.0393701,
             "cncjob_coords_decimals": 4,
             "cncjob_fr_decimals": 2,
@@ -541,7 +545,11 @@ class App(QtCore.QObject):
             "zoom_ratio": 1.5,
             "global_point_clipboard_format": "(%.4f, %.4f)",
             "global_zdownrate": None,
-            "gerber_use_buffer_for_union": True
+            "gerber_use_buffer_for_union": True,
+            "global_parse_cache": True,                # Cache parsed Gerber, Excellon and G-code files.
+            "global_parse_cache_size": 200,            # Max. size of the parse cache in MB.
+            "global_project_compression": "zlib",      # none, zlib or zstd for binary (*.FlatPrjb) projects.
+            "global_project_lazy_load": True           # Load the geometry of project objects on first use.
         })
 
         ###############################
@@ -557,6 +565,9 @@ class App(QtCore.QObject):
         self.propagate_defaults(silent=True)
         self.restore_main_win_geom()
 
+        # Results of parsing files, see open_gerber(), open_excellon() and open_gcode()
+        self.parse_cache = ParseCache(os.path.join(self.data_path, 'cache'), App.version)
+
         def auto_save_defaults():
             try:
                 self.save_defaults(silent=True)
@@ -1363,6 +1374,10 @@ class App(QtCore.QObject):
             if edited_object.multigeo is True:
                 self.inform.emit("[warning_notcl]Editing a MultiGeo Geometry is not possible for the moment.")
                 return
+            # the editor works on the stored geometry only, not on the copies of a panel
+            if edited_object.instances:
+                self.inform.emit("[warning_notcl]Editing an instanced panel is not possible for the moment.")
+                return
             self.ui.update_obj_btn.setEnabled(True)
             self.geo_editor.edit_fcgeometry(edited_object)
             self.ui.g_editor_cmenu.setEnabled(True)
@@ -1424,6 +1439,7 @@ class App(QtCore.QObject):
                 edited_obj.options['ymin'] = ymin
                 edited_obj.options['xmax'] = xmax
                 edited_obj.options['ymax'] = ymax
+                self.collection.spatial_index.update(edited_obj)
             except AttributeError:
                 self.inform.emit("[warning] Object empty after edit.")
 
@@ -1919,15 +1935,18 @@ class App(QtCore.QObject):
             self.log.debug("%f seconds converting units." % (t3 - t2))
 
         # Create the bounding box for the object and then add the results to the obj.options
-        try:
-            xmin, ymin, xmax, ymax = obj.bounds()
-            obj.options['xmin'] = xmin
-            obj.options['ymin'] = ymin
-            obj.options['xmax'] = xmax
-            obj.options['ymax'] = ymax
-        except:
-            log.warning("The object has no bounds properties.")
-            pass
+        # Objects opened lazily from a project keep the saved bounds, computing
+        # them here would load their geometry.
+        if obj.lazy_loader is None or 'xmin' not in obj.options:
+            try:
+                xmin, ymin, xmax, ymax = obj.bounds()
+                obj.options['xmin'] = xmin
+                obj.options['ymin'] = ymin
+                obj.options['xmax'] = xmax
+                obj.options['ymax'] = ymax
+            except:
+                log.warning("The object has no bounds properties.")
+                pass
 
         FlatCAMApp.App.log.debug("Moving new object back to main thread.")
 
@@ -1987,6 +2006,7 @@ class App(QtCore.QObject):
         obj.options['ymin'] = ymin
         obj.options['xmax'] = xmax
         obj.options['ymax'] = ymax
+        self.collection.spatial_index.update(obj)
 
         log.debug("Object changed, updating the bounding box data on self.options")
         # delete the old selection shape
@@ -3804,45 +3824,31 @@ class App(QtCore.QObject):
         :param sel_type: if True it's a left to right selection (enclosure), if False it's a 'touch' selection
         :return:
         """
-        poly_selection = Polygon([start_pos, (end_pos[0], start_pos[1]), end_pos, (start_pos[0], end_pos[1])])
+        bounds = (min(start_pos[0], end_pos[0]), min(start_pos[1], end_pos[1]),
+                  max(start_pos[0], end_pos[0]), max(start_pos[1], end_pos[1]))
 
         self.delete_selection_shape()
-        for obj in self.collection.get_list():
-            try:
-                # select the object(s) only if it is enabled (plotted)
-                if obj.options['plot']:
-                    poly_obj = Polygon([(obj.options['xmin'], obj.options['ymin']), (obj.options['xmax'], obj.options['ymin']),
-                                        (obj.options['xmax'], obj.options['ymax']), (obj.options['xmin'], obj.options['ymax'])])
-                    if sel_type is True:
-                        if poly_obj.within(poly_selection):
-                            # create the selection box around the selected object
-                            self.draw_selection_shape(obj)
-                            self.collection.set_active(obj.options['name'])
-                    else:
-                        if poly_selection.intersects(poly_obj):
-                            # create the selection box around the selected object
-                            self.draw_selection_shape(obj)
-                            self.collection.set_active(obj.options['name'])
-            except:
-                # the Exception here will happen if we try to select on screen and we have an newly (and empty)
-                # just created Geometry or Excellon object that do not have the xmin, xmax, ymin, ymax options.
-                # In this case poly_obj creation (see above) will fail
-                pass
+        for obj in self.collection.spatial_index.in_area(bounds, enclosed=sel_type is True):
+            # select the object(s) only if it is enabled (plotted)
+            if obj.options['plot']:
+                # create the selection box around the selected object
+                self.draw_selection_shape(obj)
+                self.collection.set_active(obj.options['name'])
 
     def select_objects(self, key=None):
         # list where we store the overlapped objects under our mouse left click position
         objects_under_the_click_list = []
 
-        # Populate the list with the overlapped objects on the click position
+        # Populate the list with the objects which geometry is under the click position,
+        # within a few pixels for thin lines
         curr_x, curr_y = self.pos
-        for obj in self.all_objects_list:
-            if (curr_x >= obj.options['xmin']) and (curr_x <= obj.options['xmax']) and \
-                    (curr_y >= obj.options['ymin']) and (curr_y <= obj.options['ymax']):
-                if obj.options['name'] not in objects_under_the_click_list:
-                    if obj.options['plot']:
-                        # add objects to the objects_under_the_click list only if the object is plotted
-                        # (active and not disabled)
-                        objects_under_the_click_list.append(obj.options['name'])
+        tolerance = 3 * self.plotcanvas.pixel_size()
+        for obj in self.collection.spatial_index.at(curr_x, curr_y, tolerance):
+            if obj.options['name'] not in objects_under_the_click_list:
+                if obj.options['plot']:
+                    # add objects to the objects_under_the_click list only if the object is plotted
+                    # (active and not disabled)
+                    objects_under_the_click_list.append(obj.options['name'])
         try:
             # If there is no element in the overlapped objects list then make everyone inactive
             # because we selected "nothing"
@@ -4165,7 +4171,7 @@ class App(QtCore.QObject):
 
         self.report_usage("on_file_openproject")
         App.log.debug("on_file_openproject()")
-        _filter_ = "FlatCAM Project (*.FlatPrj);;All Files (*.*)"
+        _filter_ = "FlatCAM Project (*.FlatPrj *.FlatPrjb);;All Files (*.*)"
         try:
             filename, _ = QtWidgets.QFileDialog.getOpenFileName(caption="Open Project",
                                                          directory=self.get_last_folder(), filter=_filter_)
@@ -4482,7 +4488,7 @@ class App(QtCore.QObject):
 
         self.report_usage("on_file_saveprojectas")
 
-        filter = "FlatCAM Project (*.FlatPrj);; All Files (*.*)"
+        filter = "FlatCAM Project (*.FlatPrj);; FlatCAM Binary Project (*.FlatPrjb);; All Files (*.*)"
         try:
             filename, _ = QtWidgets.QFileDialog.getSaveFileName(caption="Save Project As ...",
                                                          directory=self.get_last_save_folder(), filter=filter)
@@ -5075,6 +5081,31 @@ class App(QtCore.QObject):
             self.inform.emit("[success] Opened: " + filename)
             self.progress.emit(100)
 
+    def parse_cache_key(self, filename, **options):
+        """
+        Key of the parse cache entry for a file parsed with the given
+        options, or None if the cache is disabled.
+
+        :param filename: File to be parsed.
+        :param options: Anything that changes the result of parsing.
+        :return: Key or None
+        """
+        if not self.defaults["global_parse_cache"]:
+            return None
+        return self.parse_cache.make_key(filename, **options)
+
+    def parse_cache_store(self, key, obj):
+        """
+        Stores a freshly parsed object in the parse cache. Only the
+        attributes that come from the file are stored, not the options.
+
+        :param key: Key from parse_cache_key().
+        :param obj: Parsed object.
+        :return: None
+        """
+        self.parse_cache.max_size = int(self.defaults["global_parse_cache_size"] * 1024 * 1024)
+        self.parse_cache.store(key, obj, [attr for attr in obj.ser_attrs if attr not in ('options', 'kind')])
+
     def open_gerber(self, filename, follow=False, outname=None):
         """
         Opens a Gerber file, parses it and creates a new object for
@@ -5098,6 +5129,13 @@ class App(QtCore.QObject):
 
             # Opening the file happens here
             self.progress.emit(30)
+            cache_key = self.parse_cache_key(filename, kind="gerber", follow=follow, units=gerber_obj.units,
+                                             steps_per_circle=gerber_obj.steps_per_circle,
+                                             use_buffer_for_union=gerber_obj.use_buffer_for_union)
+            if self.parse_cache.load(cache_key, gerber_obj):
+                self.progress.emit(70)
+                return
+
             try:
                 gerber_obj.parse_file(filename, follow=follow)
             except IOError:
@@ -5124,6 +5162,8 @@ class App(QtCore.QObject):
                 self.inform.emit("[error_notcl] Object is not Gerber file or empty. Aborting object creation.")
                 return "fail"
 
+            self.parse_cache_store(cache_key, gerber_obj)
+
             # Further parsing
             self.progress.emit(70)  # TODO: Note the mixture of self and app_obj used here
 
@@ -5174,6 +5214,17 @@ class App(QtCore.QObject):
         def obj_init(excellon_obj, app_obj):
             # self.progress.emit(20)
 
+            cache_key = self.parse_cache_key(filename, kind="excellon", units=excellon_obj.units,
+                                             geo_steps_per_circle=excellon_obj.geo_steps_per_circle,
+                                             zeros=Excellon.defaults["zeros"],
+                                             excellon_units=Excellon.defaults["excellon_units"],
+                                             excellon_format_upper_in=Excellon.defaults["excellon_format_upper_in"],
+                                             excellon_format_lower_in=Excellon.defaults["excellon_format_lower_in"],
+                                             excellon_format_upper_mm=Excellon.defaults["excellon_format_upper_mm"],
+                                             excellon_format_lower_mm=Excellon.defaults["excellon_format_lower_mm"])
+            if self.parse_cache.load(cache_key, excellon_obj):
+                return
+
             try:
                 ret = excellon_obj.parse_file(filename)
                 if ret == "fail":
@@ -5200,6 +5251,8 @@ class App(QtCore.QObject):
                 app_obj.inform.emit("[error_notcl] No geometry found in file: " + filename)
                 return "fail"
 
+            self.parse_cache_store(cache_key, excellon_obj)
+
         with self.proc_container.new("Opening Excellon."):
 
             # Object name
@@ -5241,6 +5294,11 @@ class App(QtCore.QObject):
 
             self.progress.emit(10)
 
+            cache_key = self.parse_cache_key(filename, kind="cncjob", units=job_obj.units,
+                                             steps_per_circle=job_obj.steps_per_circle)
+            if self.parse_cache.load(cache_key, job_obj):
+                return
+
             try:
                 f = open(filename)
                 gcode = f.read()
@@ -5262,6 +5320,8 @@ class App(QtCore.QObject):
             self.progress.emit(60)
             job_obj.create_geometry()
 
+            self.parse_cache_store(cache_key, job_obj)
+
         with self.proc_container.new("Opening G-Code."):
 
             # Object name
@@ -5282,7 +5342,7 @@ class App(QtCore.QObject):
             self.inform.emit("[success] Opened: " + filename)
             self.progress.emit(100)
 
-    def open_project(self, filename, run_from_arg=None):
+    def open_project(self, filename, run_from_arg=None, lazy=None):
         """
         Loads a project from the specified file.
 
@@ -5293,22 +5353,49 @@ class App(QtCore.QObject):
         5) Calls new_object() with the object's from_dict() as init method.
         6) Calls plot_all()
 
+        In lazy mode the geometry of the objects is not decoded in step 5,
+        but on first use (see FlatCAMObj.from_dict_lazy()), usually when
+        the object is plotted in the background.
+
         :param filename:  Name of the file from which to load.
         :type filename: str
+        :param lazy: Load geometry on first use. None for the
+            "global_project_lazy_load" default.
+        :type lazy: bool
         :return: None
         """
         App.log.debug("Opening project: " + filename)
 
+        if lazy is None:
+            lazy = self.defaults["global_project_lazy_load"]
+
         # Open and parse
         try:
-            f = open(filename, 'r')
+            binary = is_binary_project(filename)
+            f = open(filename, 'rb' if binary else 'r')
         except IOError:
             App.log.error("Failed to open project file: %s" % filename)
             self.inform.emit("[error_notcl] Failed to open project file: %s" % filename)
             return
 
         try:
-            d = json.load(f, object_hook=dict2obj)
+            # objs yields (attributes, load) for every object, where load()
+            # returns the geometry attributes or is None if they are
+            # already in attributes.
+            if binary:
+                # Objects are decoded one by one while they are created.
+                d, objs = ProjectReader(f).read()
+            elif lazy:
+                # Shapely geometry is decoded from WKT on first use.
+                d = json.load(f)
+                d['options'] = decode_json(d['options'])
+                objs = ((decode_json(attrs), lambda geo=geo: decode_json(geo))
+                        for attrs, geo in (split_attrs(obj, FlatCAMObj.lazy_attrs) for obj in d['objs']))
+                f.close()
+            else:
+                d = json.load(f, object_hook=dict2obj)
+                objs = ((obj, None) for obj in d['objs'])
+                f.close()
         except:
             App.log.error("Failed to parse project file: %s" % filename)
             self.inform.emit("[error_notcl] Failed to parse project file: %s" % filename)
@@ -5332,11 +5419,24 @@ class App(QtCore.QObject):
 
         # Re create objects
         App.log.debug("Re-creating objects...")
-        for obj in d['objs']:
-            def obj_init(obj_inst, app_inst):
-                obj_inst.from_dict(obj)
-            App.log.debug(obj['kind'] + ":  " + obj['options']['name'])
-            self.new_object(obj['kind'], obj['options']['name'], obj_init, active=False, fit=False, plot=True)
+        try:
+            for obj, load in objs:
+                def obj_init(obj_inst, app_inst):
+                    if load is None:
+                        obj_inst.from_dict(obj)
+                    elif lazy:
+                        obj_inst.from_dict_lazy(obj, load)
+                    else:
+                        obj.update(load())
+                        obj_inst.from_dict(obj)
+                App.log.debug(obj['kind'] + ":  " + obj['options']['name'])
+                self.new_object(obj['kind'], obj['options']['name'], obj_init, active=False, fit=False, plot=True)
+        except ValueError as e:
+            App.log.error("Failed to read project file: %s. %s" % (filename, str(e)))
+            self.inform.emit("[error_notcl] Project file is damaged, not all objects were loaded: %s" % filename)
+            return
+        finally:
+            f.close()
 
         # self.plot_all()
         self.inform.emit("[success] Project loaded from: " + filename)
@@ -5892,6 +5992,10 @@ class App(QtCore.QObject):
             # Project options
             self.options_read_form()
 
+            if filename.lower().endswith(".flatprjb"):
+                self.save_binary_project(filename)
+                return
+
             # Serialize the whole project
             d = {"objs": [obj.to_dict() for obj in self.collection.get_list()],
                  "options": self.options,
@@ -5929,6 +6033,59 @@ class App(QtCore.QObject):
             else:
                 self.inform.emit("[error_notcl] Failed to save project file: %s. Retry to save it." % filename)
 
+    def save_binary_project(self, filename):
+        """
+        Saves the current project to the specified file in the binary
+        format (see FlatCAMProjectFile). Objects are serialized and
+        written one at a time and the file is verified by checksum.
+
+        :param filename: Name of the file in which to save.
+        :type filename: str
+        :return: None
+        """
+        self.log.debug("save_binary_project()")
+
+        # Written next to the target and only moved over it when complete,
+        # so a failed save does not destroy the previous project file.
+        tmp_filename = filename + ".tmp"
+
+        # Open file
+        try:
+            f = open(tmp_filename, 'wb')
+        except IOError:
+            App.log.error("[error] Failed to open file for saving: %s", filename)
+            self.inform.emit("[error_notcl] Failed to open file for saving: %s" % filename)
+            return
+
+        # Write
+        try:
+            with f:
+                writer = ProjectWriter(f, compression=self.defaults["global_project_compression"])
+                writer.write_project(self.options, self.version)
+                for obj in self.collection.get_list():
+                    writer.write_object(obj.to_dict(), FlatCAMObj.lazy_attrs)
+                writer.close()
+            os.replace(tmp_filename, filename)
+        except Exception as e:
+            App.log.error("[error] Failed to save project file: %s. %s" % (filename, str(e)))
+            self.inform.emit("[error_notcl] Failed to save project file: %s. Retry to save it." % filename)
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
+            return
+
+        # verification of the saved project
+        try:
+            with open(filename, 'rb') as saved_f:
+                ProjectReader(saved_f).verify()
+        except (IOError, ValueError) as e:
+            App.log.error("Failed to verify project file: %s. %s" % (filename, str(e)))
+            self.inform.emit("[error_notcl] Failed to verify project file: %s. Retry to save it." % filename)
+            return
+
+        self.inform.emit("[success] Project saved to: %s" % filename)
+
     def on_options_app2project(self):
         """
         Callback for Options->Transfer Options->App=>Project. Copies options
@@ -0,0 +1,327 @@
+############################################################
+# FlatCAM: 2D Post-processing for Manufacturing            #
+# http://flatcam.org                                       #
+# MIT Licence                                              #
+############################################################
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+from shapely.geometry.base import BaseGeometry
+from shapely.wkb import loads as wkb_loads
+from shapely.wkb import dumps as wkb_dumps
+
+from camlib import to_dict, dict2obj
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+log = logging.getLogger('base2')
+
+
+# Magic, format version, compression, number of blobs,
+# manifest length, blob area length.
+HEADER = struct.Struct("<4sHBIII")
+MAGIC = b"FCPC"
+FORMAT_VERSION = 1
+
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+
+
+def compress(data, compression):
+    """
+    :param data: Data to compress.
+    :param compression: One of COMPRESSIONS.
+    :return: Compressed data.
+    """
+    if compression == "zlib":
+        return zlib.compress(data, 1)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return data
+
+
+def decompress(data, compression):
+    """
+    :param data: Data compressed with ``compress()``.
+    :param compression: One of COMPRESSIONS.
+    :return: Decompressed data.
+    """
+    if compression == "zlib":
+        return zlib.decompress(data)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compressed data, but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def pack_attrs(attrs, compression="zlib"):
+    """
+    Encodes a dictionary of object attributes (as returned by
+    ``Geometry.to_dict()``) into a compact binary form:
+
+    * A fixed header (see ``HEADER``).
+    * The length of every blob, as little endian uint64.
+    * A JSON manifest with the attributes. Every Shapely geometry is
+      replaced by a reference to a blob.
+    * The blobs, the WKB encoding of each geometry.
+
+    Everything after the header is compressed.
+
+    :param attrs: Dictionary of attributes.
+    :type attrs: dict
+    :param compression: One of COMPRESSIONS. zstd falls back to
+        zlib if the zstandard package is not installed.
+    :type compression: str
+    :return: Encoded attributes.
+    :rtype: bytes
+    """
+    blobs = []
+
+    def default(obj):
+        if isinstance(obj, BaseGeometry):
+            blobs.append(wkb_dumps(obj))
+            return {"__class__": "WKB", "__inst__": len(blobs) - 1}
+        if isinstance(obj, np.generic):
+            return obj.item()
+        return to_dict(obj)
+
+    manifest = json.dumps(attrs, default=default).encode('utf-8')
+    lengths = np.array([len(blob) for blob in blobs], dtype='<u8').tobytes()
+    blob_area = b"".join(blobs)
+
+    if compression == "zstd" and zstandard is None:
+        compression = "zlib"
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, COMPRESSIONS[compression],
+                         len(blobs), len(manifest), len(blob_area))
+    return header + compress(lengths + manifest + blob_area, compression)
+
+
+def unpack_attrs(data):
+    """
+    Decodes attributes encoded with ``pack_attrs()``.
+
+    :param data: Encoded attributes.
+    :type data: bytes
+    :return: Dictionary of attributes.
+    :rtype: dict
+    :raises ValueError: If data is not valid.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Truncated header")
+    magic, version, compression, n_blobs, manifest_len, blob_area_len = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Unknown format")
+
+    names = {code: name for name, code in COMPRESSIONS.items()}
+    if compression not in names:
+        raise ValueError("Unknown compression")
+    body = decompress(data[HEADER.size:], names[compression])
+    if len(body) != 8 * n_blobs + manifest_len + blob_area_len:
+        raise ValueError("Truncated body")
+
+    ends = np.cumsum(np.frombuffer(body, dtype='<u8', count=n_blobs))
+    offset = 8 * n_blobs
+    manifest = body[offset:offset + manifest_len].decode('utf-8')
+    blob_area = body[offset + manifest_len:]
+
+    def object_hook(d):
+        if d.get('__class__') == "WKB":
+            i = d['__inst__']
+            start = ends[i - 1] if i > 0 else 0
+            return wkb_loads(blob_area[start:ends[i]])
+        return dict2obj(d)
+
+    return json.loads(manifest, object_hook=object_hook)
+
+
+class ParseCache(object):
+    """
+    On-disk cache for the result of parsing Gerber, Excellon
+    and G-code files.
+
+    Entries are keyed by the contents of the file, the parser options
+    and the application version, so a file is parsed again whenever
+    any of them change. The least recently used entries are removed
+    when the total size of the cache goes over ``max_size``.
+    """
+
+    extension = ".fcc"
+
+    def __init__(self, path, version, max_size=200 * 1024 * 1024):
+        """
+
+        :param path: Directory for the cache files. Created if missing.
+        :param version: Application version, part of every key.
+        :param max_size: Maximum total size of the cache in bytes.
+        """
+        self.path = path
+        self.version = version
+        self.max_size = max_size
+
+    def make_key(self, filename, **options):
+        """
+        Creates the cache key for parsing a file with the given options.
+
+        :param filename: File to be parsed.
+        :param options: Anything that changes the result of parsing.
+            Must be JSON serializable.
+        :return: Key or None if the file cannot be read.
+        :rtype: str
+        """
+        digest = hashlib.sha1()
+        try:
+            with open(filename, 'rb') as f:
+                for chunk in iter(lambda: f.read(1048576), b""):
+                    digest.update(chunk)
+        except IOError:
+            return None
+
+        digest.update(json.dumps([str(self.version), options], sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key + self.extension)
+
+    def load(self, key, obj):
+        """
+        Sets the attributes stored under ``key`` in ``obj``.
+
+        :param key: Key from ``make_key()``. None is always a miss.
+        :param obj: Object to populate.
+        :return: True if the entry was found and loaded.
+        :rtype: bool
+        """
+        if key is None:
+            return False
+
+        entry = self.entry_path(key)
+        try:
+            with open(entry, 'rb') as f:
+                attrs = unpack_attrs(f.read())
+        except IOError:
+            return False
+        except Exception as e:
+            log.warning("ParseCache.load() -> Dropping unreadable entry %s: %s" % (entry, str(e)))
+            self.remove(entry)
+            return False
+
+        for attr in attrs:
+            setattr(obj, attr, attrs[attr])
+
+        # Most recently used.
+        try:
+            os.utime(entry, None)
+        except OSError:
+            pass
+
+        log.debug("ParseCache.load() -> Hit %s" % key)
+        return True
+
+    def store(self, key, obj, attrs):
+        """
+        Stores the given attributes of ``obj`` under ``key``. The entry
+        is written to a temporary file first, so readers never see a
+        partial entry.
+
+        :param key: Key from ``make_key()``. None stores nothing.
+        :param obj: Object to store.
+        :param attrs: Names of the attributes of ``obj`` to store.
+        :return: None
+        """
+        if key is None:
+            return
+
+        try:
+            data = pack_attrs({attr: getattr(obj, attr) for attr in attrs})
+        except Exception as e:
+            log.warning("ParseCache.store() -> Cannot encode object: %s" % str(e))
+            return
+
+        if len(data) > self.max_size:
+            return
+
+        try:
+            if not os.path.exists(self.path):
+                os.makedirs(self.path)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        except (IOError, OSError) as e:
+            log.warning("ParseCache.store() -> Cannot write entry: %s" % str(e))
+            return
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.entry_path(key))
+        except (IOError, OSError) as e:
+            log.warning("ParseCache.store() -> Cannot write entry: %s" % str(e))
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self.evict()
+
+    def entries(self):
+        """
+        :return: List of (last use time, size, path) of every entry.
+        :rtype: list
+        """
+        entries = []
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return entries
+
+        for name in names:
+            if not name.endswith(self.extension):
+                continue
+            entry = os.path.join(self.path, name)
+            try:
+                st = os.stat(entry)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry))
+        return entries
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache
+        fits in ``max_size``.
+
+        :return: None
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_size:
+                break
+            self.remove(entry)
+            total -= size
+
+    def clear(self):
+        """
+        Removes all entries.
+
+        :return: None
+        """
+        for _, _, entry in self.entries():
+            self.remove(entry)
+
+    @staticmethod
+    def remove(entry):
+        try:
+            os.remove(entry)
+        except OSError:
+            pass
@@ -908,34 +908,14 @@ class FCSelect(DrawTool):
         return ""
 
     def select_shapes(self, pos):
-        # list where we store the overlapped shapes under our mouse left click position
-        over_shape_list = []
-
-        # pos[0] and pos[1] are the mouse click coordinates (x, y)
-        for obj_shape in self.storage.get_objects():
-            # first method of click selection -> inconvenient
-            # minx, miny, maxx, maxy = obj_shape.geo.bounds
-            # if (minx <= pos[0] <= maxx) and (miny <= pos[1] <= maxy):
-            #     over_shape_list.append(obj_shape)
-
-            # second method of click selection -> slow
-            # outside = obj_shape.geo.buffer(0.1)
-            # inside = obj_shape.geo.buffer(-0.1)
-            # shape_band = outside.difference(inside)
-            # if Point(pos).within(shape_band):
-            #     over_shape_list.append(obj_shape)
-
-            # 3rd method of click selection -> inconvenient
-            try:
-                _, closest_shape = self.storage.nearest(pos)
-            except StopIteration:
-                return ""
-
-            over_shape_list.append(closest_shape)
+        # list where we store the overlapped shapes under our mouse left click position:
+        # pos[0] and pos[1] are the mouse click coordinates (x, y) and the shapes are those which outline
+        # passes within a few pixels of the click, nearest first
+        tolerance = 4 * self.draw_app.app.plotcanvas.pixel_size()
+        over_shape_list = self.storage.hit_test(pos, tolerance)
 
         try:
             # if there is no shape under our click then deselect all shapes
-            # it will not work for 3rd method of click selection
             if not over_shape_list:
                 self.draw_app.selected = []
                 FlatCAMGeoEditor.draw_shape_idx = -1
@@ -2796,6 +2776,7 @@ class FlatCAMGeoEditor(QtCore.QObject):
         ## Shape storage.
         storage = FlatCAMRTreeStorage()
         storage.get_points = DrawToolShape.get_pts
+        storage.get_geometry = lambda shape: shape.geo
 
         return storage
 
@@ -3662,6 +3643,7 @@ class FlatCAMExcEditor(QtCore.QObject):
         ## Shape storage.
         storage = FlatCAMRTreeStorage()
         storage.get_points = DrawToolShape.get_pts
+        storage.get_geometry = lambda shape: shape.geo
 
         return storage
 
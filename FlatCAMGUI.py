@@ -1694,10 +1694,11 @@ class ExcellonPrefGroupUI(OptionsGroupUI):
             "If MH is checked then Google OR-Tools algorithm with MetaHeuristic\n"
             "Guided Local Path is used. Default search time is 3sec.\n"
             "Use set_sys excellon_search_time value Tcl Command to set other values.\n"
-            "If Basic is checked then Google OR-Tools Basic algorithm is used.\n"
+            "If Basic is checked then the path goes to the nearest drill each time\n"
+            "and is improved with 2-opt moves for at most the same search time.\n"
             "\n"
             "If DISABLED, then FlatCAM works in 32bit mode and it uses \n"
-            "Travelling Salesman algorithm for path optimization."
+            "the Basic algorithm for path optimization."
         )
 
         self.excellon_optimization_radio = RadioSet([{'label': 'MH', 'value': 'M'},
@@ -1707,10 +1708,11 @@ class ExcellonPrefGroupUI(OptionsGroupUI):
             "If MH is checked then Google OR-Tools algorithm with MetaHeuristic\n"
             "Guided Local Path is used. Default search time is 3sec.\n"
             "Use set_sys excellon_search_time value Tcl Command to set other values.\n"
-            "If Basic is checked then Google OR-Tools Basic algorithm is used.\n"
+            "If Basic is checked then the path goes to the nearest drill each time\n"
+            "and is improved with 2-opt moves for at most the same search time.\n"
             "\n"
             "If DISABLED, then FlatCAM works in 32bit mode and it uses \n"
-            "Travelling Salesman algorithm for path optimization."
+            "the Basic algorithm for path optimization."
         )
 
         form_box_excellon.addRow(self.excellon_optimization_label, self.excellon_optimization_radio)
@@ -2256,6 +2258,15 @@ class CNCJobPrefGroupUI(OptionsGroupUI):
         )
         grid0.addWidget(self.plot_cb, 0, 0)
 
+        # Exact tool shape
+        self.plot_exact_cb = FCCheckBox('Exact tool shape')
+        self.plot_exact_cb.setToolTip(
+            "Plot the exact shape of the tool paths.\n"
+            "Much slower for large jobs, by default\n"
+            "the paths are drawn as thick lines."
+        )
+        grid0.addWidget(self.plot_exact_cb, 0, 1)
+
         # Number of circle steps for circular aperture linear approximation
         self.steps_per_circle_label = QtWidgets.QLabel("Circle Steps:")
         self.steps_per_circle_label.setToolTip(
@@ -13,6 +13,7 @@ from copy import copy, deepcopy
 import inspect  # TODO: For debugging only.
 from shapely.geometry.base import JOIN_STYLE
 from datetime import datetime
+import threading
 
 import FlatCAMApp
 from ObjectUI import *
@@ -48,6 +49,10 @@ class FlatCAMObj(QtCore.QObject):
     # The app should set this value.
     app = None
 
+    # Attributes holding geometry. When opening a project these
+    # can be loaded on first use, see from_dict_lazy().
+    lazy_attrs = ['solid_geometry', 'tools', 'drills', 'slots', 'gcode', 'gcode_parsed', 'cnc_tools']
+
     def __init__(self, name):
         """
         Constructor.
@@ -77,6 +82,10 @@ class FlatCAMObj(QtCore.QObject):
 
         self._drawing_tolerance = 0.01
 
+        # Set by from_dict_lazy(), cleared by load_lazy().
+        self.lazy_loader = None
+        self.lazy_lock = threading.Lock()
+
         # assert isinstance(self.ui, ObjectUI)
         # self.ui.name_entry.returnPressed.connect(self.on_name_activate)
         # self.ui.offset_button.clicked.connect(self.on_offset_button_click)
@@ -103,11 +112,65 @@ class FlatCAMObj(QtCore.QObject):
 
         for attr in self.ser_attrs:
 
-            if attr == 'options':
+            if attr not in d:
+                # Projects saved by older versions keep the default.
+                continue
+            elif attr == 'options':
                 self.options.update(d[attr])
             else:
                 setattr(self, attr, d[attr])
 
+    def from_dict_lazy(self, d, loader):
+        """
+        Like ``from_dict()``, but the attributes in ``lazy_attrs`` are not
+        in ``d``. They are set from the dictionary returned by ``loader()``
+        the first time any of them is used.
+
+        :param d: Dictionary with the other attributes.
+        :param loader: Function returning a dictionary with the
+         attributes in ``lazy_attrs``.
+        :return: None
+        """
+
+        self.lazy_loader = loader
+
+        for attr in self.ser_attrs:
+
+            if attr in self.lazy_attrs:
+                self.__dict__.pop(attr, None)
+            elif attr not in d:
+                continue
+            elif attr == 'options':
+                self.options.update(d[attr])
+            else:
+                setattr(self, attr, d[attr])
+
+    def load_lazy(self):
+        """
+        Loads the attributes deferred by ``from_dict_lazy()``. Does
+        nothing if they are already loaded. Thread-safe.
+
+        :return: None
+        """
+
+        with self.lazy_lock:
+            if self.lazy_loader is None:
+                return
+
+            d = self.lazy_loader()
+            for attr in d:
+                setattr(self, attr, d[attr])
+            self.lazy_loader = None
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not set, like the
+        # ones not loaded yet after from_dict_lazy().
+        if name in FlatCAMObj.lazy_attrs and 'lazy_lock' in self.__dict__:
+            self.load_lazy()
+            if name in self.__dict__:
+                return self.__dict__[name]
+        raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, name))
+
     def on_options_change(self, key):
         # Update form on programmatically options change
         self.set_form_item(key)
@@ -320,6 +383,12 @@ class FlatCAMObj(QtCore.QObject):
         except AttributeError:
             pass
 
+        # or tool paths
+        try:
+            self.toolpaths.visible = value
+        except AttributeError:
+            pass
+
     @property
     def drawing_tolerance(self):
         return self._drawing_tolerance if self.units == 'MM' or not self.units else self._drawing_tolerance / 25.4
@@ -337,6 +406,42 @@ class FlatCAMObj(QtCore.QObject):
         except AttributeError:
             pass
 
+        # or tool paths
+        try:
+            self.toolpaths.clear(update)
+        except AttributeError:
+            pass
+
+    def transform_shapes(self, matrix):
+        """
+        Moves the plotted shapes by an affine matrix without plotting
+        the object again. Call it along with the same transform of the
+        object geometry (offset, rotate, mirror, ...).
+
+        :param matrix: 3x3 affine matrix, see camlib.translation_matrix() and others.
+        :type matrix: numpy.array
+        :return: False if the object has to be plotted again after the geometry transform.
+        :rtype: bool
+        """
+        if self.deleted:
+            return True
+
+        self.shapes.transform(matrix)
+
+        # Not all object types has annotations
+        try:
+            self.annotation.transform(matrix)
+        except AttributeError:
+            pass
+
+        # or tool paths
+        try:
+            self.toolpaths.transform(matrix)
+        except AttributeError:
+            pass
+
+        return True
+
     def delete(self):
         # Free resources
         del self.ui
@@ -424,6 +529,18 @@ class FlatCAMGerber(FlatCAMObj, Gerber):
         # self.ui.generate_bb_button.clicked.connect(self.on_generatebb_button_click)
         # self.ui.generate_noncopper_button.clicked.connect(self.on_generatenoncopper_button_click)
 
+    def parse_lines(self, glines, follow=False):
+        """
+        Merges large Gerber layers in parallel with the application's
+        process pool, see Gerber.parse_lines(). The pool is looked up
+        for every parse because App.clear_pool() replaces it.
+        """
+        self.pool = self.app.pool
+        try:
+            return Gerber.parse_lines(self, glines, follow=follow)
+        finally:
+            self.pool = None
+
     def set_ui(self, ui):
         """
         Maps options with GUI inputs.
@@ -905,7 +1022,7 @@ class FlatCAMExcellon(FlatCAMObj, Excellon):
             flattened_list = exc_list
 
         # this dict will hold the unique tool diameters found in the exc_list objects as the dict keys and the dict
-        # values will be list of Shapely Points
+        # values will be lists of drill coordinates arrays
         custom_dict = {}
 
         for exc in flattened_list:
@@ -917,13 +1034,18 @@ class FlatCAMExcellon(FlatCAMObj, Excellon):
                     except:
                         exc.app.log.warning("Failed to copy option.", option)
 
-            for drill in exc.drills:
-                exc_tool_dia = float('%.3f' % exc.tools[drill['tool']]['C'])
+            # Diameter of every drill, from the diameters of the tools with drills
+            counts = exc.drills.counts()
+            tool_dias = [float('%.3f' % exc.tools[tool]['C']) if counts[tool] else 0.0
+                         for tool in exc.drills.tool_names]
+            drill_dias = np.array(tool_dias + [0.0])[exc.drills.tool_index]
 
-                if exc_tool_dia not in custom_dict:
-                    custom_dict[exc_tool_dia] = [drill['point']]
-                else:
-                    custom_dict[exc_tool_dia].append(drill['point'])
+            # Drills of every diameter, diameters in order of the tools
+            added = set()
+            for tool, exc_tool_dia in zip(exc.drills.tool_names, tool_dias):
+                if counts[tool] and exc_tool_dia not in added:
+                    added.add(exc_tool_dia)
+                    custom_dict.setdefault(exc_tool_dia, []).append(exc.drills.coords[drill_dias == exc_tool_dia])
 
                 # add the zeros and units to the exc_final object
             exc_final.zeros = exc.zeros
@@ -933,7 +1055,7 @@ class FlatCAMExcellon(FlatCAMObj, Excellon):
         current_tool = 0
 
         # Here we add data to the exc_final object
-        # the tools diameter are now the keys in the drill_dia dict and the values are the Shapely Points
+        # the tools diameter are now the keys in the drill_dia dict and the values are arrays of coordinates
         for tool_dia in custom_dict:
             # we create a tool name for each key in the drill_dia dict (the key is a unique drill diameter)
             current_tool += 1
@@ -942,18 +1064,39 @@ class FlatCAMExcellon(FlatCAMObj, Excellon):
             spec = {"C": float(tool_dia)}
             exc_final.tools[tool_name] = spec
 
-            # rebuild the drills list of dict's that belong to the exc_final object
-            for point in custom_dict[tool_dia]:
-                exc_final.drills.append(
-                    {
-                        "point": point,
-                        "tool": str(current_tool)
-                    }
-                )
+            # rebuild the drills table that belong to the exc_final object
+            for coords in custom_dict[tool_dia]:
+                exc_final.drills.add_many(tool_name, coords)
 
         # create the geometry for the exc_final object
         exc_final.create_geometry()
 
+    @staticmethod
+    def panelize(exc, offsets, exc_final):
+        """
+        Fills exc_final with a copy of the drills and slots of exc for
+        every offset. All the copies are made in a single array operation.
+        Options are copied from exc, as in merge().
+
+        :param exc: Source FlatCAMExcellon object.
+        :param offsets: List of [dx, dy], see camlib.grid_offsets().
+        :param exc_final: Destination FlatCAMExcellon object.
+        :return: None
+        """
+
+        for option in exc.options:
+            if option != 'name':
+                exc_final.options[option] = exc.options[option]
+
+        exc_final.zeros = exc.zeros
+        exc_final.units = exc.units
+        exc_final.tools = deepcopy(exc.tools)
+
+        exc_final.drills = exc.drills.tile(offsets)
+        exc_final.slots = exc.slots.tile(offsets)
+
+        exc_final.create_geometry()
+
     def build_ui(self):
         FlatCAMObj.build_ui(self)
 
@@ -972,22 +1115,21 @@ class FlatCAMExcellon(FlatCAMObj, Excellon):
         sorted_tools = sorted(sort, key=lambda t1: t1[1])
         tools = [i[0] for i in sorted_tools]
 
+        drill_counts = self.drills.counts()
+        slot_counts = self.slots.counts()
+
         for tool_no in tools:
 
             drill_cnt = 0  # variable to store the nr of drills per tool
             slot_cnt = 0  # variable to store the nr of slots per tool
 
             # Find no of drills for the current tool
-            for drill in self.drills:
-                if drill['tool'] == tool_no:
-                    drill_cnt += 1
+            drill_cnt = drill_counts.get(tool_no, 0)
 
             self.tot_drill_cnt += drill_cnt
 
             # Find no of slots for the current tool
-            for slot in self.slots:
-                if slot['tool'] == tool_no:
-                    slot_cnt += 1
+            slot_cnt = slot_counts.get(tool_no, 0)
 
             self.tot_slot_cnt += slot_cnt
 
@@ -1199,12 +1341,11 @@ class FlatCAMExcellon(FlatCAMObj, Excellon):
                 else:
                     excellon_code += 'T' + str(tool) + '\n'
 
-                for drill in self.drills:
-                    if tool == drill['tool']:
-                        if units == 'MM':
-                            excellon_code += 'X' + '%.3f' % drill['point'].x + 'Y' + '%.3f' % drill['point'].y + '\n'
-                        else:
-                            excellon_code += 'X' + '%.4f' % drill['point'].x + 'Y' + '%.4f' % drill['point'].y + '\n'
+                for drill_x, drill_y in self.drills.coords_of(tool).tolist():
+                    if units == 'MM':
+                        excellon_code += 'X' + '%.3f' % drill_x + 'Y' + '%.3f' % drill_y + '\n'
+                    else:
+                        excellon_code += 'X' + '%.4f' % drill_x + 'Y' + '%.4f' % drill_y + '\n'
         except Exception as e:
             log.debug(str(e))
 
@@ -1259,22 +1400,19 @@ class FlatCAMExcellon(FlatCAMObj, Excellon):
                 else:
                     excellon_code += 'T' + str(tool) + '\n'
 
-                for drill in self.drills:
-                    if tool == drill['tool']:
-                        drill_x = drill['point'].x
-                        drill_y = drill['point'].y
-                        if units == 'MM':
-                            drill_x /= 25.4
-                            drill_y /= 25.4
-                        exc_x_formatted = ('%.4f' % drill_x).replace('.', '')
-                        if drill_x < 10:
-                            exc_x_formatted = '0' + exc_x_formatted
-
-                        exc_y_formatted = ('%.4f' % drill_y).replace('.', '')
-                        if drill_y < 10:
-                            exc_y_formatted = '0' + exc_y_formatted
-
-                        excellon_code += 'X' + exc_x_formatted + 'Y' + exc_y_formatted + '\n'
+                for drill_x, drill_y in self.drills.coords_of(tool).tolist():
+                    if units == 'MM':
+                        drill_x /= 25.4
+                        drill_y /= 25.4
+                    exc_x_formatted = ('%.4f' % drill_x).replace('.', '')
+                    if drill_x < 10:
+                        exc_x_formatted = '0' + exc_x_formatted
+
+                    exc_y_formatted = ('%.4f' % drill_y).replace('.', '')
+                    if drill_y < 10:
+                        exc_y_formatted = '0' + exc_y_formatted
+
+                    excellon_code += 'X' + exc_x_formatted + 'Y' + exc_y_formatted + '\n'
         except Exception as e:
             log.debug(str(e))
 
@@ -1390,15 +1528,21 @@ class FlatCAMExcellon(FlatCAMObj, Excellon):
             # in case that the tool used has the same diameter with the hole, and since the maximum resolution
             # for FlatCAM is 6 decimals,
             # we add a tenth of the minimum value, meaning 0.0000001, which from our point of view is "almost zero"
-            for hole in self.drills:
-                if hole['tool'] in tools:
-                    buffer_value = self.tools[hole['tool']]["C"] / 2 - tooldia / 2
-                    if buffer_value == 0:
-                        geo_obj.solid_geometry.append(
-                            Point(hole['point']).buffer(0.0000001).exterior)
-                    else:
-                        geo_obj.solid_geometry.append(
-                            Point(hole['point']).buffer(buffer_value).exterior)
+            order = []
+            rings = []
+            for tool in set(tools):
+                mask = self.drills.mask(tool)
+                if not mask.any():
+                    continue
+                buffer_value = self.tools[tool]["C"] / 2 - tooldia / 2
+                if buffer_value == 0:
+                    buffer_value = 0.0000001
+                # Holes of a tool are all the same circle, translated. 64 steps
+                # is the resolution of the default buffer().
+                order.append(np.flatnonzero(mask))
+                rings += circles_at(self.drills.coords[mask], 2 * buffer_value, 64, exterior=True)
+            if rings:
+                geo_obj.solid_geometry = [rings[i] for i in np.argsort(np.concatenate(order), kind='stable')]
         if use_thread:
             def geo_thread(app_obj):
                 app_obj.new_object("geometry", outname, geo_init)
@@ -1628,6 +1772,22 @@ class FlatCAMExcellon(FlatCAMObj, Excellon):
             self.options['startz'] *= factor
         self.options['endz'] *= factor
 
+    def transform_shapes(self, matrix):
+        """
+        Drill holes keep their tool diameter under scale and skew, so only
+        moves, rotations and flips are applied to the plotted shapes.
+
+        :param matrix: 3x3 affine matrix.
+        :type matrix: numpy.array
+        :return: False if the object has to be plotted again after the geometry transform.
+        :rtype: bool
+        """
+        linear = matrix[:2, :2]
+        if not np.allclose(linear.T.dot(linear), np.eye(2)):
+            return False
+
+        return FlatCAMObj.transform_shapes(self, matrix)
+
     def plot(self):
 
         # Does all the required setup and returns False
@@ -1727,7 +1887,7 @@ class FlatCAMGeometry(FlatCAMObj, Geometry):
                 if multigeo is None or multigeo == False:
                     geo_final.multigeo = False
                     try:
-                        geo_final.solid_geometry.append(geo.solid_geometry)
+                        geo_final.solid_geometry.append(geo.instanced(geo.solid_geometry))
                     except Exception as e:
                         log.debug("FlatCAMGeometry.merge() --> %s" % str(e))
                 else:
@@ -1751,6 +1911,54 @@ class FlatCAMGeometry(FlatCAMObj, Geometry):
                     for tool_uid in geo.tools:
                         max_uid += 1
                         geo_final.tools[max_uid] = dict(geo.tools[tool_uid])
+                        if geo.multigeo:
+                            geo_final.tools[max_uid]['solid_geometry'] = \
+                                geo.instanced(geo.tools[tool_uid]['solid_geometry'])
+
+    @staticmethod
+    def panelize(obj, offsets, geo_final, instanced=False):
+        """
+        Fills geo_final with a copy of the geometry of obj for every
+        offset. All the copies are made in a single pass, see
+        camlib.tile_geometry().
+
+        If instanced, the geometry is stored only once and the offsets
+        are kept in geo_final.instances. The copies are only made when
+        plotting, and the G-Code repeats the paths for every instance.
+
+        :param obj: Source FlatCAMGerber or FlatCAMGeometry object.
+        :param offsets: List of [dx, dy], see camlib.grid_offsets().
+        :param geo_final: Destination FlatCAMGeometry object.
+        :param instanced: Store the offsets instead of copies of the geometry.
+        :return: None
+        """
+
+        # The instances of an instanced source are repeated in every cell.
+        if obj.instances:
+            offsets = [[dx + ix, dy + iy] for dx, dy in offsets for ix, iy in obj.instances]
+
+        def panel(geometry):
+            if instanced:
+                return tile_geometry(geometry, [[0.0, 0.0]])[0]
+            return tile_geometry(geometry, offsets)
+
+        if instanced:
+            geo_final.instances = [[float(dx), float(dy)] for dx, dy in offsets]
+
+        geo_final.multigeo = isinstance(obj, FlatCAMGeometry) and obj.multigeo
+        if geo_final.multigeo:
+            geo_final.solid_geometry = []
+        else:
+            geo_final.solid_geometry = panel(obj.solid_geometry)
+
+        # Gerber objects have no geometry tools.
+        if isinstance(obj, FlatCAMGeometry):
+            for tool_uid in obj.tools:
+                geo_final.tools[tool_uid] = dict(obj.tools[tool_uid])
+                if geo_final.multigeo:
+                    geo_final.tools[tool_uid]['solid_geometry'] = panel(obj.tools[tool_uid]['solid_geometry'])
+                else:
+                    geo_final.tools[tool_uid]['solid_geometry'] = []
 
     @staticmethod
     def get_pts(o):
@@ -1861,7 +2069,7 @@ class FlatCAMGeometry(FlatCAMObj, Geometry):
         # Attributes to be included in serialization
         # Always append to it because it carries contents
         # from predecessors.
-        self.ser_attrs += ['options', 'kind', 'tools', 'multigeo']
+        self.ser_attrs += ['options', 'kind', 'tools', 'multigeo', 'instances']
 
     def build_ui(self):
 
@@ -2506,6 +2714,8 @@ class FlatCAMGeometry(FlatCAMObj, Geometry):
                 obj_active.options['xmax'] = 0
                 obj_active.options['ymax'] = 0
 
+        self.app.collection.spatial_index.update(obj_active)
+
     def on_row_selection_change(self):
         self.update_ui()
 
@@ -2763,12 +2973,13 @@ class FlatCAMGeometry(FlatCAMObj, Geometry):
                 if isinstance(geo, LineString) or isinstance(geo, LinearRing):
                     dxf_space.add_lwpolyline(list(geo.coords))
 
+            # Instanced panels are written with all the copies.
             multigeo_solid_geometry = []
             if self.multigeo:
                 for tool in self.tools:
-                    multigeo_solid_geometry += self.tools[tool]['solid_geometry']
+                    multigeo_solid_geometry += self.flatten(self.instanced(self.tools[tool]['solid_geometry']))
             else:
-                    multigeo_solid_geometry = self.solid_geometry
+                multigeo_solid_geometry = self.flatten(self.instanced(self.solid_geometry))
 
             for geo in multigeo_solid_geometry:
                 if type(geo) == list:
@@ -3150,7 +3361,7 @@ class FlatCAMGeometry(FlatCAMObj, Geometry):
                     extracut=extracut, startz=startz, endz=endz,
                     toolchange=toolchange, toolchangez=toolchangez, toolchangexy=toolchangexy,
                     pp_geometry_name=pp_geometry_name,
-                    tool_no=tool_cnt)
+                    tool_no=tool_cnt, instances=self.instances)
 
                 dia_cnc_dict['gcode_parsed'] = job_obj.gcode_parse()
 
@@ -3329,16 +3540,17 @@ class FlatCAMGeometry(FlatCAMObj, Geometry):
         else:
             px, py = point
 
+        matrix = scale_matrix(xfactor, yfactor, (px, py))
+
         if type(self.solid_geometry) == list:
             geo_list =  self.flatten(self.solid_geometry)
             self.solid_geometry = []
             # for g in geo_list:
             #     self.solid_geometry.append(affinity.scale(g, xfactor, yfactor, origin=(px, py)))
-            self.solid_geometry = [affinity.scale(g, xfactor, yfactor, origin=(px, py))
-                                   for g in geo_list]
+            self.solid_geometry = transform_geometry(geo_list, matrix)
         else:
-            self.solid_geometry = affinity.scale(self.solid_geometry, xfactor, yfactor,
-                                                 origin=(px, py))
+            self.solid_geometry = transform_geometry(self.solid_geometry, matrix)
+        self.transform_instances(matrix)
 
     def offset(self, vect):
         """
@@ -3351,21 +3563,13 @@ class FlatCAMGeometry(FlatCAMObj, Geometry):
         """
 
         dx, dy = vect
-
-        def translate_recursion(geom):
-            if type(geom) == list:
-                geoms=list()
-                for local_geom in geom:
-                    geoms.append(translate_recursion(local_geom))
-                return geoms
-            else:
-                return  affinity.translate(geom, xoff=dx, yoff=dy)
+        matrix = translation_matrix(dx, dy)
 
         if self.multigeo is True:
             for tool in self.tools:
-                self.tools[tool]['solid_geometry'] = translate_recursion(self.tools[tool]['solid_geometry'])
+                self.tools[tool]['solid_geometry'] = transform_geometry(self.tools[tool]['solid_geometry'], matrix)
         else:
-            self.solid_geometry=translate_recursion(self.solid_geometry)
+            self.solid_geometry = transform_geometry(self.solid_geometry, matrix)
 
     def convert_units(self, units):
         self.ui_disconnect()
@@ -3486,12 +3690,12 @@ class FlatCAMGeometry(FlatCAMObj, Geometry):
             if self.multigeo == True: # geo multi tool usage
                 for tooluid_key in self.tools:
                     solid_geometry = self.tools[tooluid_key]['solid_geometry']
-                    self.plot_element(solid_geometry, visible=visible)
+                    self.plot_element(self.instanced(solid_geometry), visible=visible)
 
             # plot solid geometry that may be an direct attribute of the geometry object
             # for SingleGeo
             if self.solid_geometry:
-                self.plot_element(self.solid_geometry, visible=visible)
+                self.plot_element(self.instanced(self.solid_geometry), visible=visible)
 
             # self.plot_element(self.solid_geometry, visible=self.options['plot'])
             self.shapes.redraw()
@@ -3533,7 +3737,7 @@ class FlatCAMGeometry(FlatCAMObj, Geometry):
                     check_row = row
                     break
             if self.ui.geo_tools_table.cellWidget(check_row, 6).isChecked():
-                self.plot_element(element=solid_geometry, visible=True)
+                self.plot_element(element=self.instanced(solid_geometry), visible=True)
         self.shapes.redraw()
 
         # make sure that the general plot is disabled if one of the row plot's are disabled and
@@ -3617,6 +3821,7 @@ class FlatCAMCNCjob(FlatCAMObj, CNCjob):
         self.ser_attrs += ['options', 'kind', 'cnc_tools', 'multitool']
 
         self.annotation = self.app.plotcanvas.new_text_group()
+        self.toolpaths = self.app.plotcanvas.new_toolpath_group()
 
     def build_ui(self):
         self.ui_disconnect()
@@ -3868,8 +4073,17 @@ class FlatCAMCNCjob(FlatCAMObj, CNCjob):
 
         return gcode
 
-    def export_gcode(self, filename=None, preamble='', postamble='', to_file=False):
-        gcode = ''
+    def gcode_pieces(self, preamble='', postamble=''):
+        """
+        The G-code to be exported, as a list of strings to be written
+        one after the other. The G-code of the tools is not copied into
+        a single string.
+
+        :param preamble: Inserted before the units code.
+        :param postamble: Appended at the end.
+        :return: List of strings or None if the G-code does not have a units code.
+        :rtype: list
+        """
         roland = False
 
         # detect if using Roland postprocessor
@@ -3887,46 +4101,56 @@ class FlatCAMCNCjob(FlatCAMObj, CNCjob):
             except:
                 pass
 
+        pieces = []
+
         # do not add gcode_header when using the Roland postprocessor, add it for every other postprocessor
         if roland is False:
-            gcode = self.gcode_header()
+            pieces.append(self.gcode_header())
 
         # detect if using multi-tool and make the Gcode summation correctly for each case
         if self.multitool is True:
             for tooluid_key in self.cnc_tools:
                 for key, value in self.cnc_tools[tooluid_key].items():
                     if key == 'gcode':
-                        gcode += value
+                        pieces.append(value)
                         break
         else:
-            gcode += self.gcode
+            pieces.append(self.gcode)
 
         if roland is True:
-            g = preamble + gcode + postamble
-        else:
-            # fix so the preamble gets inserted in between the comments header and the actual start of GCODE
-            g_idx = gcode.rfind('G20')
+            return [preamble] + pieces + [postamble]
 
-            # if it did not find 'G20' then search for 'G21'
-            if g_idx == -1:
-                g_idx = gcode.rfind('G21')
+        # fix so the preamble gets inserted in between the comments header and the actual start of GCODE
+        # if it does not find 'G20' then search for 'G21'
+        for code in ['G20', 'G21']:
+            for i in reversed(range(len(pieces))):
+                g_idx = pieces[i].rfind(code)
+                if g_idx != -1:
+                    return pieces[:i] + [pieces[i][:g_idx], preamble + '\n', pieces[i][g_idx:]] + \
+                        pieces[i + 1:] + [postamble]
 
-            # if it did not find 'G20' and it did not find 'G21' then there is an error and return
-            if g_idx == -1:
-                self.app.inform.emit("[error_notcl] G-code does not have a units code: either G20 or G21")
-                return
+        # if it did not find 'G20' and it did not find 'G21' then there is an error
+        return None
 
-            g = gcode[:g_idx] + preamble + '\n' + gcode[g_idx:] + postamble
+    def add_toolpaths(self, **kwargs):
+        """
+        Adds tool paths to the plot, see ToolpathCollectionVisual.add().
+        """
+        if self.deleted:
+            raise ObjectDeleted()
+        return self.toolpaths.add(**kwargs)
 
-        # lines = StringIO(self.gcode)
-        lines = StringIO(g)
+    def export_gcode(self, filename=None, preamble='', postamble='', to_file=False):
+        pieces = self.gcode_pieces(preamble, postamble)
+        if pieces is None:
+            self.app.inform.emit("[error_notcl] G-code does not have a units code: either G20 or G21")
+            return
 
         ## Write
         if filename is not None:
             try:
                 with open(filename, 'w') as f:
-                    for line in lines:
-                        f.write(line)
+                    f.writelines(pieces)
 
             except FileNotFoundError:
                 self.app.inform.emit("[warning_notcl] No such file or directory")
@@ -3937,7 +4161,8 @@ class FlatCAMCNCjob(FlatCAMObj, CNCjob):
 
             self.app.inform.emit("[success] Saved to: " + filename)
         else:
-            return lines
+            # The editor needs the whole text.
+            return StringIO("".join(pieces))
 
     def get_gcode(self, preamble='', postamble=''):
         #we need this to be able get_gcode separatelly for shell command export_gcode
@@ -3971,6 +4196,7 @@ class FlatCAMCNCjob(FlatCAMObj, CNCjob):
         cw_row = cw_index.row()
 
         self.shapes.clear(update=True)
+        self.toolpaths.clear(update=True)
         for tooluid_key in self.cnc_tools:
             tooldia = float('%.4f' % float(self.cnc_tools[tooluid_key]['tooldia']))
             gcode_parsed = self.cnc_tools[tooluid_key]['gcode_parsed']
@@ -3980,6 +4206,7 @@ class FlatCAMCNCjob(FlatCAMObj, CNCjob):
                 self.plot2(tooldia=tooldia, obj=self, visible=True, gcode_parsed=gcode_parsed)
 
         self.shapes.redraw()
+        self.toolpaths.redraw()
 
         # make sure that the general plot is disabled if one of the row plot's are disabled and
         # if all the row plot's are enabled also enable the general plot checkbox
@@ -4016,8 +4243,10 @@ class FlatCAMCNCjob(FlatCAMObj, CNCjob):
                     gcode_parsed = self.cnc_tools[tooluid_key]['gcode_parsed']
                     self.plot2(tooldia=tooldia, obj=self, visible=visible, gcode_parsed=gcode_parsed)
             self.shapes.redraw()
+            self.toolpaths.redraw()
         except (ObjectDeleted, AttributeError):
             self.shapes.clear(update=True)
+            self.toolpaths.clear(update=True)
             self.annotation.clear(update=True)
 
     def convert_units(self, units):
@@ -65,6 +65,19 @@ class FlatCAMPostProc(object, metaclass=ABCPostProcRegister):
     def spindle_stop_code(self,p):
         pass
 
+    def linear_format(self, p):
+        """
+        Optional fast path for linear moves. A postprocessor whose
+        linear_code() only depends on the X and Y of the move can return
+        a format string that produces the same text as linear_code()
+        when applied with the % operator to (x, y). CNCjob then formats
+        whole paths at once instead of calling linear_code() per point.
+
+        :param p: Parameters, as passed to linear_code().
+        :return: Format string or None to use linear_code().
+        """
+        return None
+
 def load_postprocessors(app):
     postprocessors_path_search = [os.path.join(app.data_path,'postprocessors','*.py'),
                                   os.path.join('postprocessors', '*.py')]
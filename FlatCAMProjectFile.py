@@ -0,0 +1,221 @@
+############################################################
+# FlatCAM: 2D Post-processing for Manufacturing            #
+# http://flatcam.org                                       #
+# MIT Licence                                              #
+############################################################
+
+import struct
+import zlib
+
+from camlib import dict2obj
+from FlatCAMCache import pack_attrs, unpack_attrs
+
+# Binary project file:
+#
+# * FILE_HEADER: magic and format version.
+# * A sequence of records, each one a RECORD header (tag, payload
+#   length, CRC-32 of the payload) followed by the payload:
+#   * PROJ: project options and application version.
+#   * OBJ: one object, as returned by its to_dict(), without the
+#     geometry attributes (FlatCAMObj.lazy_attrs).
+#   * GEOM: the geometry attributes of the preceding object.
+#   * END: number of objects, marks a complete file.
+#
+# PROJ, OBJ and GEOM payloads are encoded with
+# FlatCAMCache.pack_attrs(), so geometry is stored as WKB. Keeping
+# the geometry in its own record allows creating the objects before
+# their geometry is decoded (see FlatCAMObj.from_dict_lazy()).
+FILE_HEADER = struct.Struct("<4sH")
+RECORD = struct.Struct("<4sQI")
+COUNT = struct.Struct("<I")
+MAGIC = b"FCPJ"
+FORMAT_VERSION = 1
+
+TAG_PROJECT = b"PROJ"
+TAG_OBJECT = b"OBJ "
+TAG_GEOMETRY = b"GEOM"
+TAG_END = b"END "
+
+
+def split_attrs(d, lazy_attrs):
+    """
+    Splits an object dictionary into the geometry attributes listed in
+    ``lazy_attrs`` and everything else.
+
+    :param d: Object as returned by its to_dict().
+    :param lazy_attrs: Names of the geometry attributes.
+    :return: (other attributes, geometry attributes)
+    :rtype: tuple
+    """
+    attrs = {}
+    geometry = {}
+    for attr in d:
+        if attr in lazy_attrs:
+            geometry[attr] = d[attr]
+        else:
+            attrs[attr] = d[attr]
+    return attrs, geometry
+
+
+def decode_json(value):
+    """
+    Applies ``dict2obj()`` to every dictionary in ``value``, the same
+    as ``json.load(f, object_hook=dict2obj)`` would have done. Used to
+    decode parts of a JSON project loaded without the hook.
+
+    :param value: Value from json.load().
+    :return: Decoded value.
+    """
+    if isinstance(value, dict):
+        return dict2obj({key: decode_json(value[key]) for key in value})
+    if isinstance(value, list):
+        return [decode_json(item) for item in value]
+    return value
+
+
+def is_binary_project(filename):
+    """
+    :param filename: Project file.
+    :return: True if the file is a binary project,
+        False for JSON projects.
+    :rtype: bool
+    """
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class ProjectWriter(object):
+    """
+    Writes a binary project one object at a time, so the whole
+    project never has to be serialized in memory.
+    """
+
+    def __init__(self, f, compression="zlib"):
+        """
+
+        :param f: File open for binary writing.
+        :param compression: One of FlatCAMCache.COMPRESSIONS.
+        """
+        self.f = f
+        self.compression = compression
+        self.n_objects = 0
+        self.f.write(FILE_HEADER.pack(MAGIC, FORMAT_VERSION))
+
+    def write_record(self, tag, payload):
+        self.f.write(RECORD.pack(tag, len(payload), zlib.crc32(payload)))
+        self.f.write(payload)
+
+    def write_project(self, options, version):
+        """
+        :param options: Project options.
+        :param version: Application version.
+        :return: None
+        """
+        self.write_record(TAG_PROJECT, pack_attrs({"options": options, "version": version}, self.compression))
+
+    def write_object(self, d, lazy_attrs=()):
+        """
+        :param d: Object as returned by its to_dict().
+        :param lazy_attrs: Names of the geometry attributes, these are
+            written to a separate record.
+        :return: None
+        """
+        attrs, geometry = split_attrs(d, lazy_attrs)
+        self.write_record(TAG_OBJECT, pack_attrs(attrs, self.compression))
+        self.write_record(TAG_GEOMETRY, pack_attrs(geometry, self.compression))
+        self.n_objects += 1
+
+    def close(self):
+        """
+        Marks the project as complete. Does not close the file.
+
+        :return: None
+        """
+        self.write_record(TAG_END, COUNT.pack(self.n_objects))
+
+
+class ProjectReader(object):
+    """
+    Reads a binary project written by ProjectWriter.
+    """
+
+    def __init__(self, f):
+        """
+
+        :param f: File open for binary reading.
+        :raises ValueError: If it is not a binary project.
+        """
+        self.f = f
+        header = self.f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            raise ValueError("Not a binary project")
+        magic, version = FILE_HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a binary project or unsupported version")
+
+    def records(self):
+        """
+        Iterates over the records in the file, checking the
+        checksum of each one. Stops after the END record.
+
+        :return: Generator of (tag, payload).
+        :raises ValueError: If the file is truncated or corrupt.
+        """
+        while True:
+            header = self.f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                raise ValueError("Truncated project file")
+            tag, length, crc = RECORD.unpack(header)
+            payload = self.f.read(length)
+            if len(payload) < length:
+                raise ValueError("Truncated project file")
+            if zlib.crc32(payload) != crc:
+                raise ValueError("Checksum mismatch in %s record" % tag.decode('ascii', 'replace').strip())
+            yield tag, payload
+            if tag == TAG_END:
+                return
+
+    def read(self):
+        """
+        Reads the project options and then the objects as they
+        are requested. The geometry of each object is decoded
+        only when its load function is called.
+
+        :return: Project dictionary with "options" and "version"
+            and a generator of (attributes, load) for every object.
+            load() returns the geometry attributes.
+        :raises ValueError: If the file is truncated or corrupt.
+        """
+        records = self.records()
+        tag, payload = next(records)
+        if tag != TAG_PROJECT:
+            raise ValueError("Project record missing")
+
+        def objects():
+            attrs = None
+            for tag_, payload_ in records:
+                if tag_ == TAG_OBJECT:
+                    attrs = unpack_attrs(payload_)
+                elif tag_ == TAG_GEOMETRY:
+                    if attrs is None:
+                        raise ValueError("Geometry record without object")
+                    yield attrs, lambda data=payload_: unpack_attrs(data)
+                    attrs = None
+
+        return unpack_attrs(payload), objects()
+
+    def verify(self):
+        """
+        Checks the checksum of every record, without decoding them.
+
+        :return: Number of objects in the project.
+        :rtype: int
+        :raises ValueError: If the file is truncated or corrupt.
+        """
+        n_objects = 0
+        for tag, payload in self.records():
+            if tag == TAG_OBJECT:
+                n_objects += 1
+            elif tag == TAG_END and COUNT.unpack(payload)[0] != n_objects:
+                raise ValueError("Object count mismatch")
+        return n_objects
@@ -12,6 +12,12 @@ import inspect  # TODO: Remove
 import FlatCAMApp
 from PyQt5 import QtGui, QtCore, QtWidgets
 from PyQt5.QtCore import Qt
+from math import isfinite
+from rtree import index as rtindex
+from shapely.geometry import GeometryCollection, Point, box
+from shapely.geometry.base import BaseGeometry
+import shapely.affinity as affinity
+from shapely.prepared import prep
 
 
 class KeySensitiveListView(QtWidgets.QTreeView):
@@ -155,6 +161,180 @@ class TreeItem:
         del self.icon
 
 
+class ObjectIndex:
+    """
+    Spatial index of the collection objects for picking them on canvas.
+    Objects are indexed by the bounding box in their options, candidates
+    are then tested against their prepared geometry.
+    """
+
+    def __init__(self):
+        # Python RTree Index
+        self.rti = rtindex.Index()
+
+        # Index id and indexed bounds of the objects by id(obj)
+        self.entries = {}
+
+        # Objects by index id. Index ids grow with insertion order,
+        # so hits are sorted like the objects were added.
+        self.objects = {}
+        self.next_id = 0
+
+        # Prepared geometry for exact hit tests by id(obj), built on first
+        # test and kept with the key of the source geometry.
+        self.hit_geometry = {}
+
+    @staticmethod
+    def get_bounds(obj):
+        """
+        Bounding box of the object from its options.
+
+        :param obj: FlatCAMObj
+        :return: (xmin, ymin, xmax, ymax) or None if the object has no bounds.
+        """
+        try:
+            bounds = tuple(float(obj.options[key]) for key in ('xmin', 'ymin', 'xmax', 'ymax'))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        # Empty objects have infinite or undefined bounds.
+        if not all(isfinite(b) for b in bounds) or bounds[0] > bounds[2] or bounds[1] > bounds[3]:
+            return None
+        return bounds
+
+    def update(self, obj):
+        """
+        Inserts the object or moves it to its current bounds.
+
+        :param obj: FlatCAMObj
+        :return: None
+        """
+        entry = self.entries.get(id(obj))
+        if entry is None:
+            idx = self.next_id
+            self.next_id += 1
+        else:
+            idx, bounds = entry
+            if bounds is not None:
+                self.rti.delete(idx, bounds)
+
+        bounds = self.get_bounds(obj)
+        if bounds is not None:
+            self.rti.insert(idx, bounds)
+        self.entries[id(obj)] = (idx, bounds)
+        self.objects[idx] = obj
+        self.hit_geometry.pop(id(obj), None)
+
+    def remove(self, obj):
+        entry = self.entries.pop(id(obj), None)
+        if entry is None:
+            return
+
+        idx, bounds = entry
+        if bounds is not None:
+            self.rti.delete(idx, bounds)
+        del self.objects[idx]
+        self.hit_geometry.pop(id(obj), None)
+
+    def clear(self):
+        self.rti = rtindex.Index()
+        self.entries = {}
+        self.objects = {}
+        self.hit_geometry = {}
+
+    @staticmethod
+    def get_geometry(obj):
+        """
+        Geometry drawn for the object: its solid geometry or
+        the solid geometry of its tools.
+
+        :param obj: FlatCAMObj
+        :return: List of geometry parts, key of the source geometry.
+        """
+        sources = [getattr(obj, 'solid_geometry', None)]
+        if getattr(obj, 'multigeo', False):
+            sources += [tool.get('solid_geometry') for tool in obj.tools.values()]
+        sources += [tool.get('solid_geometry') for tool in getattr(obj, 'cnc_tools', {}).values()]
+
+        parts = []
+        stack = list(sources)
+        while stack:
+            geo = stack.pop()
+            if isinstance(geo, BaseGeometry):
+                if not geo.is_empty:
+                    parts.append(geo)
+            elif isinstance(geo, (list, tuple)):
+                stack.extend(geo)
+            elif isinstance(geo, dict):
+                stack.extend(geo.values())
+
+        return parts, tuple(id(geo) for geo in sources)
+
+    def hit(self, obj, shape):
+        """
+        Exact hit test of the object geometry.
+
+        :param obj: FlatCAMObj
+        :param shape: Shapely geometry to test, click point or selection area.
+        :return: True if the object geometry intersects the shape. Objects without
+            geometry are hit by their bounding box. For instanced panels every
+            instance is tested.
+        """
+        parts, key = self.get_geometry(obj)
+        if not parts:
+            return True
+
+        cached = self.hit_geometry.get(id(obj))
+        if cached is None or cached[0] != key:
+            cached = (key, prep(parts[0] if len(parts) == 1 else GeometryCollection(parts)))
+            self.hit_geometry[id(obj)] = cached
+
+        instances = getattr(obj, 'instances', None)
+        if not instances:
+            return cached[1].intersects(shape)
+
+        # Instances are translated copies of the stored geometry, so the
+        # shape is moved back onto it instead.
+        return any(cached[1].intersects(affinity.translate(shape, xoff=-dx, yoff=-dy)) for dx, dy in instances)
+
+    def at(self, x, y, tolerance=0.0):
+        """
+        Objects under a point.
+
+        :param x: X coordinate of the point.
+        :param y: Y coordinate of the point.
+        :param tolerance: Distance from the point within which the object is hit.
+        :return: List of objects, in insertion order.
+        """
+        area = Point(x, y).buffer(tolerance, 4) if tolerance > 0 else Point(x, y)
+        candidates = sorted(self.rti.intersection((x - tolerance, y - tolerance, x + tolerance, y + tolerance)))
+        return [self.objects[idx] for idx in candidates if self.hit(self.objects[idx], area)]
+
+    def in_area(self, bounds, enclosed=False):
+        """
+        Objects in a rectangular selection area.
+
+        :param bounds: (xmin, ymin, xmax, ymax) of the area.
+        :param enclosed: If True, objects must be completely inside the area,
+            else they must touch it.
+        :return: List of objects, in insertion order.
+        """
+        xmin, ymin, xmax, ymax = bounds
+        area = box(xmin, ymin, xmax, ymax)
+
+        objects = []
+        for idx in sorted(self.rti.intersection(bounds)):
+            obj = self.objects[idx]
+
+            # Geometry is inside the area if its bounding box is.
+            oxmin, oymin, oxmax, oymax = self.entries[id(obj)][1]
+            if xmin <= oxmin and oxmax <= xmax and ymin <= oymin and oymax <= ymax:
+                objects.append(obj)
+            elif not enclosed and self.hit(obj, area):
+                objects.append(obj)
+        return objects
+
+
 class ObjectCollection(QtCore.QAbstractItemModel):
     """
     Object storage and management.
@@ -218,6 +398,9 @@ class ObjectCollection(QtCore.QAbstractItemModel):
         # tasks know that they have to wait until available.
         self.promises = set()
 
+        # Spatial index of the objects for picking on canvas
+        self.spatial_index = ObjectIndex()
+
         ### View
         self.view = KeySensitiveListView(app)
         self.view.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
@@ -558,6 +741,7 @@ class ObjectCollection(QtCore.QAbstractItemModel):
 
         # Append new item
         obj.item = TreeItem(None, self.icons[obj.kind], obj, group)
+        self.spatial_index.update(obj)
 
         # Required after appending (Qt MVC)
         self.endInsertRows()
@@ -648,6 +832,7 @@ class ObjectCollection(QtCore.QAbstractItemModel):
 
         self.beginRemoveRows(self.index(group.row(), 0, QtCore.QModelIndex()), active.row(), active.row())
 
+        self.spatial_index.remove(active.obj)
         group.remove_child(active)
 
         # after deletion of object store the current list of objects into the self.app.all_objects_list
@@ -666,6 +851,7 @@ class ObjectCollection(QtCore.QAbstractItemModel):
         self.checked_indexes = []
         for group in self.root_item.child_items:
             group.remove_children()
+        self.spatial_index.clear()
 
         self.endResetModel()
 
@@ -10,7 +10,7 @@ from PyQt5 import QtCore
 
 import logging
 from VisPyCanvas import VisPyCanvas
-from VisPyVisuals import ShapeGroup, ShapeCollection, TextCollection, TextGroup, Cursor
+from VisPyVisuals import ShapeGroup, ShapeCollection, ToolpathCollection, TextCollection, TextGroup, Cursor
 from vispy.scene.visuals import InfiniteLine, Line
 import numpy as np
 from vispy.geometry import Rect
@@ -72,6 +72,7 @@ class PlotCanvas(QtCore.QObject):
 
         self.shape_collection = self.new_shape_collection()
         self.app.pool_recreated.connect(self.on_pool_recreated)
+        self.toolpath_collection = self.new_toolpath_collection()
         self.text_collection = self.new_text_collection()
 
         # TODO: Should be setting to show/hide CNC job annotations (global or per object)
@@ -169,10 +170,18 @@ class PlotCanvas(QtCore.QObject):
         return ShapeGroup(self.shape_collection)
 
     def new_shape_collection(self, **kwargs):
-        # sc = ShapeCollection(parent=self.vispy_canvas.view.scene, pool=self.app.pool, **kwargs)
-        # self.shape_collections.append(sc)
-        # return sc
-        return ShapeCollection(parent=self.vispy_canvas.view.scene, pool=self.app.pool, **kwargs)
+        sc = ShapeCollection(parent=self.vispy_canvas.view.scene, pool=self.app.pool, **kwargs)
+
+        # Level of detail and culled tiles follow the camera
+        self.vispy_canvas.view.camera.events.view_change.connect(lambda event: sc.set_view(event.rect,
+                                                                                           event.pixel_size))
+        return sc
+
+    def new_toolpath_group(self):
+        return ShapeGroup(self.toolpath_collection)
+
+    def new_toolpath_collection(self, **kwargs):
+        return ToolpathCollection(parent=self.vispy_canvas.view.scene, **kwargs)
 
     def new_cursor(self):
         c = Cursor(pos=np.empty((0, 2)), parent=self.vispy_canvas.view.scene)
@@ -193,8 +202,8 @@ class PlotCanvas(QtCore.QObject):
         if not rect:
             rect = Rect(-1, -1, 20, 20)
             try:
-                rect.left, rect.right = self.shape_collection.bounds(axis=0)
-                rect.bottom, rect.top = self.shape_collection.bounds(axis=1)
+                rect.left, rect.right = self.bounds(axis=0)
+                rect.bottom, rect.top = self.bounds(axis=1)
             except TypeError:
                 pass
 
@@ -202,6 +211,28 @@ class PlotCanvas(QtCore.QObject):
 
         self.shape_collection.unlock_updates()
 
+    def bounds(self, axis):
+        """
+        Bounds of the shapes and tool paths along an axis.
+
+        :param axis: 0 for X, 1 for Y.
+        :return: (min, max) or None if nothing is plotted.
+        """
+        bounds = [b for b in (self.shape_collection.bounds(axis=axis),
+                              self.toolpath_collection.bounds(axis=axis)) if b is not None]
+        if not bounds:
+            return None
+        return min(b[0] for b in bounds), max(b[1] for b in bounds)
+
+    def pixel_size(self):
+        """
+        Size of a screen pixel in data units.
+
+        :return: float
+        """
+        view = self.vispy_canvas.view
+        return abs(view.camera.rect.width) / max(view.size[0], 1)
+
     def fit_center(self, loc, rect=None):
 
         # Lock updates in other threads
@@ -222,6 +253,7 @@ class PlotCanvas(QtCore.QObject):
 
     def redraw(self):
         self.shape_collection.redraw([])
+        self.toolpath_collection.redraw()
         self.text_collection.redraw()
 
     def on_pool_recreated(self, pool):
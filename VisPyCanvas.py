@@ -3,6 +3,7 @@ from PyQt5.QtGui import QPalette
 import vispy.scene as scene
 from vispy.scene.cameras.base_camera import BaseCamera
 from vispy.color import Color
+from vispy.util.event import Event
 import time
 
 white = Color("#ffffff" )
@@ -82,6 +83,18 @@ class Camera(scene.PanZoomCamera):
         # Default mouse button for panning is RMB
         self.pan_button_setting = "2"
 
+        # Visible area and pixel size after zoom, pan or resize
+        self.events.add(view_change=Event)
+
+    def _update_transform(self):
+        super(Camera, self)._update_transform()
+
+        rect, width = self._real_rect, self._viewbox.size[0]
+        if width > 0:
+            self.events.view_change(rect=(min(rect.left, rect.right), min(rect.bottom, rect.top),
+                                          max(rect.left, rect.right), max(rect.bottom, rect.top)),
+                                    pixel_size=abs(rect.width) / width)
+
     def zoom(self, factor, center=None):
         center = center if (center is not None) else self.center
         super(Camera, self).zoom(factor, center)
@@ -1,4 +1,11 @@
 from OpenGL import GLU
+import numpy as np
+import shapely
+
+try:
+    import mapbox_earcut
+except ImportError:
+    mapbox_earcut = None
 
 
 class GLUTess:
@@ -21,7 +28,10 @@ class GLUTess:
         pass
 
     def _on_combine(self, coords, data, weight):
-        return (coords[0], coords[1], coords[2])
+        # New vertex where edges cross, referenced by index like the others.
+        self.pts.append((coords[0], coords[1]))
+        self.vertex_index += 1
+        return self.vertex_index - 1
 
     def _on_error(self, errno):
         print("GLUTess error:", errno)
@@ -88,3 +98,129 @@ class GLUTess:
         GLU.gluDeleteTess(tess)
 
         return self.tris, self.pts
+
+
+def triangulate_polygons(polygons):
+    """
+    Triangulates many polygons at once, see triangulate_polygons_packed()
+    :param polygons: list
+        shapely.geometry.Polygon objects
+    :return: list
+        (vertices, tris) for every polygon: (n, 2) float32 vertices,
+        (m, 3) uint32 triangle vertex indices
+    """
+    vertices, tris, vertex_starts, vertex_counts, tri_starts, tri_counts = triangulate_polygons_packed(polygons)
+
+    return [(vertices[vs:vs + vc], tris[ts:ts + tc] - np.uint32(vs))
+            for vs, vc, ts, tc in zip(vertex_starts, vertex_counts, tri_starts, tri_counts)]
+
+
+def triangulate_polygons_packed(polygons):
+    """
+    Triangulates many polygons at once.
+    Coordinates of all the rings are packed into one array. Convex polygons
+    without holes (pads, drills) are fan triangulated together with NumPy.
+    Other polygons are triangulated by earcut (mapbox_earcut package) if it
+    is installed, by GLU otherwise.
+    :param polygons: list
+        shapely.geometry.Polygon objects
+    :return: tuple
+        (n, 2) float32 vertices, (m, 3) uint32 triangles indexing vertices,
+        then first vertex, vertex count, first triangle and triangle count of every polygon
+    """
+    vertex_counts = np.zeros(len(polygons), dtype=np.int64)
+    tri_counts = np.zeros(len(polygons), dtype=np.int64)
+
+    polygons = np.asarray(polygons, dtype=object)
+    indexes = np.flatnonzero(~shapely.is_empty(polygons)) if len(polygons) > 0 else np.empty(0, dtype=np.int64)
+    polygons = polygons[indexes]
+
+    exteriors = shapely.get_exterior_ring(polygons)
+    coords = shapely.get_coordinates(exteriors)
+    counts = shapely.get_num_coordinates(exteriors)
+    starts = np.cumsum(counts) - counts
+
+    # Open rings: drop closing vertex
+    counts = counts - 1
+    keep = np.ones(len(coords), dtype=bool)
+    keep[starts + counts] = False
+    coords = coords[keep]
+    starts = starts - np.arange(len(starts))
+
+    # Turn of every vertex: cross product of edges to and from it
+    vertex_ring = np.repeat(np.arange(len(counts)), counts)
+    following = np.arange(len(coords)) + 1
+    last = starts + counts - 1
+    following[last] = starts
+    previous = np.arange(len(coords)) - 1
+    previous[starts] = last
+    edge_in = coords - coords[previous]
+    edge_out = coords[following] - coords
+    cross = edge_in[:, 0] * edge_out[:, 1] - edge_in[:, 1] * edge_out[:, 0]
+    dot = (edge_in * edge_out).sum(axis=1)
+
+    # Convex: all turns one way, turning once around
+    turns = np.zeros(len(counts))
+    np.add.at(turns, vertex_ring, np.arctan2(cross, dot))
+    left = np.zeros(len(counts), dtype=int)
+    np.add.at(left, vertex_ring, cross > 0)
+    right = np.zeros(len(counts), dtype=int)
+    np.add.at(right, vertex_ring, cross < 0)
+    convex = (shapely.get_num_interior_rings(polygons) == 0) & (counts >= 3) & \
+             ((left == 0) | (right == 0)) & (np.abs(np.abs(turns) - 2 * np.pi) < 1e-3)
+
+    # Vertices of convex rings, fans from first vertex of every ring
+    vertices = [coords[np.repeat(convex, counts)].astype(np.float32)]
+    counts = counts[convex]
+    starts = np.cumsum(counts) - counts
+    fans = counts - 2
+    fan_ring = np.repeat(np.arange(len(counts)), fans)
+    fan_step = np.arange(fans.sum()) - np.repeat(np.cumsum(fans) - fans, fans)
+    tris = [np.stack((starts[fan_ring], starts[fan_ring] + fan_step + 1,
+                      starts[fan_ring] + fan_step + 2), axis=1).astype(np.uint32)]
+    vertex_counts[indexes[convex]] = counts
+    tri_counts[indexes[convex]] = fans
+    vertex_starts = np.zeros(len(vertex_counts), dtype=np.int64)
+    tri_starts = np.zeros(len(tri_counts), dtype=np.int64)
+    vertex_starts[indexes[convex]] = starts
+    tri_starts[indexes[convex]] = np.cumsum(fans) - fans
+
+    # Other polygons after them
+    vertex_end, tri_end = len(vertices[0]), len(tris[0])
+    triangulate = earcut_triangulate if mapbox_earcut is not None else glu_triangulate
+    for i in indexes[~convex]:
+        v, t = triangulate(polygons[np.searchsorted(indexes, i)])
+        vertices.append(v)
+        tris.append(t + np.uint32(vertex_end))
+        vertex_starts[i], vertex_counts[i], tri_starts[i], tri_counts[i] = vertex_end, len(v), tri_end, len(t)
+        vertex_end += len(v)
+        tri_end += len(t)
+
+    return np.concatenate(vertices), np.concatenate(tris), vertex_starts, vertex_counts, tri_starts, tri_counts
+
+
+def earcut_triangulate(polygon):
+    """
+    Triangulates polygon with mapbox_earcut package
+    :param polygon: shapely.geometry.Polygon
+    :return: tuple
+        (vertices, tris) like triangulate_polygons()
+    """
+    rings = [np.asarray(polygon.exterior.coords)[:-1]] + [np.asarray(i.coords)[:-1] for i in polygon.interiors]
+    vertices = np.ascontiguousarray(np.concatenate(rings)[:, :2])
+    ends = np.cumsum([len(r) for r in rings]).astype(np.uint32)
+    tris = mapbox_earcut.triangulate_float64(vertices, ends)
+    return vertices.astype(np.float32), np.asarray(tris, dtype=np.uint32).reshape((-1, 3))
+
+
+def glu_triangulate(polygon):
+    """
+    Triangulates polygon with GLUTess
+    :param polygon: shapely.geometry.Polygon
+    :return: tuple
+        (vertices, tris) like triangulate_polygons()
+    """
+    tris, pts = GLUTess().triangulate(polygon)
+    if len(pts) == 0 or len(tris) == 0:
+        return np.empty((0, 2), dtype=np.float32), np.empty((0, 3), dtype=np.uint32)
+    return np.asarray([pt[:2] for pt in pts], dtype=np.float32), np.asarray(tris, dtype=np.uint32).reshape((-1, 3))
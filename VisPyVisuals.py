@@ -1,11 +1,14 @@
-from vispy.visuals import CompoundVisual, LineVisual, MeshVisual, TextVisual, MarkersVisual
+from vispy.visuals import CompoundVisual, LineVisual, MeshVisual, TextVisual, MarkersVisual, Visual
 from vispy.scene.visuals import VisualNode, generate_docstring, visuals
-from vispy.gloo import set_state
+from vispy import gloo
 from vispy.color import Color
-from shapely.geometry import Polygon, LineString, LinearRing
 import threading
+import math
+from functools import partial, lru_cache
+import bisect
 import numpy as np
-from VisPyTesselators import GLUTess
+import shapely
+from VisPyTesselators import glu_triangulate, triangulate_polygons_packed
 
 
 class FlatCAMLineVisual(LineVisual):
@@ -21,99 +24,657 @@ class FlatCAMLineVisual(LineVisual):
         self.update()
 
 
-def _update_shape_buffers(data, triangulation='glu'):
+def _update_shape_buffers(data, triangulation='earcut'):
     """
-    Translates Shapely geometry to internal buffers for speedup redraws
+    Translates Shapely geometry to internal buffers for speedup redraws.
+    Buffers are numpy arrays, so they are merged quickly on redraw.
     :param data: dict
         Input shape data
     :param triangulation: str
         Triangulation engine
+        'earcut' - NumPy fans for convex polygons, earcut or GLU for others (see triangulate_polygons)
+        'glu' - GLU tessellator for every polygon
     """
-    mesh_vertices = []                                              # Vertices for mesh
-    mesh_tris = []                                                  # Faces for mesh
-    mesh_colors = []                                                # Face colors
-    line_pts = []                                                   # Vertices for line
-    line_colors = []                                                # Line color
-
-    geo, color, face_color, tolerance = data['geometry'], data['color'], data['face_color'], data['tolerance']
-
-    if geo is not None and not geo.is_empty:
-        simple = geo.simplify(tolerance) if tolerance else geo      # Simplified shape
-        pts = []                                                    # Shape line points
-        tri_pts = []                                                # Mesh vertices
-        tri_tris = []                                               # Mesh faces
-
-        if type(geo) == LineString:
-            # Prepare lines
-            pts = _linestring_to_segments(list(simple.coords))
-
-        elif type(geo) == LinearRing:
-            # Prepare lines
-            pts = _linearring_to_segments(list(simple.coords))
-
-        elif type(geo) == Polygon:
-            # Prepare polygon faces
-            if face_color is not None:
-                if triangulation == 'glu':
-                    gt = GLUTess()
-                    tri_tris, tri_pts = gt.triangulate(simple)
-                else:
-                    print("Triangulation type '%s' isn't implemented. Drawing only edges." % triangulation)
+    return _update_shapes_buffers([data], triangulation)[0]
+
 
-            # Prepare polygon edges
-            if color is not None:
-                pts = _linearring_to_segments(list(simple.exterior.coords))
-                for ints in simple.interiors:
-                    pts += _linearring_to_segments(list(ints.coords))
+def _update_shapes_buffers(datas, triangulation='earcut', lods=()):
+    """
+    Translates many shapes to internal buffers, see _update_shape_buffers.
+    Polygon faces of all the shapes are triangulated together.
+    :param datas: list
+        Input shapes data
+    :param triangulation: str
+        Triangulation engine
+    :param lods: tuple
+        Tolerance multipliers of coarser levels of detail. Buffers of level n + 1
+        are stored in data['lod'][n], for shapes with tolerance only
+    :return: list
+        Translated shapes data
+    """
+    geometries = [d['geometry'] for d in datas]
 
-        # Appending data for mesh
-        if len(tri_pts) > 0 and len(tri_tris) > 0:
-            mesh_tris += tri_tris
-            mesh_vertices += tri_pts
-            mesh_colors += [Color(face_color).rgba] * (len(tri_tris) // 3)
+    levels = []
+    simples = geometries
+    for factor in (1, ) + tuple(lods):
+        tolerances = [d['tolerance'] * factor if d['tolerance'] else None for d in datas]
+        if factor != 1:
+            simples = [g if t else None for g, t in zip(simples, tolerances)]
 
-        # Appending data for line
-        if len(pts) > 0:
-            line_pts += pts
-            line_colors += [Color(color).rgba] * len(pts)
+        # Coarser level simplifies previous one, it has less vertices
+        buffers, simples = _shapes_buffers(datas, simples, tolerances, triangulation)
+        levels.append(buffers)
 
-    # Store buffers
-    data['line_pts'] = line_pts
-    data['line_colors'] = line_colors
-    data['mesh_vertices'] = mesh_vertices
-    data['mesh_tris'] = mesh_tris
-    data['mesh_colors'] = mesh_colors
+    bounds = shapely.bounds(np.array(geometries, dtype=object)) if datas else []
 
-    # Clear shapely geometry
-    del data['geometry']
+    for n, data in enumerate(datas):
+        data.update(levels[0][n])
+        data['lod'] = [level[n] for level in levels[1:]] if data['tolerance'] else []
+        data['bounds'] = None if np.isnan(bounds[n]).any() else tuple(bounds[n])
 
-    return data
+        # Clear shapely geometry
+        del data['geometry']
 
+    return datas
 
-def _linearring_to_segments(arr):
-    # Close linear ring
+
+def _shapes_buffers(datas, geometries, tolerances, triangulation):
+    """
+    Buffers of shapes at one level of detail. Lines and faces of all the
+    shapes are built in packed arrays, then split by shape.
+    :param datas: list
+        Input shapes data, for colors
+    :param geometries: list
+        Shapely geometry of every shape or None
+    :param tolerances: list
+        Simplifying tolerance of every shape or None
+    :param triangulation: str
+        Triangulation engine
+    :return: tuple
+        Buffers dict of every shape, simplified geometries
+    """
+    n = len(datas)
+    geometries, shapes = np.empty(n, dtype=object), geometries
+    geometries[:] = shapes
+    colors = [d['color'] for d in datas]
+    face_colors = [d['face_color'] for d in datas]
+
+    # Simplified shapes
+    simples = geometries.copy()
+    simplify = np.array([bool(t) and g is not None for g, t in zip(geometries, tolerances)], dtype=bool)
+    if simplify.any():
+        simples[simplify] = shapely.simplify(geometries[simplify], [t for t, s in zip(tolerances, simplify) if s])
+
+    types = shapely.get_type_id(geometries)
+    valid = (types >= 0) & ~shapely.is_empty(geometries)
+    lines = np.flatnonzero(valid & ((types == 1) | (types == 2)))  # LineString, LinearRing
+    polygons = np.flatnonzero(valid & ((types == 3) | (types == 6)))  # Polygon, MultiPolygon
+
+    # Polygons of polygon shapes
+    parts, part_owners = shapely.get_parts(simples[polygons], return_index=True)
+    part_owners = polygons[part_owners]
+    keep = shapely.get_type_id(parts) == 3
+    parts, part_owners = parts[keep], part_owners[keep]
+
+    # Prepare lines: line shapes and polygon edges
+    has_color = np.array([c is not None for c in colors], dtype=bool)
+    edged = has_color[part_owners]
+    rings, ring_parts = shapely.get_rings(parts[edged], return_index=True)
+    linear = np.concatenate((simples[lines], rings))
+    linear_owners = np.concatenate((lines, part_owners[edged][ring_parts]))
+    order = np.argsort(linear_owners, kind='stable')
+    coords, coord_linear = shapely.get_coordinates(linear[order], return_index=True)
+    segment = coord_linear[1:] == coord_linear[:-1]
+    line_pts = np.empty((2 * segment.sum(), 2), dtype=np.float32)
+    line_pts[0::2] = coords[:-1][segment]
+    line_pts[1::2] = coords[1:][segment]
+    line_counts = 2 * np.bincount(linear_owners[order][coord_linear[:-1][segment]], minlength=n)
+
+    # Prepare polygon faces
+    has_face = np.array([c is not None for c in face_colors], dtype=bool)
+    faced = has_face[part_owners]
+    face_owners = part_owners[faced]
+    if triangulation == 'glu':
+        faces = _pack_faces([glu_triangulate(p) for p in parts[faced]])
+    elif triangulation == 'earcut':
+        faces = triangulate_polygons_packed(parts[faced])
+    else:
+        if faced.any():
+            print("Triangulation type '%s' isn't implemented. Drawing only edges." % triangulation)
+        faces = _pack_faces([])
+        face_owners = face_owners[:0]
+
+    # Faces in shape order, triangles index vertices of their shape
+    vertices, tris, vertex_starts, face_vertex_counts, tri_starts, face_tri_counts = faces
+    vertex_order = _ranges(vertex_starts, face_vertex_counts)
+    renumber = np.empty(len(vertices), dtype=np.int64)
+    renumber[vertex_order] = np.arange(len(vertex_order))
+    mesh_vertices = vertices[vertex_order]
+    vertex_counts = np.bincount(face_owners, weights=face_vertex_counts, minlength=n).astype(np.int64)
+    tri_counts = np.bincount(face_owners, weights=face_tri_counts, minlength=n).astype(np.int64)
+    mesh_tris = (renumber[tris[_ranges(tri_starts, face_tri_counts)]] -
+                 np.repeat(np.cumsum(vertex_counts) - vertex_counts, tri_counts)[:, None]).astype(np.uint32)
+
+    line_colors = _repeat_colors(colors, line_counts)
+    mesh_colors = _repeat_colors(face_colors, vertex_counts)
+
+    line_pts, line_colors = _split(line_counts, line_pts, line_colors)
+    mesh_vertices, mesh_colors = _split(vertex_counts, mesh_vertices, mesh_colors)
+    mesh_tris, = _split(tri_counts, mesh_tris)
+
+    return [{'line_pts': line_pts[k], 'line_colors': line_colors[k],
+             'mesh_vertices': mesh_vertices[k], 'mesh_tris': mesh_tris[k], 'mesh_colors': mesh_colors[k]}
+            for k in range(n)], list(simples)
+
+
+def _split(counts, *arrays):
     """
-    Translates linear ring to line segments
-    :param arr: numpy.array
-        Array of linear ring vertices
+    Splits packed arrays by shape
+    :param counts: numpy.array
+        Rows of every shape
+    :return: list
+        List of pieces for every array
+    """
+    ends = np.cumsum(counts).tolist()
+    starts = [0] + ends[:-1]
+    return [[a[s:e] for s, e in zip(starts, ends)] for a in arrays]
+
+
+def _repeat_colors(colors, counts):
+    """
+    :param colors: list
+        Color of every shape, any accepted by vispy.color.Color
+    :param counts: numpy.array
+        Vertices of every shape
     :return: numpy.array
-        Line segments
+        (counts.sum(), 4) packed vertex colors
     """
-    if arr[0] != arr[-1]:
-        arr.append(arr[0])
+    rgba = np.zeros((len(colors), 4), dtype=np.float32)
+    for k in np.flatnonzero(counts):
+        try:
+            rgba[k] = _rgba(colors[k])
+        except TypeError:                                           # Unhashable color
+            rgba[k] = Color(colors[k]).rgba
+    return np.repeat(rgba, counts, axis=0)
 
-    return _linestring_to_segments(arr)
+
+def _pack_faces(faces):
+    """
+    :param faces: list
+        (vertices, tris) of every polygon
+    :return: tuple
+        Faces packed like triangulate_polygons_packed() returns
+    """
+    vertex_counts = np.array([len(v) for v, t in faces], dtype=np.int64)
+    tri_counts = np.array([len(t) for v, t in faces], dtype=np.int64)
+    vertex_starts = np.cumsum(vertex_counts) - vertex_counts
+    return (np.concatenate([_EMPTY_PTS] + [v for v, t in faces]),
+            np.concatenate([_EMPTY_TRIS] + [t + np.uint32(s) for (v, t), s in zip(faces, vertex_starts)]),
+            vertex_starts, vertex_counts, np.cumsum(tri_counts) - tri_counts, tri_counts)
 
 
-def _linestring_to_segments(arr):
+def _ranges(starts, counts):
     """
-    Translates line strip to segments
-    :param arr: numpy.array
-        Array of line strip vertices
     :return: numpy.array
-        Line segments
+        Concatenated ranges starts[i] ... starts[i] + counts[i] - 1
     """
-    return [arr[i // 2] for i in range(0, len(arr) * 2)][1:-1]
+    return np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+
+
+_EMPTY_PTS = np.empty((0, 2), dtype=np.float32)
+_EMPTY_TRIS = np.empty((0, 3), dtype=np.uint32)
+
+
+@lru_cache(maxsize=256)
+def _rgba(color):
+    return Color(color).rgba
+
+
+# Z distance between tool path layers. The camera divides z by its
+# depth_value (1e6), so layers stay apart in a 16 bit depth buffer.
+_TOOLPATH_LAYER_DEPTH = 1000.0
+
+
+def _toolpath_buffers(coords, index, layers, width, colors, face_colors, join_steps=8):
+    """
+    Builds the buffers for drawing tool paths with the width of the
+    tool: a quad for every segment and a polygon with ``join_steps``
+    sides for every vertex, which closes the joins and rounds the ends.
+    Everything is built with array operations, no Shapely buffering.
+
+    Quads and joins overlap, so every layer gets its own depth, nearer
+    for higher layers. With the depth test the mesh fills each pixel
+    once per layer and translucent faces are not darker at the joins.
+
+    :param coords: numpy.array
+        (n, 2) vertices of all the paths, one after the other
+    :param index: numpy.array
+        Path number of every vertex, non decreasing
+    :param layers: numpy.array
+        Layer of every path. Higher layers are drawn on top
+    :param width: float
+        Tool diameter. 0 draws the center lines only
+    :param colors: numpy.array
+        (layers, 4) line color of every layer
+    :param face_colors: numpy.array
+        (layers, 4) face color of every layer
+    :param join_steps: int
+        Sides of the joins
+    :return: dict
+        Buffers, see ToolpathCollectionVisual
+    """
+    coords = np.asarray(coords, dtype=np.float32).reshape(-1, 2)
+    index = np.asarray(index)
+    layers = np.asarray(layers)
+    colors = np.asarray(colors, dtype=np.float32)[layers]
+    face_colors = np.asarray(face_colors, dtype=np.float32)[layers]
+
+    # Vertices in drawing order.
+    order = np.argsort(layers[index], kind='stable')
+    coords, index = coords[order], index[order]
+
+    # Segments between consecutive vertices of the same path.
+    same = np.flatnonzero(index[:-1] == index[1:])
+    p0, p1 = coords[same], coords[same + 1]
+    seg_path = index[same]
+
+    line_pts = np.empty((2 * len(same), 2), dtype=np.float32)
+    line_pts[0::2], line_pts[1::2] = p0, p1
+    line_colors = np.repeat(colors[seg_path], 2, axis=0)
+
+    if not width > 0:
+        return {'line_pts': line_pts, 'line_colors': line_colors,
+                'mesh_vertices': np.empty((0, 2), dtype=np.float32), 'mesh_tris': np.empty((0, 3), dtype=np.uint32),
+                'mesh_colors': np.empty((0, 4), dtype=np.float32), 'mesh_depth': np.empty(0, dtype=np.float32)}
+
+    radius = width / 2.0
+
+    # Quads
+    d = p1 - p0
+    length = np.hypot(d[:, 0], d[:, 1])
+    keep = length > 0
+    p0, p1, seg_path = p0[keep], p1[keep], seg_path[keep]
+    normal = np.column_stack((-d[keep, 1], d[keep, 0])) * (radius / length[keep])[:, None]
+    quad_vertices = np.stack((p0 + normal, p0 - normal, p1 - normal, p1 + normal), axis=1).reshape(-1, 2)
+    quad_tris = (np.arange(len(p0), dtype=np.uint32)[:, None] * 4 +
+                 np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)).reshape(-1, 3)
+
+    # Joins, a triangle fan around every vertex.
+    angles = np.linspace(0, 2 * np.pi, join_steps, endpoint=False)
+    ring = np.column_stack((np.cos(angles), np.sin(angles))).astype(np.float32) * radius
+    join_vertices = np.concatenate((coords[:, None, :], coords[:, None, :] + ring[None, :, :]),
+                                   axis=1).reshape(-1, 2)
+    fan = np.column_stack((np.zeros(join_steps), np.arange(1, join_steps + 1),
+                           np.roll(np.arange(1, join_steps + 1), -1))).astype(np.uint32)
+    join_tris = (np.arange(len(coords), dtype=np.uint32)[:, None, None] * (join_steps + 1) + fan).reshape(-1, 3)
+
+    # Joins and quads of one path together, paths in drawing order.
+    tris = np.concatenate((join_tris, quad_tris + len(join_vertices)))
+    tri_path = np.concatenate((np.repeat(index, join_steps), np.repeat(seg_path, 2)))
+    tri_order = np.argsort(layers[tri_path], kind='stable')
+    vertex_layers = np.concatenate((np.repeat(layers[index], join_steps + 1), np.repeat(layers[seg_path], 4)))
+
+    return {'line_pts': line_pts, 'line_colors': line_colors,
+            'mesh_vertices': np.concatenate((join_vertices, quad_vertices)),
+            'mesh_tris': tris[tri_order],
+            'mesh_colors': np.concatenate((np.repeat(face_colors[index], join_steps + 1, axis=0),
+                                           np.repeat(face_colors[seg_path], 4, axis=0))),
+            'mesh_depth': (-_TOOLPATH_LAYER_DEPTH * (vertex_layers + 1)).astype(np.float32)}
+
+
+def _transform_points(points, matrix):
+    """
+    Applies affine matrix to points
+    :param points: numpy.array
+        (n, 2) points
+    :param matrix: numpy.array
+        3x3 affine matrix, points are column vectors (x, y, 1)
+    :return: numpy.array
+        Transformed points of the same type
+    """
+    points = np.asarray(points)
+    if len(points) == 0:
+        return points
+    return (points[:, :2].dot(matrix[:2, :2].T) + matrix[:2, 2]).astype(points.dtype)
+
+
+def _transform_buffers(datas, matrix):
+    """
+    Applies affine matrix to translated shapes buffers in place, levels of detail
+    too. Triangulation and colors are kept, so transformed shapes are not
+    translated again. Vertices of all the shapes are transformed together.
+    :param datas: list
+        Translated shapes data
+    :param matrix: numpy.array
+        3x3 affine matrix
+    """
+    # Every vertex array of every level
+    targets = [(buffers, name) for data in datas for buffers in [data] + data.get('lod', [])
+               for name in ('mesh_vertices', 'line_pts') if buffers.get(name) is not None]
+    if targets:
+        arrays = [buffers[name] for buffers, name in targets]
+        ends = np.cumsum([len(a) for a in arrays])
+        moved = _transform_points(np.concatenate(arrays), matrix)
+        for (buffers, name), array, part in zip(targets, arrays, np.split(moved, ends[:-1])):
+            buffers[name] = part.astype(array.dtype)
+
+    # Bounds of moved bounding boxes
+    bounded = [data for data in datas if data.get('bounds') is not None]
+    if bounded:
+        bounds = np.array([data['bounds'] for data in bounded], dtype=float)
+        corners = _transform_points(bounds[:, [0, 1, 0, 3, 2, 1, 2, 3]].reshape(-1, 2), matrix).reshape(-1, 4, 2)
+        for data, lower, upper in zip(bounded, corners.min(axis=1).tolist(), corners.max(axis=1).tolist()):
+            data['bounds'] = tuple(lower + upper)
+
+
+class _BlockAllocator(object):
+    def __init__(self):
+        """
+        Hands out ranges of an append-only buffer.
+        Freed ranges are kept in a sorted free list and reused first fit,
+        adjacent free ranges are merged.
+        """
+        self.end = 0                # End of used part of buffer
+        self._free = []             # [start, size] of free ranges below end
+
+    def alloc(self, size):
+        """
+        :param size: int
+            Range length
+        :return: int
+            Range start
+        """
+        if size == 0:
+            return 0
+
+        for i, (start, free) in enumerate(self._free):
+            if free >= size:
+                if free == size:
+                    del self._free[i]
+                else:
+                    self._free[i] = [start + size, free - size]
+                return start
+
+        start = self.end
+        self.end += size
+        return start
+
+    def free(self, start, size):
+        """
+        :param start: int
+            Range start
+        :param size: int
+            Range length
+        """
+        if size == 0:
+            return
+
+        i = bisect.bisect(self._free, [start, size])
+
+        # Merge with following and preceding free ranges
+        if i < len(self._free) and self._free[i][0] == start + size:
+            size += self._free.pop(i)[1]
+        if i > 0 and sum(self._free[i - 1]) == start:
+            i -= 1
+            start, prev = self._free.pop(i)
+            size += prev
+
+        if start + size == self.end:
+            self.end = start
+        else:
+            self._free.insert(i, [start, size])
+
+    @property
+    def fragmented(self):
+        return len(self._free) > 0
+
+
+class VertexArena(object):
+    def __init__(self, index_size, capacity=1024):
+        """
+        Vertex, color and index arrays shared by many shapes.
+        Every shape occupies a range of vertices and a range of
+        indices. Removed ranges are reused by next shapes, so
+        adding or removing a shape touches only its own ranges.
+        :param index_size: int
+            Vertices per primitive, 3 for triangles, 2 for line segments
+        :param capacity: int
+            Initial length of arrays
+        """
+        self.index_size = index_size
+        self.vertices = np.full((capacity, 2), np.nan, dtype=np.float32)
+        self.colors = np.zeros((capacity, 4), dtype=np.float32)
+        self.indices = np.zeros((capacity, index_size), dtype=np.uint32)
+
+        self._vertex_blocks = _BlockAllocator()
+        self._index_blocks = _BlockAllocator()
+
+        # Vertex 0 is never handed out and stays NaN. Unused and removed
+        # primitives index it only, so they are not drawn.
+        self._vertex_blocks.alloc(1)
+
+        # Changes since last upload
+        self.resized = True
+        self.dirty_vertices = []
+        self.dirty_indices = []
+
+    def add(self, buffers):
+        """
+        Copies shape buffers to arena. Shapes fill free ranges one by one,
+        or else are appended together.
+        :param buffers: list
+            (vertices, colors, indices) of every shape: (n, 2) vertices, (n, 4) vertex colors,
+            (m, index_size) primitives indexing shape vertices or None for consecutive primitives
+        :return: list
+            Slot of every shape: (vertex start, vertex count, index start, index count)
+        """
+        if self._vertex_blocks.fragmented or self._index_blocks.fragmented:
+            return [self._add(b[0], b[1], self._consecutive(len(b[0])) if b[2] is None else b[2])
+                    for b in buffers]
+
+        if not buffers:
+            return []
+
+        nv = np.array([len(b[0]) for b in buffers], dtype=np.int64)
+        voffsets = np.cumsum(nv) - nv
+
+        if all(b[2] is None for b in buffers):
+            ni = nv // self.index_size
+            indices = self._consecutive(int(nv.sum()))
+        else:
+            ni = np.array([len(self._consecutive(len(b[0])) if b[2] is None else b[2])
+                           for b in buffers], dtype=np.int64)
+            indices = np.concatenate([self._consecutive(len(b[0])) if b[2] is None else b[2]
+                                      for b in buffers]) + np.repeat(voffsets, ni).astype(np.uint32)[:, None]
+        ioffsets = np.cumsum(ni) - ni
+
+        vs, _, ns, _ = self._add(np.concatenate([b[0] for b in buffers]),
+                                 np.concatenate([b[1] for b in buffers]),
+                                 indices)
+
+        return list(zip((vs + voffsets).tolist(), nv.tolist(), (ns + ioffsets).tolist(), ni.tolist()))
+
+    def _add(self, vertices, colors, indices):
+        nv, ni = len(vertices), len(indices)
+        vs = self._vertex_blocks.alloc(nv)
+        ns = self._index_blocks.alloc(ni)
+
+        self.vertices = self._fit(self.vertices, vs + nv, np.nan)
+        self.colors = self._fit(self.colors, vs + nv, 0)
+        self.indices = self._fit(self.indices, ns + ni, 0)
+
+        self.vertices[vs:vs + nv] = vertices
+        self.colors[vs:vs + nv] = colors
+        self.indices[ns:ns + ni] = indices
+        self.indices[ns:ns + ni] += vs
+
+        self.dirty_vertices.append((vs, vs + nv))
+        self.dirty_indices.append((ns, ns + ni))
+
+        return vs, nv, ns, ni
+
+    def _consecutive(self, count):
+        # Primitives made of consecutive vertices
+        return np.arange(count - count % self.index_size, dtype=np.uint32).reshape((-1, self.index_size))
+
+    def remove(self, slot):
+        """
+        Frees shape ranges. Vertices become NaN to be skipped by bounds,
+        primitives become degenerate at the NaN vertex 0.
+        :param slot: tuple
+            Slot returned by add()
+        """
+        vs, nv, ns, ni = slot
+
+        self.vertices[vs:vs + nv] = np.nan
+        self.indices[ns:ns + ni] = 0
+
+        self._vertex_blocks.free(vs, nv)
+        self._index_blocks.free(ns, ni)
+
+        self.dirty_vertices.append((vs, vs + nv))
+        self.dirty_indices.append((ns, ns + ni))
+
+    @property
+    def empty(self):
+        return self._index_blocks.end == 0
+
+    def bounds(self, axis):
+        """
+        :param axis: int
+            0 - X, 1 - Y
+        :return: tuple
+            (min, max) of used vertices or None
+        """
+        pts = self.vertices[:self._vertex_blocks.end, axis]
+        if np.isnan(pts).all():
+            return None
+        return np.nanmin(pts), np.nanmax(pts)
+
+    def _fit(self, arr, size, fill):
+        # Grow array, doubling length
+        if size <= len(arr):
+            return arr
+
+        grown = np.full((max(size, 2 * len(arr)),) + arr.shape[1:], fill, dtype=arr.dtype)
+        grown[:len(arr)] = arr
+        self.resized = True
+        return grown
+
+    @staticmethod
+    def take_ranges(ranges):
+        """
+        Merges overlapping and adjacent ranges, empties input list
+        :param ranges: list
+            (start, stop) ranges
+        :return: list
+            Sorted merged ranges
+        """
+        merged = []
+        for start, stop in sorted(r for r in ranges if r[1] > r[0]):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], stop)
+            else:
+                merged.append([start, stop])
+        del ranges[:]
+        return merged
+
+
+class ArenaVisual(Visual):
+
+    VERTEX_SHADER = """
+        attribute vec2 a_position;
+        attribute vec4 a_color;
+        varying vec4 v_color;
+
+        void main() {
+            v_color = a_color;
+            gl_Position = $transform(vec4(a_position, 0, 1));
+        }
+    """
+
+    FRAGMENT_SHADER = """
+        varying vec4 v_color;
+
+        void main() {
+            gl_FragColor = v_color;
+        }
+    """
+
+    def __init__(self, mode='triangles', width=1, capacity=1024):
+        """
+        Draws contents of VertexArena, uploading only changed ranges
+        :param mode: str
+            'triangles' for faces, 'lines' for segments
+        :param width: float
+            Line width
+        :param capacity: int
+            Initial arena length
+        """
+        Visual.__init__(self, vcode=self.VERTEX_SHADER, fcode=self.FRAGMENT_SHADER)
+
+        self.arena = VertexArena(3 if mode == 'triangles' else 2, capacity)
+        self._width = width
+
+        self._pos_vbo = gloo.VertexBuffer(self.arena.vertices)
+        self._color_vbo = gloo.VertexBuffer(self.arena.colors)
+        self._ibo = gloo.IndexBuffer(self.arena.indices.ravel())
+        self.arena.resized = False
+
+        self.shared_program['a_position'] = self._pos_vbo
+        self.shared_program['a_color'] = self._color_vbo
+        self._index_buffer = self._ibo
+        self._draw_mode = mode
+
+        self.freeze()
+
+    def add(self, buffers):
+        return self.arena.add(buffers)
+
+    def remove(self, slot):
+        self.arena.remove(slot)
+
+    def clear_data(self):
+        self.arena = VertexArena(self.arena.index_size, len(self.arena.indices))
+        self.upload()
+
+    def upload(self):
+        """
+        Sends changed ranges of arena to GPU
+        """
+        arena = self.arena
+
+        if arena.resized:
+            self._pos_vbo.set_data(arena.vertices)
+            self._color_vbo.set_data(arena.colors)
+            self._ibo.set_data(arena.indices.ravel())
+            arena.resized = False
+            del arena.dirty_vertices[:]
+            del arena.dirty_indices[:]
+        elif arena.dirty_vertices or arena.dirty_indices:
+            for start, stop in arena.take_ranges(arena.dirty_vertices):
+                self._pos_vbo.set_subdata(arena.vertices[start:stop], offset=start)
+                self._color_vbo.set_subdata(arena.colors[start:stop], offset=start)
+            for start, stop in arena.take_ranges(arena.dirty_indices):
+                self._ibo.set_subdata(arena.indices[start:stop].ravel(), offset=start * arena.index_size)
+        else:
+            return
+
+        self._bounds_changed()
+        self.update()
+
+    def _prepare_transforms(self, view):
+        view.view_program.vert['transform'] = view.get_transform()
+
+    def _prepare_draw(self, view=None):
+        if self.arena.empty:
+            return False
+
+        if self._draw_mode == 'lines':
+            self.update_gl_state(line_width=max(self.transforms.pixel_scale * self._width, 1.0))
+
+    def _compute_bounds(self, axis, view):
+        return self.arena.bounds(axis)
 
 
 class ShapeGroup(object):
@@ -156,6 +717,14 @@ class ShapeGroup(object):
         """
         self._collection.redraw(self._indexes)
 
+    def transform(self, matrix):
+        """
+        Moves group shapes by affine matrix without translating them again
+        :param matrix: numpy.array
+            3x3 affine matrix
+        """
+        self._collection.apply_matrix(self._indexes, matrix)
+
     @property
     def visible(self):
         """
@@ -174,28 +743,95 @@ class ShapeGroup(object):
         for i in self._indexes:
             self._collection.data[i]['visible'] = value
 
-        self._collection.redraw([])
+        self._collection.redraw(self._indexes)
+
+
+class _Tile(object):
+    def __init__(self, layer, tolerance, level, line_width):
+        """
+        Shapes of one layer and level of detail near one place,
+        drawn or culled together
+        :param layer: int
+            Layer number
+        :param tolerance: float
+            Simplifying tolerance of level 0 of the shapes
+        :param level: int
+            Level of detail, 0 - finest
+        :param line_width: float
+            Width of lines/edges
+        """
+        self.layer = layer
+        self.tolerance = tolerance
+        self.level = level
+        self.bounds = None                      # (xmin, ymin, xmax, ymax) of shapes ever placed in tile
+
+        self.mesh = ArenaVisual('triangles', capacity=64)
+        self.line = ArenaVisual('lines', width=line_width, capacity=64)
+
+        self.mesh.set_gl_state(blend=True, polygon_offset_fill=True, polygon_offset=(1, 1), cull_face=False)
+        self.line.set_gl_state(blend=True, line_smooth=True)
+
+    def extend(self, bounds):
+        if bounds is None:
+            return
+        if self.bounds is None:
+            self.bounds = bounds
+        else:
+            self.bounds = (min(self.bounds[0], bounds[0]), min(self.bounds[1], bounds[1]),
+                           max(self.bounds[2], bounds[2]), max(self.bounds[3], bounds[3]))
+
+    def intersects(self, rect):
+        return self.bounds is None or (self.bounds[0] <= rect[2] and self.bounds[2] >= rect[0] and
+                                       self.bounds[1] <= rect[3] and self.bounds[3] >= rect[1])
 
 
 class ShapeCollectionVisual(CompoundVisual):
 
-    def __init__(self, line_width=1, triangulation='gpc', layers=3, pool=None, **kwargs):
+    # Shapes translated together in one process pool task
+    batch_size = 64
+
+    # Levels of detail: shapes are also simplified with tolerance multiplied
+    # by lod_factor, lod_factor ** 2, ... Level with tolerance under one
+    # screen pixel is drawn
+    lod_factor = 8
+    lod_levels = 4
+
+    # Tile side in pixels of its level tolerance. With a level drawn,
+    # a screen holds few tiles of it
+    tile_pixels = 4096
+
+    def __init__(self, line_width=1, triangulation='earcut', layers=3, pool=None, **kwargs):
         """
         Represents collection of shapes to draw on VisPy scene
         :param line_width: float
             Width of lines/edges
         :param triangulation: str
             Triangulation method used for polygons translation
-            'vispy' - VisPy lib triangulation
-            'gpc' - Polygon2 lib
+            'earcut' - NumPy fans for convex polygons, earcut or GLU for others
+            'glu' - GLU tessellator
         :param layers: int
             Layers count
-            Each layer adds 2 visuals on VisPy scene. Be careful: more layers cause less fps
+            Shapes of each layer are drawn in tiles, every tile adds 2 visuals on VisPy scene
         :param kwargs:
         """
         self.data = {}
         self.last_key = -1
 
+        # Shapes placed in tiles: key -> [(tile, mesh slot, line slot) for every level]
+        self._slots = {}
+        # Keys added, removed or shown/hidden since last update
+        self._changed = set()
+        # Keys with transformed buffers, they leave their slots on update
+        self._moved = set()
+        # Keys waiting to be sent for translation
+        self._queued = []
+
+        # Tiles: (layer, tolerance, level, tile x, tile y) -> _Tile
+        self._tiles = {}
+        # Visible area (xmin, ymin, xmax, ymax) and pixel size, see set_view()
+        self._view = None
+        self._view_changed = False
+
         # Thread locks
         self.key_lock = threading.Lock()
         self.results_lock = threading.Lock()
@@ -205,24 +841,11 @@ class ShapeCollectionVisual(CompoundVisual):
         self.pool = pool
         self.results = {}
 
-        self._meshes = [MeshVisual() for _ in range(0, layers)]
-        # self._lines = [LineVisual(antialias=True) for _ in range(0, layers)]
-        self._lines = [FlatCAMLineVisual(antialias=True) for _ in range(0, layers)]
-
+        self._layers = layers
         self._line_width = line_width
         self._triangulation = triangulation
 
-        visuals_ = [self._lines[i // 2] if i % 2 else self._meshes[i // 2] for i in range(0, layers * 2)]
-
-        CompoundVisual.__init__(self, visuals_, **kwargs)
-
-        for m in self._meshes:
-            pass
-            m.set_gl_state(polygon_offset_fill=True, polygon_offset=(1, 1), cull_face=False)
-
-        for l in self._lines:
-            pass
-            l.set_gl_state(blend=True)
+        CompoundVisual.__init__(self, [], **kwargs)
 
         self.freeze()
 
@@ -252,23 +875,51 @@ class ShapeCollectionVisual(CompoundVisual):
         self.key_lock.acquire(True)
         self.last_key += 1
         key = self.last_key
+        self._changed.add(key)
         self.key_lock.release()
 
         # Prepare data for translation
         self.data[key] = {'geometry': shape, 'color': color, 'alpha': alpha, 'face_color': face_color,
                           'visible': visible, 'layer': layer, 'tolerance': tolerance}
 
-        # Add data to process pool if pool exists
-        try:
-            self.results[key] = self.pool.map_async(_update_shape_buffers, [self.data[key]])
-        except:
-            self.data[key] = _update_shape_buffers(self.data[key])
+        # Queue data for translation, full batches go to process pool right away
+        self.key_lock.acquire(True)
+        self._queued.append(key)
+        full = len(self._queued) >= self.batch_size
+        self.key_lock.release()
+
+        if full:
+            self._translate()
 
         if update:
             self.redraw()                       # redraw() waits for pool process end
 
         return key
 
+    def _translate(self):
+        """
+        Translates queued shapes in one batch, in process pool if pool exists
+        """
+        self.key_lock.acquire(True)
+        keys, self._queued = self._queued, []
+        self.key_lock.release()
+
+        keys = [k for k in keys if k in self.data]
+        datas = [self.data[k] for k in keys]
+        if not datas:
+            return
+
+        lods = tuple(self.lod_factor ** level for level in range(1, self.lod_levels))
+        try:
+            result = self.pool.map_async(partial(_update_shapes_buffers, triangulation=self._triangulation,
+                                                 lods=lods), [datas])
+            self.results_lock.acquire(True)
+            for n, key in enumerate(keys):
+                self.results[key] = (result, n)
+            self.results_lock.release()
+        except:
+            _update_shapes_buffers(datas, self._triangulation, lods)   # Translates data in place
+
     def remove(self, key, update=False):
         """
         Removes shape from collection
@@ -279,12 +930,14 @@ class ShapeCollectionVisual(CompoundVisual):
         """
         # Remove process result
         self.results_lock.acquire(True)
-        if key in list(self.results.copy().keys()):
-            del self.results[key]
+        self.results.pop(key, None)
         self.results_lock.release()
 
-        # Remove data
+        # Remove data, the shape leaves its tiles on update
         del self.data[key]
+        self.key_lock.acquire(True)
+        self._changed.add(key)
+        self.key_lock.release()
 
         if update:
             self.__update()
@@ -295,84 +948,267 @@ class ShapeCollectionVisual(CompoundVisual):
         :param update: bool
             Set True to redraw collection
         """
+        self.update_lock.acquire(True)
+
         self.data.clear()
+        self._slots.clear()
+        self._changed.clear()
+        self._moved.clear()
+        for tile in self._tiles.values():
+            self.remove_subvisual(tile.mesh)
+            self.remove_subvisual(tile.line)
+        self._tiles.clear()
+        self._bounds_changed()
+
+        self.update_lock.release()
+
         if update:
             self.__update()
 
-    def __update(self):
+    def _tile(self, data, level):
         """
-        Merges internal buffers, sets data to visuals, redraws collection on scene
+        Tile for shape at level of detail, created if missing
+        :param data: dict
+            Translated shape data
+        :param level: int
+            Level of detail
+        :return: _Tile
+        """
+        tolerance, bounds = data['tolerance'], data['bounds']
+
+        # Shapes without tolerance or bounds are not tiled
+        if tolerance and bounds is not None:
+            size = tolerance * self.lod_factor ** level * self.tile_pixels
+            index = (data['layer'], tolerance, level,
+                     math.floor((bounds[0] + bounds[2]) / 2 / size),
+                     math.floor((bounds[1] + bounds[3]) / 2 / size))
+        else:
+            index = (data['layer'], None, 0, 0, 0)
+
+        try:
+            return self._tiles[index]
+        except KeyError:
+            tile = _Tile(index[0], index[1], index[2], self._line_width)
+            self._tiles[index] = tile
+            return tile
+
+    def _order_tiles(self):
+        """
+        Re-adds sub-visuals of tiles: lower layers first, faces before edges in layer
         """
-        mesh_vertices = [[] for _ in range(0, len(self._meshes))]       # Vertices for mesh
-        mesh_tris = [[] for _ in range(0, len(self._meshes))]           # Faces for mesh
-        mesh_colors = [[] for _ in range(0, len(self._meshes))]         # Face colors
-        line_pts = [[] for _ in range(0, len(self._lines))]             # Vertices for line
-        line_colors = [[] for _ in range(0, len(self._lines))]          # Line color
+        for v in list(self._subvisuals):
+            self.remove_subvisual(v)
 
+        for layer in sorted(set(t.layer for t in self._tiles.values())):
+            tiles = [t for t in self._tiles.values() if t.layer == layer]
+            for t in tiles:
+                self.add_subvisual(t.mesh)
+            for t in tiles:
+                self.add_subvisual(t.line)
+
+    def __update(self):
+        """
+        Places changed shapes to tiles or frees their slots,
+        uploads changed buffer ranges, redraws collection on scene.
+        Cost depends on count of changed shapes only.
+        """
         # Lock sub-visuals updates
         self.update_lock.acquire(True)
 
-        # Merge shapes buffers
-        for data in list(self.data.values()):
-            if data['visible'] and 'line_pts' in data:
-                try:
-                    line_pts[data['layer']] += data['line_pts']
-                    line_colors[data['layer']] += data['line_colors']
-                    mesh_tris[data['layer']] += [x + len(mesh_vertices[data['layer']])
-                                                 for x in data['mesh_tris']]
+        self.key_lock.acquire(True)
+        changed, self._changed = self._changed, set()
+        moved, self._moved = self._moved, set()
+        self.key_lock.release()
 
-                    mesh_vertices[data['layer']] += data['mesh_vertices']
-                    mesh_colors[data['layer']] += data['mesh_colors']
-                except Exception as e:
-                    print("Data error", e)
+        waiting = []
+        added = {}
+        touched = set()
+        tiles_count = len(self._tiles)
+        for key in changed:
+            data = self.data.get(key)
+
+            # Translation in process pool not finished
+            if data is not None and 'line_pts' not in data:
+                waiting.append(key)
+                continue
+
+            show = data is not None and data['visible']
+            if key in moved and key in self._slots:
+                for tile, mesh_slot, line_slot in self._slots.pop(key):
+                    tile.mesh.remove(mesh_slot)
+                    tile.line.remove(line_slot)
+                    touched.add(tile)
+
+            if show == (key in self._slots):
+                continue
+
+            try:
+                if show:
+                    self._slots[key] = []
+                    for level, buffers in enumerate([data] + data['lod']):
+                        added.setdefault(self._tile(data, level), []).append((key, buffers))
+                else:
+                    for tile, mesh_slot, line_slot in self._slots.pop(key):
+                        tile.mesh.remove(mesh_slot)
+                        tile.line.remove(line_slot)
+                        touched.add(tile)
+            except Exception as e:
+                print("Data error", e)
+
+        # Shown shapes go to tiles together, after freeing removed ones
+        for tile, items in added.items():
+            touched.add(tile)
+            try:
+                bounds = np.array([self.data[key]['bounds'] for key, b in items
+                                   if self.data[key]['bounds'] is not None]).reshape((-1, 4))
+                if len(bounds):
+                    tile.extend(tuple(bounds[:, :2].min(axis=0).tolist() + bounds[:, 2:].max(axis=0).tolist()))
+                mesh_slots = tile.mesh.add([(b['mesh_vertices'], b['mesh_colors'], b['mesh_tris'])
+                                            for key, b in items])
+                line_slots = tile.line.add([(b['line_pts'], b['line_colors'], None) for key, b in items])
+                for (key, b), mesh_slot, line_slot in zip(items, mesh_slots, line_slots):
+                    self._slots[key].append((tile, mesh_slot, line_slot))
+            except Exception as e:
+                print("Data error", e)
+
+        if waiting:
+            self.key_lock.acquire(True)
+            self._changed.update(waiting)
+            self.key_lock.release()
+
+        if len(self._tiles) != tiles_count:
+            self._order_tiles()
+
+        # Upload changed ranges
+        for tile in touched:
+            tile.mesh.upload()
+            tile.line.upload()
+
+        self._apply_view()
+        self._bounds_changed()
 
-        # Updating meshes
-        for i, mesh in enumerate(self._meshes):
-            if len(mesh_vertices[i]) > 0:
-                set_state(polygon_offset_fill=False)
-                mesh.set_data(np.asarray(mesh_vertices[i]), np.asarray(mesh_tris[i], dtype=np.uint32)
-                              .reshape((-1, 3)), face_colors=np.asarray(mesh_colors[i]))
-            else:
-                mesh.set_data()
+        self.update_lock.release()
+
+    def set_view(self, rect, pixel_size):
+        """
+        Sets visible area. Tiles out of it are culled, tiles of one level
+        of detail per tolerance are drawn.
+        :param rect: tuple
+            (xmin, ymin, xmax, ymax) of visible area
+        :param pixel_size: float
+            Screen pixel size in scene units
+        """
+        self._view = (tuple(rect), pixel_size)
 
-            mesh._bounds_changed()
+        if self.update_lock.acquire(False):
+            self._apply_view()
+            self.update_lock.release()
+        else:
+            self._view_changed = True           # Applied on next update or draw
 
-        # Updating lines
-        for i, line in enumerate(self._lines):
-            if len(line_pts[i]) > 0:
-                line.set_data(np.asarray(line_pts[i]), np.asarray(line_colors[i]), self._line_width, 'segments')
+    def level(self, tolerance, pixel_size):
+        """
+        Level of detail to draw shapes of tolerance with
+        :param tolerance: float
+            Shapes simplifying tolerance
+        :param pixel_size: float
+            Screen pixel size in scene units
+        :return: int
+        """
+        if not tolerance or pixel_size <= tolerance:
+            return 0
+        return min(int(np.log(pixel_size / tolerance) / np.log(self.lod_factor)), self.lod_levels - 1)
+
+    def _apply_view(self):
+        self._view_changed = False
+
+        for tile in list(self._tiles.values()):
+            if self._view is None:
+                visible = tile.level == 0
             else:
-                line.clear_data()
+                rect, pixel_size = self._view
+                visible = tile.level == self.level(tile.tolerance, pixel_size) and tile.intersects(rect)
 
-            line._bounds_changed()
+            tile.mesh.visible = visible
+            tile.line.visible = visible
 
-        self._bounds_changed()
+    def draw(self):
+        if self._view_changed and self.update_lock.acquire(False):
+            self._apply_view()
+            self.update_lock.release()
 
-        self.update_lock.release()
+        CompoundVisual.draw(self)
+
+    def _compute_bounds(self, axis, view):
+        # Bounds of all shapes, culled ones too
+        visuals_ = [v for t in self._tiles.values() if t.level == 0 for v in (t.mesh, t.line)]
+        bounds = [b for b in (v.bounds(axis) for v in visuals_) if b is not None]
+        if not bounds:
+            return None
+        return min(b[0] for b in bounds), max(b[1] for b in bounds)
 
     def redraw(self, indexes=None):
         """
         Redraws collection
         :param indexes: list
-            Shape indexes to get from process pool
+            Shape indexes to get from process pool and to check for visibility changes
+        """
+        self._wait_results(indexes)
+
+        if indexes:
+            self.key_lock.acquire(True)
+            self._changed.update(indexes)
+            self.key_lock.release()
+
+        self.__update()
+
+    def apply_matrix(self, indexes, matrix):
+        """
+        Moves shapes by affine matrix. Translated buffers are transformed,
+        shapes are not tessellated again.
+        :param indexes: list
+            Shape indexes to transform
+        :param matrix: numpy.array
+            3x3 affine matrix
+        """
+        self._wait_results(indexes)
+
+        self.update_lock.acquire(True)
+        moved = [key for key in indexes if key in self.data and 'line_pts' in self.data[key]]
+        _transform_buffers([self.data[key] for key in moved], matrix)
+        self.update_lock.release()
+
+        self.key_lock.acquire(True)
+        self._changed.update(moved)
+        self._moved.update(moved)
+        self.key_lock.release()
+
+        self.__update()
+
+    def _wait_results(self, indexes=None):
+        """
+        Translates queued shapes, stores translated data from process pool
+        :param indexes: list
+            Shape indexes to wait for, all when empty
         """
+        self._translate()
+
         # Only one thread can update data
         self.results_lock.acquire(True)
 
-        for i in list(self.data.copy().keys()) if not indexes else indexes:
-            if i in list(self.results.copy().keys()):
+        for i in list(self.results.keys()) if not indexes else indexes:
+            if i in self.results:
                 try:
-                    self.results[i].wait()                                  # Wait for process results
+                    result, n = self.results[i]
+                    result.wait()                                           # Wait for process results
                     if i in self.data:
-                        self.data[i] = self.results[i].get()[0]             # Store translated data
+                        self.data[i] = result.get()[0][n]                   # Store translated data
                         del self.results[i]
                 except Exception as e:
                     print(e, indexes)
 
         self.results_lock.release()
 
-        self.__update()
-
     def lock_updates(self):
         self.update_lock.acquire(True)
 
@@ -380,6 +1216,155 @@ class ShapeCollectionVisual(CompoundVisual):
         self.update_lock.release()
 
 
+class ToolpathCollectionVisual(CompoundVisual):
+
+    def __init__(self, line_width=1, **kwargs):
+        """
+        Represents collection of tool paths to draw on VisPy scene.
+        All the paths go into one mesh and one line visual, built
+        directly from coordinate arrays (see _toolpath_buffers), so
+        jobs with many segments draw quickly. Works with ShapeGroup
+        :param line_width: float
+            Width of center lines
+        :param kwargs:
+        """
+        self.data = {}
+        self.last_key = -1
+
+        # Thread locks
+        self.key_lock = threading.Lock()
+        self.update_lock = threading.Lock()
+
+        self._mesh = MeshVisual()
+        self._line = FlatCAMLineVisual(antialias=True)
+        self._line_width = line_width
+
+        CompoundVisual.__init__(self, [self._mesh, self._line], **kwargs)
+
+        # Each layer is filled once, see _toolpath_buffers(). The lines
+        # do not take part and end the depth test for the next visuals.
+        self._mesh.set_gl_state(blend=True, cull_face=False, depth_test=True, depth_func='less')
+        self._line.set_gl_state(blend=True, depth_test=False)
+
+        self.freeze()
+
+    def add(self, coords=None, index=None, layers=None, colors=None, face_colors=None, width=0.0,
+            visible=True, update=False):
+        """
+        Adds tool paths to collection
+        :param coords: numpy.array
+            (n, 2) vertices of all the paths, one after the other
+        :param index: numpy.array
+            Path number of every vertex
+        :param layers: numpy.array
+            Layer of every path, higher layers are drawn on top
+        :param colors: list
+            Line color of every layer
+        :param face_colors: list
+            Face color of every layer
+        :param width: float
+            Tool diameter. 0 draws the center lines only
+        :param visible: bool
+            Paths visibility
+        :param update: bool
+            Set True to redraw collection
+        :return: int
+            Index of paths
+        """
+        # Get new key
+        self.key_lock.acquire(True)
+        self.last_key += 1
+        key = self.last_key
+        self.key_lock.release()
+
+        self.data[key] = _toolpath_buffers(coords, index, layers, width,
+                                           [Color(c).rgba for c in colors],
+                                           [Color(c).rgba for c in face_colors])
+        self.data[key]['visible'] = visible
+
+        if update:
+            self.__update()
+
+        return key
+
+    def remove(self, key, update=False):
+        """
+        Removes paths from collection
+        :param key: int
+            Index to remove
+        :param update:
+            Set True to redraw collection
+        """
+        del self.data[key]
+
+        if update:
+            self.__update()
+
+    def clear(self, update=False):
+        """
+        Removes all paths from collection
+        :param update: bool
+            Set True to redraw collection
+        """
+        self.data.clear()
+        if update:
+            self.__update()
+
+    def __update(self):
+        """
+        Merges buffers, sets data to visuals, redraws collection on scene
+        """
+        self.update_lock.acquire(True)
+
+        data = [d for d in list(self.data.values()) if d['visible']]
+
+        vertices = [d['mesh_vertices'] for d in data]
+        offsets = np.cumsum([0] + [len(v) for v in vertices])
+        if offsets[-1] > 0:
+            depth = np.concatenate([d['mesh_depth'] for d in data])
+            tris = np.concatenate([d['mesh_tris'] + offset for d, offset in zip(data, offsets)])
+            # Lower layers of all the jobs first, higher are blended over them.
+            tris = tris[np.argsort(-depth[tris[:, 0]], kind='stable')]
+            self._mesh.set_data(vertices=np.column_stack((np.concatenate(vertices), depth)), faces=tris,
+                                vertex_colors=np.concatenate([d['mesh_colors'] for d in data]))
+        else:
+            self._mesh.set_data()
+        self._mesh._bounds_changed()
+
+        line_pts = [d['line_pts'] for d in data if len(d['line_pts']) > 0]
+        if line_pts:
+            self._line.set_data(np.concatenate(line_pts),
+                                np.concatenate([d['line_colors'] for d in data if len(d['line_pts']) > 0]),
+                                self._line_width, 'segments')
+        else:
+            self._line.clear_data()
+        self._line._bounds_changed()
+
+        self._bounds_changed()
+
+        self.update_lock.release()
+
+    def redraw(self, indexes=None):
+        """
+        Redraws collection
+        :param indexes: list
+            Not used, buffers are always ready
+        """
+        self.__update()
+
+    def apply_matrix(self, indexes, matrix):
+        """
+        Moves paths by affine matrix without building their buffers again
+        :param indexes: list
+            Path indexes to transform
+        :param matrix: numpy.array
+            3x3 affine matrix
+        """
+        _transform_buffers([self.data[key] for key in indexes if key in self.data], matrix)
+
+        self.__update()
+
+
 class TextGroup(object):
     def __init__(self, collection):
         self._collection = collection
@@ -414,6 +1399,15 @@ class TextGroup(object):
         """
         self._collection.redraw()
 
+    def transform(self, matrix):
+        """
+        Moves text positions by affine matrix
+        :param matrix: numpy.array
+            3x3 affine matrix
+        """
+        if self._index is not None:
+            self._collection.apply_matrix(self._index, matrix)
+
     @property
     def visible(self):
         """
@@ -528,6 +1522,20 @@ class TextCollectionVisual(TextVisual):
 
         self._bounds_changed()
 
+    def apply_matrix(self, key, matrix):
+        """
+        Moves text positions of array by affine matrix
+        :param key: int
+            Index of array
+        :param matrix: numpy.array
+            3x3 affine matrix
+        """
+        data = self.data[key]
+        if len(data['pos']) > 0:
+            data['pos'] = [tuple(p) for p in _transform_points(np.array(data['pos'], dtype=float), matrix).tolist()]
+
+        self.__update()
+
     def redraw(self):
         """
         Redraws collection
@@ -595,5 +1603,6 @@ def create_fast_node(subclass):
 
 
 ShapeCollection = create_fast_node(ShapeCollectionVisual)
+ToolpathCollection = create_fast_node(ToolpathCollectionVisual)
 TextCollection = create_fast_node(TextCollectionVisual)
 Cursor = create_fast_node(MarkersVisual)
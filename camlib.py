@@ -18,6 +18,9 @@ import traceback
 from decimal import Decimal
 
 import collections
+import collections.abc
+import functools
+import itertools
 
 from rtree import index as rtindex
 
@@ -26,10 +29,14 @@ from shapely.geometry import Polygon, LineString, Point, LinearRing, MultiLineSt
 from shapely.geometry import MultiPoint, MultiPolygon
 from shapely.geometry import box as shply_box
 from shapely.ops import cascaded_union, unary_union
+import shapely
 import shapely.affinity as affinity
 from shapely.wkt import loads as sloads
 from shapely.wkt import dumps as sdumps
+from shapely.wkb import loads as wkb_loads
+from shapely.wkb import dumps as wkb_dumps
 from shapely.geometry.base import BaseGeometry
+from shapely.prepared import prep
 from shapely.geometry import shape
 
 #[balmer] from collections import Iterable
@@ -52,6 +59,7 @@ import platform
 import FlatCAMApp
 
 import math
+import time
 
 if platform.architecture()[0] == '64bit':
     from ortools.constraint_solver import pywrapcp
@@ -89,6 +97,10 @@ class Geometry(object):
         # Final geometry: MultiPolygon or list (of geometry constructs)
         self.solid_geometry = None
 
+        # Panel instances: copies of solid_geometry translated by each
+        # [dx, dy] in this list. None if the geometry is not instanced.
+        self.instances = None
+
         # Attributes to be included in serialization
         self.ser_attrs = ["units", 'solid_geometry']
 
@@ -104,6 +116,31 @@ class Geometry(object):
             geo_steps_per_circle = Geometry.defaults["geo_steps_per_circle"]
         self.geo_steps_per_circle = geo_steps_per_circle
 
+    def instanced(self, geometry):
+        """
+        Copies of the geometry for all the panel instances, see
+        ``self.instances``.
+
+        :param geometry: solid_geometry or the solid_geometry of a tool.
+        :return: List with a copy for every instance, or geometry
+         itself if not instanced.
+        """
+        if not self.instances:
+            return geometry
+        return tile_geometry(geometry, self.instances)
+
+    def transform_instances(self, matrix):
+        """
+        Updates the panel instances after solid_geometry was transformed
+        by matrix. Instances are translated copies, so their offsets only
+        follow the linear part of the matrix.
+
+        :param matrix: 3x3 affine matrix, see translation_matrix() and others.
+        :return: None
+        """
+        if self.instances:
+            self.instances = np.dot(self.instances, matrix[:2, :2].T).tolist()
+
     def make_index(self):
         self.flatten()
         self.index = FlatCAMRTree()
@@ -264,10 +301,15 @@ class Geometry(object):
                 maxx_list.append(maxx)
                 maxy_list.append(maxy)
 
-            return(min(minx_list), min(miny_list), max(maxx_list), max(maxy_list))
+            bounds_coords = (min(minx_list), min(miny_list), max(maxx_list), max(maxy_list))
         else:
             bounds_coords = bounds_rec(self.solid_geometry)
-            return bounds_coords
+
+        if self.instances:
+            minx, miny, maxx, maxy = bounds_coords
+            (dxmin, dymin), (dxmax, dymax) = np.min(self.instances, axis=0), np.max(self.instances, axis=0)
+            bounds_coords = (minx + dxmin, miny + dymin, maxx + dxmax, maxy + dymax)
+        return bounds_coords
 
         # try:
         #     # from here: http://rightfootin.blogspot.com/2006/09/more-on-python-flatten.html
@@ -327,7 +369,7 @@ class Geometry(object):
         """
 
         if geoset is None:
-            geoset = self.solid_geometry
+            geoset = self.instanced(self.solid_geometry)
 
         try:  # Iterable
             for sub_geo in geoset:
@@ -350,13 +392,17 @@ class Geometry(object):
         interiors = []
 
         if geometry is None:
-            geometry = self.solid_geometry
+            geometry = self.instanced(self.solid_geometry)
 
         if type(geometry) == Polygon:
             interiors.extend(geometry.interiors)
         elif type(geometry) == MultiPolygon:
             for geo in geometry.geoms:
                 interiors.extend(self.get_interiors(geometry=geo))
+        elif type(geometry) == list:
+            # e.g. the copies of an instanced panel
+            for geo in geometry:
+                interiors.extend(self.get_interiors(geometry=geo))
         else:
             raise Exception("Not a Polygon or MultiPolygon")
 
@@ -375,13 +421,17 @@ class Geometry(object):
         exteriors = []
 
         if geometry is None:
-            geometry = self.solid_geometry
+            geometry = self.instanced(self.solid_geometry)
 
         if type(geometry) == Polygon:
             exteriors.append(geometry.exterior)
         elif type(geometry) == MultiPolygon:
             for geo in geometry.geoms:
                 exteriors.extend(self.get_exteriors(geometry=geo))
+        elif type(geometry) == list:
+            # e.g. the copies of an instanced panel
+            for geo in geometry:
+                exteriors.extend(self.get_exteriors(geometry=geo))
         else:
             raise Exception("Not a Polygon or MultiPolygon")
 
@@ -781,12 +831,7 @@ class Geometry(object):
             "Expected a Polygon or MultiPolygon, got %s" % type(polygon)
 
         ## The toolpaths
-        # Index first and last points in paths
-        def get_pts(o):
-            return [o.coords[0], o.coords[-1]]
-
-        geoms = FlatCAMRTreeStorage()
-        geoms.get_points = get_pts
+        paths = []
 
         # Can only result in a Polygon or MultiPolygon
         # NOTE: The resulting polygon can be "empty".
@@ -800,15 +845,13 @@ class Geometry(object):
         # current can be a MultiPolygon
         if type(current) == MultiPolygon:
             for p in current.geoms:
-                geoms.insert(p.exterior)
-                for i in p.interiors:
-                    geoms.insert(i)
+                paths.append(p.exterior)
+                paths.extend(p.interiors)
 
         else:
             assert type(current) == Polygon
-            geoms.insert(current.exterior)
-            for i in current.interiors:
-                geoms.insert(i)
+            paths.append(current.exterior)
+            paths.extend(current.interiors)
 
         while True:
 
@@ -819,18 +862,19 @@ class Geometry(object):
                 # current can be a MultiPolygon
                 if type(current) == MultiPolygon:
                     for p in current.geoms:
-                        geoms.insert(p.exterior)
-                        for i in p.interiors:
-                            geoms.insert(i)
+                        paths.append(p.exterior)
+                        paths.extend(p.interiors)
                 else:
                     assert type(current) == Polygon
-                    geoms.insert(current.exterior)
-                    for i in current.interiors:
-                        geoms.insert(i)
+                    paths.append(current.exterior)
+                    paths.extend(current.interiors)
             else:
                 print("Current Area is zero")
                 break
 
+        # Index first and last points in paths, all at once
+        geoms = FlatCAMRTreeStorage(paths, get_points=FlatCAMRTree.get_endpoints)
+
         # Optimization: Reduce lifts
         if connect:
             # log.debug("Reducing tool lifts...")
@@ -866,11 +910,7 @@ class Geometry(object):
         radius = tooldia / 2 * (1 - overlap)
 
         ## The toolpaths
-        # Index first and last points in paths
-        def get_pts(o):
-            return [o.coords[0], o.coords[-1]]
-        geoms = FlatCAMRTreeStorage()
-        geoms.get_points = get_pts
+        paths = []
 
         # Path margin
         path_margin = polygon_to_clear.buffer(-tooldia / 2, int(steps_per_circle / 4))
@@ -892,14 +932,8 @@ class Geometry(object):
             if path.is_empty:
                 break
             else:
-                #geoms.append(path)
-                #geoms.insert(path)
                 # path can be a collection of paths.
-                try:
-                    for p in path:
-                        geoms.insert(p)
-                except TypeError:
-                    geoms.insert(path)
+                paths.extend(getattr(path, 'geoms', [path]))
 
             radius += tooldia * (1 - overlap)
 
@@ -910,9 +944,10 @@ class Geometry(object):
             for x in autolist(polygon_to_clear.buffer(-tooldia / 2, int(steps_per_circle / 4))):  # Over resulting polygons
                 for y in x.interiors:  # Over interiors of each polygon
                     inner_edges.append(y)
-            #geoms += outer_edges + inner_edges
-            for g in outer_edges + inner_edges:
-                geoms.insert(g)
+            paths += outer_edges + inner_edges
+
+        # Index first and last points in paths, all at once
+        geoms = FlatCAMRTreeStorage(paths, get_points=FlatCAMRTree.get_endpoints)
 
         # Optimization connect touching paths
         # log.debug("Connecting paths...")
@@ -947,11 +982,7 @@ class Geometry(object):
 
         ## The toolpaths
         # Index first and last points in paths
-        def get_pts(o):
-            return [o.coords[0], o.coords[-1]]
-
-        geoms = FlatCAMRTreeStorage()
-        geoms.get_points = get_pts
+        geoms = FlatCAMRTreeStorage(get_points=FlatCAMRTree.get_endpoints)
 
         lines = []
 
@@ -977,13 +1008,9 @@ class Geometry(object):
         margin_poly = polygon.buffer(-tooldia / 1.99999999, (int(steps_per_circle)))
         lines_trimmed = linesgeo.intersection(margin_poly)
 
-        # Add lines to storage
-        try:
-            for line in lines_trimmed:
-                geoms.insert(line)
-        except TypeError:
-            # in case lines_trimmed are not iterable (Linestring, LinearRing)
-            geoms.insert(lines_trimmed)
+        # Add lines to storage, all at once. lines_trimmed is a
+        # single LineString when the polygon is crossed once.
+        geoms.insert_many(getattr(lines_trimmed, 'geoms', [lines_trimmed]))
 
         # Add margin (contour) to storage
         if contour:
@@ -1020,7 +1047,7 @@ class Geometry(object):
         return
 
     @staticmethod
-    def paint_connect(storage, boundary, tooldia, steps_per_circle, max_walk=None):
+    def paint_connect(storage, boundary, tooldia, steps_per_circle=None, max_walk=None):
         """
         Connects paths that results in a connection segment that is
         within the paint area. This avoids unnecessary tool lifting.
@@ -1031,6 +1058,8 @@ class Geometry(object):
         :type boundary: Polygon
         :param tooldia: Tool diameter.
         :rtype tooldia: float
+        :param steps_per_circle: Resolution of the tool outline.
+        :type steps_per_circle: int or None
         :param max_walk: Maximum allowable distance without lifting tool.
         :type max_walk: float or None
         :return: Optimized geometry.
@@ -1041,81 +1070,57 @@ class Geometry(object):
         # 10 times the tool diameter
         max_walk = max_walk or 10 * tooldia
 
-        # Assuming geolist is a flat list of flat elements
-
-        ## Index first and last points in paths
-        def get_pts(o):
-            return [o.coords[0], o.coords[-1]]
+        if steps_per_circle is None:
+            steps_per_circle = Geometry.defaults["geo_steps_per_circle"]
 
-        # storage = FlatCAMRTreeStorage()
-        # storage.get_points = get_pts
-        #
-        # for shape in geolist:
-        #     if shape is not None:  # TODO: This shouldn't have happened.
-        #         # Make LlinearRings into linestrings otherwise
-        #         # When chaining the coordinates path is messed up.
-        #         storage.insert(LineString(shape))
-        #         #storage.insert(shape)
+        # The cut along a walk segment is inside the boundary when the
+        # segment is inside the boundary shrunk by the tool radius.
+        margin = prep(boundary.buffer(-tooldia / 2, int(steps_per_circle / 4)))
 
         ## Iterate over geometry paths getting the nearest each time.
-        #optimized_paths = []
-        optimized_paths = FlatCAMRTreeStorage()
-        optimized_paths.get_points = get_pts
-        path_count = 0
-        current_pt = (0, 0)
-        pt, geo = storage.nearest(current_pt)
+        optimized_paths = []
+
+        # Coordinates of the path being connected, grown by doubling.
+        coords = np.empty((256, 2))
+        count = 0
+
+        pt, geo = storage.nearest((0, 0))
         storage.remove(geo)
-        geo = LineString(geo)
-        current_pt = geo.coords[-1]
+        pts = shapely.get_coordinates(geo)
         try:
             while True:
-                path_count += 1
-                #log.debug("Path %d" % path_count)
+                if count + len(pts) > len(coords):
+                    coords = np.concatenate([coords, np.empty((max(len(coords), len(pts)), 2))])
+                coords[count:count + len(pts)] = pts
+                count += len(pts)
+                current_pt = tuple(coords[count - 1].tolist())
 
                 pt, candidate = storage.nearest(current_pt)
                 storage.remove(candidate)
-                candidate = LineString(candidate)
+                pts = shapely.get_coordinates(candidate)
 
                 # If last point in geometry is the nearest
                 # then reverse coordinates.
                 # but prefer the first one if last == first
-                if pt != candidate.coords[0] and pt == candidate.coords[-1]:
-                    candidate.coords = list(candidate.coords)[::-1]
+                if pt != tuple(pts[0].tolist()) and pt == tuple(pts[-1].tolist()):
+                    pts = pts[::-1]
 
                 # Straight line from current_pt to pt.
                 # Is the toolpath inside the geometry?
-                walk_path = LineString([current_pt, pt])
-                walk_cut = walk_path.buffer(tooldia / 2, int(steps_per_circle / 4))
-
-                if walk_cut.within(boundary) and walk_path.length < max_walk:
-                    #log.debug("Walk to path #%d is inside. Joining." % path_count)
-
+                walk_length = math.hypot(pt[0] - current_pt[0], pt[1] - current_pt[1])
+                if walk_length < max_walk and \
+                        margin.covers(LineString([current_pt, pt]) if walk_length > 0 else Point(pt)):
                     # Completely inside. Append...
-                    geo.coords = list(geo.coords) + list(candidate.coords)
-                    # try:
-                    #     last = optimized_paths[-1]
-                    #     last.coords = list(last.coords) + list(geo.coords)
-                    # except IndexError:
-                    #     optimized_paths.append(geo)
-
-                else:
-
-                    # Have to lift tool. End path.
-                    #log.debug("Path #%d not within boundary. Next." % path_count)
-                    #optimized_paths.append(geo)
-                    optimized_paths.insert(geo)
-                    geo = candidate
-
-                current_pt = geo.coords[-1]
+                    continue
 
-                # Next
-                #pt, geo = storage.nearest(current_pt)
+                # Have to lift tool. End path.
+                optimized_paths.append(LineString(coords[:count]))
+                count = 0
 
         except StopIteration:  # Nothing left in storage.
-            #pass
-            optimized_paths.insert(geo)
+            optimized_paths.append(LineString(coords[:count]))
 
-        return optimized_paths
+        return FlatCAMRTreeStorage(optimized_paths, get_points=FlatCAMRTree.get_endpoints)
 
     @staticmethod
     def path_connect(storage, origin=(0, 0)):
@@ -1131,10 +1136,6 @@ class Geometry(object):
 
         log.debug("path_connect()")
 
-        ## Index first and last points in paths
-        def get_pts(o):
-            return [o.coords[0], o.coords[-1]]
-        #
         # storage = FlatCAMRTreeStorage()
         # storage.get_points = get_pts
         #
@@ -1146,8 +1147,7 @@ class Geometry(object):
         pt, geo = storage.nearest(origin)
         storage.remove(geo)
         #optimized_geometry = [geo]
-        optimized_geometry = FlatCAMRTreeStorage()
-        optimized_geometry.get_points = get_pts
+        optimized_geometry = FlatCAMRTreeStorage(get_points=FlatCAMRTree.get_endpoints)
         #optimized_geometry.insert(geo)
         try:
             while True:
@@ -1308,10 +1308,10 @@ class Geometry(object):
             flat_geo = []
             if self.multigeo:
                 for tool in self.tools:
-                    flat_geo += self.flatten(self.tools[tool]['solid_geometry'])
+                    flat_geo += self.flatten(self.instanced(self.tools[tool]['solid_geometry']))
                 geom = cascaded_union(flat_geo)
             else:
-                geom = cascaded_union(self.flatten())
+                geom = cascaded_union(self.flatten(self.instanced(self.solid_geometry)))
         else:
             geom = cascaded_union(self.flatten())
 
@@ -1340,20 +1340,12 @@ class Geometry(object):
         :return: None
         """
 
-        px, py = point
         xscale, yscale = {"X": (1.0, -1.0), "Y": (-1.0, 1.0)}[axis]
 
-        def mirror_geom(obj):
-            if type(obj) is list:
-                new_obj = []
-                for g in obj:
-                    new_obj.append(mirror_geom(g))
-                return new_obj
-            else:
-                return affinity.scale(obj, xscale, yscale, origin=(px,py))
-
         try:
-            self.solid_geometry = mirror_geom(self.solid_geometry)
+            matrix = scale_matrix(xscale, yscale, point)
+            self.solid_geometry = transform_geometry(self.solid_geometry, matrix)
+            self.transform_instances(matrix)
             self.app.inform.emit('[success]Object was mirrored ...')
         except AttributeError:
             self.app.inform.emit("[error_notcl] Failed to mirror. No object selected")
@@ -1375,19 +1367,10 @@ class Geometry(object):
         http://toblerity.org/shapely/manual.html#affine-transformations
         """
 
-        px, py = point
-
-        def rotate_geom(obj):
-            if type(obj) is list:
-                new_obj = []
-                for g in obj:
-                    new_obj.append(rotate_geom(g))
-                return new_obj
-            else:
-                return affinity.rotate(obj, angle, origin=(px, py))
-
         try:
-            self.solid_geometry = rotate_geom(self.solid_geometry)
+            matrix = rotation_matrix(angle, point)
+            self.solid_geometry = transform_geometry(self.solid_geometry, matrix)
+            self.transform_instances(matrix)
             self.app.inform.emit('[success]Object was rotated ...')
         except AttributeError:
             self.app.inform.emit("[error_notcl] Failed to rotate. No object selected")
@@ -1407,19 +1390,10 @@ class Geometry(object):
         See shapely manual for more information:
         http://toblerity.org/shapely/manual.html#affine-transformations
         """
-        px, py = point
-
-        def skew_geom(obj):
-            if type(obj) is list:
-                new_obj = []
-                for g in obj:
-                    new_obj.append(skew_geom(g))
-                return new_obj
-            else:
-                return affinity.skew(obj, angle_x, angle_y, origin=(px, py))
-
         try:
-            self.solid_geometry = skew_geom(self.solid_geometry)
+            matrix = skew_matrix(angle_x, angle_y, point)
+            self.solid_geometry = transform_geometry(self.solid_geometry, matrix)
+            self.transform_instances(matrix)
             self.app.inform.emit('[success]Object was skewed ...')
         except AttributeError:
             self.app.inform.emit("[error_notcl] Failed to skew. No object selected")
@@ -1805,6 +1779,314 @@ class ApertureMacro:
         return self.geometry
 
 
+def _union_tile(args):
+    """
+    Process pool worker for TiledUnion. Geometry travels as WKB
+    both ways, it is much cheaper to pickle than Shapely objects.
+
+    :param args: (method, [wkb, ...])
+    :return: WKB of the merged tile.
+    """
+    method, wkb_list = args
+    return wkb_dumps(TiledUnion.merge([wkb_loads(w) for w in wkb_list], method))
+
+
+class TiledUnion(object):
+    """
+    Geometry stage of the Gerber parser.
+
+    The parser hands over the polygons it creates in layers, one layer
+    per run of equal polarity (%LPD*% / %LPC*%). Each layer is merged
+    with a union and the result is added to (dark) or subtracted from
+    (clear) the geometry accumulated so far.
+
+    Large layers are split in a grid of tiles by the center of the
+    bounding box of each polygon. Tiles are merged in parallel in the
+    process pool and the merged tiles are stitched with a final union.
+    A polygon always goes whole into one tile, so no seams are
+    introduced and the result is the same as merging the layer at once.
+
+    **USAGE**::
+
+        stage = TiledUnion(pool=app.pool)
+        stage.add_layer('D', polygons)
+        stage.add_layer('C', other_polygons)
+        solid_geometry = stage.apply(Polygon())
+
+    """
+
+    defaults = {
+        # Below this number of polygons a layer is merged in this process.
+        "min_parallel": 2000,
+        # Tiles per worker process.
+        "tiles_per_process": 2
+    }
+
+    def __init__(self, pool=None, steps_per_circle=None):
+        """
+        :param pool: multiprocessing.Pool used to merge the tiles. If None
+            every layer is merged in this process.
+        :param steps_per_circle: Used by the "union_fix" method when cleaning
+            the result with buffer(0).
+        """
+
+        self.pool = pool
+
+        if steps_per_circle is None:
+            steps_per_circle = Gerber.defaults['steps_per_circle']
+        self.steps_per_circle = steps_per_circle
+
+        # Each is [polarity, method, [polygon, ...]]
+        self.layers = []
+
+    def add_layer(self, polarity, geometries, method="union"):
+        """
+        Queues a layer of polygons.
+
+        :param polarity: 'D' adds the layer, 'C' subtracts it.
+        :type polarity: str
+        :param geometries: Polygons in the layer.
+        :type geometries: list
+        :param method: How to merge the layer, see ``merge()``.
+        :type method: str
+        :return: None
+        """
+        self.layers.append([polarity, method, geometries])
+
+    def apply(self, solid_geometry):
+        """
+        Merges every queued layer and combines them, in order,
+        with ``solid_geometry``.
+
+        :param solid_geometry: Geometry to start with.
+        :return: Resulting geometry.
+        """
+        for polarity, method, geometries in self.layers:
+            merged = self.union(geometries, method)
+            if polarity == 'D':
+                solid_geometry = solid_geometry.union(merged)
+            else:
+                solid_geometry = solid_geometry.difference(merged)
+
+        self.layers = []
+        return solid_geometry
+
+    def union(self, geometries, method="union"):
+        """
+        Merges a list of polygons, in parallel if there is a pool
+        and the list is large enough.
+
+        :param geometries: List of polygons.
+        :param method: See ``merge()``.
+        :return: Merged geometry.
+        """
+        tiles = self.make_tiles(geometries)
+
+        if len(tiles) < 2:
+            return self.merge(geometries, method, self.steps_per_circle)
+
+        log.debug("TiledUnion: merging %d polygons in %d tiles." % (len(geometries), len(tiles)))
+
+        # Tiles are stitched with a plain union, "union_fix" cleans up
+        # only once at the end.
+        tile_method = "union" if method == "union_fix" else method
+        try:
+            args = [(tile_method, [wkb_dumps(g) for g in tile]) for tile in tiles]
+            merged = [wkb_loads(w) for w in self.pool.map(_union_tile, args)]
+        except Exception as e:
+            # Closed or broken pool. Not worth failing the whole file for it.
+            log.warning("TiledUnion: process pool failed (%s). Merging in this process." % str(e))
+            return self.merge(geometries, method, self.steps_per_circle)
+
+        result = unary_union(merged)
+        if method == "union_fix":
+            result = result.buffer(0, int(self.steps_per_circle / 4))
+        return result
+
+    def make_tiles(self, geometries):
+        """
+        Splits the geometries in a grid of tiles by the center of their
+        bounding boxes. Empty tiles are dropped and the order of the
+        geometries inside each tile is preserved.
+
+        :param geometries: List of polygons.
+        :return: List of tiles, each a list of polygons.
+        """
+        if self.pool is None or len(geometries) < self.defaults["min_parallel"]:
+            return [geometries]
+
+        try:
+            bounds = np.array([g.bounds for g in geometries], dtype=float)
+            cx = (bounds[:, 0] + bounds[:, 2]) / 2.0
+            cy = (bounds[:, 1] + bounds[:, 3]) / 2.0
+        except (AttributeError, IndexError, ValueError):
+            # Something without bounds got into the list.
+            return [geometries]
+
+        n_tiles = (os.cpu_count() or 1) * self.defaults["tiles_per_process"]
+        n_side = max(int(ceil(sqrt(n_tiles))), 1)
+        if n_side < 2:
+            return [geometries]
+
+        def cell(c):
+            span = c.max() - c.min()
+            if not span > 0:
+                return np.zeros(len(c), dtype=int)
+            return np.minimum(((c - c.min()) / span * n_side).astype(int), n_side - 1)
+
+        tile_ids = cell(cx) * n_side + cell(cy)
+
+        # Stable sort keeps the original order inside each tile.
+        order = np.argsort(tile_ids, kind='stable')
+        splits = np.flatnonzero(np.diff(tile_ids[order])) + 1
+        return [[geometries[i] for i in chunk] for chunk in np.split(order, splits)]
+
+    @staticmethod
+    def merge(geometries, method="union", steps_per_circle=None):
+        """
+        Merges the geometries in this process.
+
+        * ``union``: cascaded union.
+        * ``buffer``: Union by buffering a MultiPolygon in and out, which
+          is usually faster than the union on Gerber data.
+        * ``union_fix``: cascaded union followed by buffer(0).
+
+        :param geometries: List of polygons.
+        :param method: One of the above.
+        :param steps_per_circle: For buffer(0) in ``union_fix``.
+        :return: Merged geometry.
+        """
+        if method == "buffer":
+            new_poly = MultiPolygon(geometries)
+            new_poly = new_poly.buffer(0.00000001)
+            return new_poly.buffer(-0.00000001)
+
+        new_poly = cascaded_union(geometries)
+        if method == "union_fix":
+            if steps_per_circle is None:
+                steps_per_circle = Gerber.defaults['steps_per_circle']
+            new_poly = new_poly.buffer(0, int(steps_per_circle / 4))
+        return new_poly
+
+
+def _clear_polygon(args):
+    """
+    Process pool worker for PolygonClearing. Geometry travels as WKB
+    both ways.
+
+    :param args: (method, wkb, tooldia, steps_per_circle, overlap, contour, connect)
+    :return: ([wkb, ...] or None, error message or None)
+    """
+    method, wkb, tooldia, steps_per_circle, overlap, contour, connect = args
+    try:
+        paths = PolygonClearing.clear_one(wkb_loads(wkb), method, tooldia, steps_per_circle,
+                                          overlap, contour, connect)
+    except Exception as e:
+        return None, str(e)
+    if paths is None:
+        return None, None
+    return [wkb_dumps(p) for p in paths], None
+
+
+class PolygonClearing(object):
+    """
+    Clears (paints) a list of independent polygons with one of the
+    Geometry.clear_polygon*() methods. Used by the NCC and Paint tools.
+
+    Every polygon is cleared on its own, so with a process pool they are
+    dispatched to the workers, largest first. Results are always returned
+    in the order of the input polygons, so the output does not depend on
+    the number of workers or on which one finishes first.
+
+    **USAGE**::
+
+        clearing = PolygonClearing(pool=app.pool)
+        for paths, error in clearing.clear(polygons, tooldia, steps, method="seed"):
+            ...
+
+    """
+
+    defaults = {
+        # Below this number of polygons everything is cleared in this process.
+        "min_parallel": 4
+    }
+
+    methods = {
+        "standard": "clear_polygon",
+        "seed": "clear_polygon2",
+        "lines": "clear_polygon3"
+    }
+
+    def __init__(self, pool=None):
+        """
+        :param pool: multiprocessing.Pool used to clear the polygons. If None
+            they are cleared in this process.
+        """
+        self.pool = pool
+
+    @staticmethod
+    def clear_one(polygon, method, tooldia, steps_per_circle, overlap=0.15, contour=True, connect=True):
+        """
+        Clears a single polygon in this process.
+
+        :param polygon: Polygon to clear.
+        :param method: "standard", "seed" or "lines".
+        :return: List of toolpaths or None if the tool does not fit.
+        """
+        clear = getattr(Geometry, PolygonClearing.methods.get(method, "clear_polygon3"))
+        cp = clear(polygon, tooldia, steps_per_circle, overlap=overlap, contour=contour, connect=connect)
+        if cp is None:
+            return None
+        return list(cp.get_objects())
+
+    def clear(self, polygons, tooldia, steps_per_circle, method="standard", overlap=0.15,
+              contour=True, connect=True):
+        """
+        Clears every polygon, in parallel if there is a pool and
+        enough polygons.
+
+        :param polygons: List of polygons.
+        :param tooldia: Diameter of the tool.
+        :param steps_per_circle: Circle approximation.
+        :param method: "standard", "seed" or "lines".
+        :param overlap: Overlap of toolpasses.
+        :param contour: Paint around the edges.
+        :param connect: Connect lines to avoid tool lifts.
+        :return: One (paths, error) per polygon, in the same order. paths is
+            a list of toolpaths or None if the polygon could not be cleared
+            and error is the error message if it failed.
+        :rtype: list
+        """
+        polygons = list(polygons)
+
+        # A single worker would only add the cost of moving the geometry around.
+        parallel = self.pool is not None and (os.cpu_count() or 1) > 1
+        if parallel and len(polygons) >= self.defaults["min_parallel"]:
+            # Largest first, so a big polygon does not start last.
+            order = sorted(range(len(polygons)), key=lambda i: -polygons[i].area)
+            try:
+                args = [(method, wkb_dumps(polygons[i]), tooldia, steps_per_circle, overlap, contour, connect)
+                        for i in order]
+                results = [None] * len(polygons)
+                for i, (paths, error) in zip(order, self.pool.map(_clear_polygon, args, chunksize=1)):
+                    if paths is not None:
+                        paths = [wkb_loads(w) for w in paths]
+                    results[i] = (paths, error)
+                return results
+            except Exception as e:
+                # Closed or broken pool.
+                log.warning("PolygonClearing: process pool failed (%s). Clearing in this process." % str(e))
+
+        results = []
+        for polygon in polygons:
+            try:
+                results.append((self.clear_one(polygon, method, tooldia, steps_per_circle,
+                                               overlap, contour, connect), None))
+            except Exception as e:
+                results.append((None, str(e)))
+        return results
+
+
 class Gerber (Geometry):
     """
     **ATTRIBUTES**
@@ -1924,6 +2206,10 @@ class Gerber (Geometry):
         # Operation code (D0x) missing is deprecated... oh well I will support it.
         self.lin_re = re.compile(r'^(?:G0?(1))?(?=.*X([\+-]?\d+))?(?=.*Y([\+-]?\d+))?[XY][^DIJ]*(?:D0?([123]))?\*$')
 
+        # Same as lin_re (same groups) for the usual X..Y..D0x* order only.
+        # No look-ahead, so it's several times faster. lin_re is the fallback.
+        self.lin_fast_re = re.compile(r'^(?:G0?(1))?(?:X([\+-]?\d+))?(?:Y([\+-]?\d+))?(?:D0?([123]))?\*$')
+
         # Operation code alone, usually just D03 (Flash)
         self.opcode_re = re.compile(r'^D0?([123])\*$')
 
@@ -1974,6 +2260,10 @@ class Gerber (Geometry):
 
         self.use_buffer_for_union = self.defaults["use_buffer_for_union"]
 
+        # Process pool for merging polygons in parallel (see TiledUnion).
+        # Set by the owner of the object, None merges in this process.
+        self.pool = None
+
     def aperture_parse(self, apertureId, apertureType, apParameters):
         """
         Parse gerber aperture definition into dictionary of apertures.
@@ -2062,31 +2352,55 @@ class Gerber (Geometry):
         """
 
         with open(filename, 'r') as gfile:
+            self.parse_lines(Gerber.read_statements(gfile), follow=follow)
 
-            def line_generator():
-                for line in gfile:
-                    line = line.strip(' \r\n')
-                    while len(line) > 0:
+    @staticmethod
+    def read_statements(gfile, chunk_size=1048576):
+        """
+        Generator of Gerber statements read from a file object. The
+        file is read in chunks of ``chunk_size`` characters instead of
+        line by line.
 
-                        # If ends with '%' leave as is.
-                        if line[-1] == '%':
-                            yield line
-                            break
+        Lines ending in '%' (extended commands) are yielded as they are,
+        other lines are split after every '*', so ``G54D11*G36*`` gives
+        ``G54D11*`` and ``G36*``. Anything after the last '*' is
+        yielded too.
 
-                        # Split after '*' if any.
-                        starpos = line.find('*')
-                        if starpos > -1:
-                            cleanline = line[:starpos + 1]
-                            yield cleanline
-                            line = line[starpos + 1:]
+        :param gfile: File object opened in text mode.
+        :param chunk_size: Characters to read at once.
+        :type chunk_size: int
+        :return: Generator of str
+        """
+        tail = ''
+        while True:
+            chunk = gfile.read(chunk_size)
+            if not chunk:
+                lines = [tail]
+            else:
+                lines = (tail + chunk).split('\n')
+                # Last one might be incomplete
+                tail = lines.pop()
 
-                        # Otherwise leave as is.
-                        else:
-                            # yield cleanline
-                            yield line
-                            break
+            for line in lines:
+                line = line.strip(' \r\n')
+                if not line:
+                    continue
+
+                # If ends with '%' leave as is.
+                if line[-1] == '%':
+                    yield line
+                    continue
 
-            self.parse_lines(line_generator(), follow=follow)
+                # Split after '*' if any.
+                parts = line.split('*')
+                last = parts.pop()
+                for part in parts:
+                    yield part + '*'
+                if last:
+                    yield last
+
+            if not chunk:
+                break
 
     #@profile
     def parse_lines(self, glines, follow=False):
@@ -2111,10 +2425,26 @@ class Gerber (Geometry):
         geo = None
 
         # Polygons are stored here until there is a change in polarity.
-        # Only then they are combined via cascaded_union and added or
-        # subtracted from solid_geometry. This is ~100 times faster than
+        # Only then they are handed to union_stage as a layer, which
+        # combines them via a (tiled) union and adds or subtracts them
+        # from solid_geometry at the end. This is ~100 times faster than
         # applying a union for every new polygon.
         poly_buffer = []
+        union_stage = TiledUnion(pool=self.pool, steps_per_circle=self.steps_per_circle)
+
+        # Flashes are not turned into polygons one by one. Their locations
+        # are grouped by aperture and expanded in bulk from a single
+        # template (see create_flash_geometries()) when poly_buffer is
+        # handed over.
+        # {id(aperture): [aperture, [[x, y], ...]]}
+        flash_buffer = collections.OrderedDict()
+
+        def flush_flashes():
+            flashes = []
+            for aperture, locations in flash_buffer.values():
+                flashes += Gerber.create_flash_geometries(locations, aperture, int(self.steps_per_circle))
+            flash_buffer.clear()
+            return flashes
 
         last_path_aperture = None
         current_aperture = None
@@ -2162,9 +2492,13 @@ class Gerber (Geometry):
                 gline = gline.strip(' \r\n')
                 # log.debug("Line=%3s %s" % (line_num, gline))
 
+                # Statements are only tested against the patterns
+                # that can match their first character.
+                prefix = gline[:1]
+
                 #### Ignored lines
                 ## Comments
-                match = self.comm_re.search(gline)
+                match = self.comm_re.search(gline) if prefix == 'G' else None
                 if match:
                     continue
 
@@ -2172,7 +2506,7 @@ class Gerber (Geometry):
                 # Example: %LPD*% or %LPC*%
                 # If polarity changes, creates geometry from current
                 # buffer, then adds or subtracts accordingly.
-                match = self.lpol_re.search(gline)
+                match = self.lpol_re.search(gline) if prefix == '%' else None
                 if match:
                     if len(path) > 1 and current_polarity != match.group(1):
 
@@ -2191,11 +2525,11 @@ class Gerber (Geometry):
                     # --- Apply buffer ---
                     # If added for testing of bug #83
                     # TODO: Remove when bug fixed
+                    # Only the last buffer makes it to solid_geometry in follow mode.
+                    poly_buffer += flush_flashes()
                     if len(poly_buffer) > 0:
-                        if current_polarity == 'D':
-                            self.solid_geometry = self.solid_geometry.union(cascaded_union(poly_buffer))
-                        else:
-                            self.solid_geometry = self.solid_geometry.difference(cascaded_union(poly_buffer))
+                        if not follow:
+                            union_stage.add_layer(current_polarity, poly_buffer)
                         poly_buffer = []
 
                     current_polarity = match.group(1)
@@ -2204,7 +2538,7 @@ class Gerber (Geometry):
                 ### Number format
                 # Example: %FSLAX24Y24*%
                 # TODO: This is ignoring most of the format. Implement the rest.
-                match = self.fmt_re.search(gline)
+                match = self.fmt_re.search(gline) if prefix == '%' else None
                 if match:
                     absolute = {'A': 'Absolute', 'I': 'Relative'}[match.group(2)]
                     self.gerber_zeros = match.group(1)
@@ -2220,7 +2554,7 @@ class Gerber (Geometry):
 
                 ### Mode (IN/MM)
                 # Example: %MOIN*%
-                match = self.mode_re.search(gline)
+                match = self.mode_re.search(gline) if prefix == '%' else None
                 if match:
                     gerber_units = match.group(1)
                     log.debug("Gerber units found = %s" % gerber_units)
@@ -2229,7 +2563,7 @@ class Gerber (Geometry):
                     continue
 
                 ### Combined Number format and Mode --- Allegro does this
-                match = self.fmt_re_alt.search(gline)
+                match = self.fmt_re_alt.search(gline) if prefix == '%' else None
                 if match:
                     absolute = {'A': 'Absolute', 'I': 'Relative'}[match.group(2)]
                     self.gerber_zeros = match.group(1)
@@ -2248,7 +2582,7 @@ class Gerber (Geometry):
                     continue
 
                 ### Search for OrCAD way for having Number format
-                match = self.fmt_re_orcad.search(gline)
+                match = self.fmt_re_orcad.search(gline) if '%FS' in gline else None
                 if match:
                     if match.group(1) is not None:
                         if match.group(1) == 'G74':
@@ -2272,7 +2606,7 @@ class Gerber (Geometry):
                         continue
 
                 ### Units (G70/1) OBSOLETE
-                match = self.units_re.search(gline)
+                match = self.units_re.search(gline) if prefix == 'G' else None
                 if match:
                     obs_gerber_units = {'0': 'IN', '1': 'MM'}[match.group(1)]
                     log.warning("Gerber obsolete units found = %s" % obs_gerber_units)
@@ -2281,7 +2615,7 @@ class Gerber (Geometry):
                     continue
 
                 ### Absolute/relative coordinates G90/1 OBSOLETE
-                match = self.absrel_re.search(gline)
+                match = self.absrel_re.search(gline) if prefix == 'G' else None
                 if match:
                     absolute = {'0': "Absolute", '1': "Relative"}[match.group(1)]
                     log.warning("Gerber obsolete coordinates type found = %s (Absolute or Relative) " % absolute)
@@ -2292,7 +2626,7 @@ class Gerber (Geometry):
                 # but macros can have complicated statements than could
                 # be caught by other patterns.
                 if current_macro is None:  # No macro started yet
-                    match = self.am1_re.search(gline)
+                    match = self.am1_re.search(gline) if prefix == '%' else None
                     # Start macro if match, else not an AM, carry on.
                     if match:
                         log.debug("Starting macro. Line %d: %s" % (line_num, gline))
@@ -2318,7 +2652,7 @@ class Gerber (Geometry):
                     continue
 
                 ### Aperture definitions %ADD...
-                match = self.ad_re.search(gline)
+                match = self.ad_re.search(gline) if prefix == '%' else None
                 if match:
                     log.info("Found aperture definition. Line %d: %s" % (line_num, gline))
                     self.aperture_parse(match.group(1), match.group(2), match.group(3))
@@ -2327,7 +2661,7 @@ class Gerber (Geometry):
                 ### Operation code alone
                 # Operation code alone, usually just D03 (Flash)
                 # self.opcode_re = re.compile(r'^D0?([123])\*$')
-                match = self.opcode_re.search(gline)
+                match = self.opcode_re.search(gline) if prefix == 'D' else None
                 if match:
                     current_operation_code = int(match.group(1))
                     current_d = current_operation_code
@@ -2341,11 +2675,9 @@ class Gerber (Geometry):
                             #                                      self.apertures[current_aperture])
                             if follow:
                                 continue
-                            flash = Gerber.create_flash_geometry(
-                                Point(current_x, current_y), self.apertures[current_aperture],
-                                int(self.steps_per_circle))
-                            if not flash.is_empty:
-                                poly_buffer.append(flash)
+                            aperture = self.apertures[current_aperture]
+                            flash_buffer.setdefault(id(aperture), [aperture, []])[1].append(
+                                [current_x, current_y])
                         except IndexError:
                             log.warning("Line %d: %s -> Nothing there to flash!" % (line_num, gline))
 
@@ -2353,7 +2685,7 @@ class Gerber (Geometry):
 
                 ### Tool/aperture change
                 # Example: D12*
-                match = self.tool_re.search(gline)
+                match = self.tool_re.search(gline) if prefix == 'D' or prefix == 'G' else None
                 if match:
                     current_aperture = match.group(1)
                     log.debug("Line %d: Aperture change to (%s)" % (line_num, match.group(1)))
@@ -2388,7 +2720,7 @@ class Gerber (Geometry):
                     continue
 
                 ### G36* - Begin region
-                if self.regionon_re.search(gline):
+                if prefix == 'G' and self.regionon_re.search(gline):
                     if len(path) > 1:
                         # Take care of what is left in the path
 
@@ -2408,7 +2740,7 @@ class Gerber (Geometry):
                     continue
 
                 ### G37* - End region
-                if self.regionoff_re.search(gline):
+                if prefix == 'G' and self.regionoff_re.search(gline):
                     making_region = False
 
                     # if D02 happened before G37 we now have a path with 1 element only so we have to add the current
@@ -2452,7 +2784,7 @@ class Gerber (Geometry):
                 # Can occur along with coordinates and operation code but
                 # sometimes by itself (handled here).
                 # Example: G01*
-                match = self.interp_re.search(gline)
+                match = self.interp_re.search(gline) if prefix == 'G' else None
                 if match:
                     current_interpolation_mode = int(match.group(1))
                     continue
@@ -2460,7 +2792,11 @@ class Gerber (Geometry):
                 ### G01 - Linear interpolation plus flashes
                 # Operation code (D0x) missing is deprecated... oh well I will support it.
                 # REGEX: r'^(?:G0?(1))?(?:X(-?\d+))?(?:Y(-?\d+))?(?:D0([123]))?\*$'
-                match = self.lin_re.search(gline)
+                match = None
+                if prefix == 'X' or prefix == 'Y' or prefix == 'G':
+                    match = self.lin_fast_re.search(gline)
+                    if match is None or (match.group(2) is None and match.group(3) is None):
+                        match = self.lin_re.search(gline)
                 if match:
                     # Dxx alone?
                     # if match.group(1) is None and match.group(2) is None and match.group(3) is None:
@@ -2473,22 +2809,21 @@ class Gerber (Geometry):
                     #       operation code.
 
                     # Parse coordinates
-                    if match.group(2) is not None:
-                        linear_x = parse_gerber_number(match.group(2),
-                                                       self.int_digits, self.frac_digits, self.gerber_zeros)
+                    _, str_x, str_y, str_d = match.groups()
+                    if str_x is not None:
+                        linear_x = parse_gerber_number(str_x, self.int_digits, self.frac_digits, self.gerber_zeros)
                         current_x = linear_x
                     else:
                         linear_x = current_x
-                    if match.group(3) is not None:
-                        linear_y = parse_gerber_number(match.group(3),
-                                                       self.int_digits, self.frac_digits, self.gerber_zeros)
+                    if str_y is not None:
+                        linear_y = parse_gerber_number(str_y, self.int_digits, self.frac_digits, self.gerber_zeros)
                         current_y = linear_y
                     else:
                         linear_y = current_y
 
                     # Parse operation code
-                    if match.group(4) is not None:
-                        current_operation_code = int(match.group(4))
+                    if str_d is not None:
+                        current_operation_code = int(str_d)
 
                     # Pen down: add segment
                     if current_operation_code == 1:
@@ -2592,14 +2927,9 @@ class Gerber (Geometry):
                         # Draw the flash
                         if follow:
                             continue
-                        flash = Gerber.create_flash_geometry(
-                            Point(
-                                [linear_x, linear_y]),
-                            self.apertures[current_aperture],
-                            int(self.steps_per_circle)
-                        )
-                        if not flash.is_empty:
-                            poly_buffer.append(flash)
+                        aperture = self.apertures[current_aperture]
+                        flash_buffer.setdefault(id(aperture), [aperture, []])[1].append(
+                            [linear_x, linear_y])
 
                     # maybe those lines are not exactly needed but it is easier to read the program as those coordinates
                     # are used in case that circular interpolation is encountered within the Gerber file
@@ -2610,7 +2940,7 @@ class Gerber (Geometry):
                     continue
 
                 ### G74/75* - Single or multiple quadrant arcs
-                match = self.quad_re.search(gline)
+                match = self.quad_re.search(gline) if prefix == 'G' else None
                 if match:
                     if match.group(1) == '4':
                         quadrant_mode = 'SINGLE'
@@ -2621,7 +2951,7 @@ class Gerber (Geometry):
                 ### G02/3 - Circular interpolation
                 # 2-clockwise, 3-counterclockwise
                 # Ex. format: G03 X0 Y50 I-50 J0 where the X, Y coords are the coords of the End Point
-                match = self.circ_re.search(gline)
+                match = self.circ_re.search(gline) if prefix in ('G', 'X', 'Y', 'I', 'J') else None
                 if match:
                     arcdir = [None, None, "cw", "ccw"]
 
@@ -2786,7 +3116,7 @@ class Gerber (Geometry):
                             log.warning("Invalid arc in line %d." % line_num)
 
                 ## EOF
-                match = self.eof_re.search(gline)
+                match = self.eof_re.search(gline) if prefix == 'M' else None
                 if match:
                     continue
 
@@ -2815,27 +3145,20 @@ class Gerber (Geometry):
                 self.solid_geometry = poly_buffer
                 return
 
+            poly_buffer += flush_flashes()
             log.warning("Joining %d polygons." % len(poly_buffer))
 
             if len(poly_buffer) == 0:
                 log.error("Object is not Gerber file or empty. Aborting Object creation.")
-                return
-
-            if self.use_buffer_for_union:
+            elif self.use_buffer_for_union:
                 log.debug("Union by buffer...")
-                new_poly = MultiPolygon(poly_buffer)
-                new_poly = new_poly.buffer(0.00000001)
-                new_poly = new_poly.buffer(-0.00000001)
-                log.warning("Union(buffer) done.")
+                union_stage.add_layer(current_polarity, poly_buffer, method="buffer")
             else:
                 log.debug("Union by union()...")
-                new_poly = cascaded_union(poly_buffer)
-                new_poly = new_poly.buffer(0, int(self.steps_per_circle / 4))
-                log.warning("Union done.")
-            if current_polarity == 'D':
-                self.solid_geometry = self.solid_geometry.union(new_poly)
-            else:
-                self.solid_geometry = self.solid_geometry.difference(new_poly)
+                union_stage.add_layer(current_polarity, poly_buffer, method="union_fix")
+
+            self.solid_geometry = union_stage.apply(self.solid_geometry)
+            log.warning("Union done.")
 
         except Exception as err:
             ex_type, ex, tb = sys.exc_info()
@@ -2908,6 +3231,37 @@ class Gerber (Geometry):
 
         log.warning("Unknown aperture type: %s" % aperture['type'])
         return None
+
+    @staticmethod
+    def create_flash_geometries(locations, aperture, steps_per_circle=None):
+        """
+        Flashes the same aperture at many locations. The flash geometry
+        is created once at the origin and then translated to every location
+        in a single array operation. Produces the same shapes as calling
+        create_flash_geometry() for each location.
+
+        :param locations: List of [x, y] flash locations.
+        :param aperture: Aperture dictionary as in Gerber.apertures.
+        :param steps_per_circle: Number of segments in a circle.
+        :return: List of flash polygons. Empty if the aperture
+         produces no geometry.
+        :rtype: list
+        """
+
+        template = Gerber.create_flash_geometry(Point(0, 0), aperture, steps_per_circle)
+        if template is None or template.is_empty or len(locations) == 0:
+            return []
+
+        offsets = np.array(locations, dtype=float).reshape(-1, 2)
+
+        # Macros can produce holes or several polygons, these are
+        # translated one by one.
+        if type(template) is not Polygon or len(template.interiors) > 0:
+            return [affinity.translate(template, xoff=x, yoff=y) for x, y in offsets]
+
+        shell = np.array(template.exterior.coords)
+        coords = shell[np.newaxis, :, :] + offsets[:, np.newaxis, :]
+        return list(shapely.polygons(coords))
     
     def create_geometry(self):
         """
@@ -3021,17 +3375,7 @@ class Gerber (Geometry):
         else:
             px, py = point
 
-        def scale_geom(obj):
-            if type(obj) is list:
-                new_obj = []
-                for g in obj:
-                    new_obj.append(scale_geom(g))
-                return new_obj
-            else:
-                return affinity.scale(obj, xfactor,
-                                             yfactor, origin=(px, py))
-
-        self.solid_geometry = scale_geom(self.solid_geometry)
+        self.solid_geometry = transform_geometry(self.solid_geometry, scale_matrix(xfactor, yfactor, (px, py)))
 
         ## solid_geometry ???
         #  It's a cascaded union of objects.
@@ -3063,18 +3407,9 @@ class Gerber (Geometry):
 
         dx, dy = vect
 
-        def offset_geom(obj):
-            if type(obj) is list:
-                new_obj = []
-                for g in obj:
-                    new_obj.append(offset_geom(g))
-                return new_obj
-            else:
-                return affinity.translate(obj, xoff=dx, yoff=dy)
-
         ## Solid geometry
         # self.solid_geometry = affinity.translate(self.solid_geometry, xoff=dx, yoff=dy)
-        self.solid_geometry = offset_geom(self.solid_geometry)
+        self.solid_geometry = transform_geometry(self.solid_geometry, translation_matrix(dx, dy))
 
     def mirror(self, axis, point):
         """
@@ -3098,19 +3433,9 @@ class Gerber (Geometry):
         :return: None
         """
 
-        px, py = point
         xscale, yscale = {"X": (1.0, -1.0), "Y": (-1.0, 1.0)}[axis]
 
-        def mirror_geom(obj):
-            if type(obj) is list:
-                new_obj = []
-                for g in obj:
-                    new_obj.append(mirror_geom(g))
-                return new_obj
-            else:
-                return affinity.scale(obj, xscale, yscale, origin=(px, py))
-
-        self.solid_geometry = mirror_geom(self.solid_geometry)
+        self.solid_geometry = transform_geometry(self.solid_geometry, scale_matrix(xscale, yscale, point))
 
         #  It's a cascaded union of objects.
         # self.solid_geometry = affinity.scale(self.solid_geometry,
@@ -3132,18 +3457,7 @@ class Gerber (Geometry):
         http://toblerity.org/shapely/manual.html#affine-transformations
         """
 
-        px, py = point
-
-        def skew_geom(obj):
-            if type(obj) is list:
-                new_obj = []
-                for g in obj:
-                    new_obj.append(skew_geom(g))
-                return new_obj
-            else:
-                return affinity.skew(obj, angle_x, angle_y, origin=(px, py))
-
-        self.solid_geometry = skew_geom(self.solid_geometry)
+        self.solid_geometry = transform_geometry(self.solid_geometry, skew_matrix(angle_x, angle_y, point))
 
         # self.solid_geometry = affinity.skew(self.solid_geometry, angle_x, angle_y, origin=(px, py))
 
@@ -3155,89 +3469,390 @@ class Gerber (Geometry):
         :return:
         """
 
-        px, py = point
-
-        def rotate_geom(obj):
-            if type(obj) is list:
-                new_obj = []
-                for g in obj:
-                    new_obj.append(rotate_geom(g))
-                return new_obj
-            else:
-                return affinity.rotate(obj, angle, origin=(px, py))
-
-        self.solid_geometry = rotate_geom(self.solid_geometry)
+        self.solid_geometry = transform_geometry(self.solid_geometry, rotation_matrix(angle, point))
 
         # self.solid_geometry = affinity.rotate(self.solid_geometry, angle, origin=(px, py))
 
 
-class Excellon(Geometry):
+class _HitRow(collections.abc.MutableMapping):
+    """
+    One hit of a HitTable, used like the former
+    {'point': Point, 'tool': str} dictionaries. Reads and writes
+    go to the table arrays.
     """
-    *ATTRIBUTES*
 
-    * ``tools`` (dict): The key is the tool name and the value is
-      a dictionary specifying the tool:
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
 
-    ================  ====================================
-    Key               Value
-    ================  ====================================
-    C                 Diameter of the tool
-    Others            Not supported (Ignored).
-    ================  ====================================
+    def __getitem__(self, key):
+        if key == 'tool':
+            return self.table.tool_names[self.table._tool_index[self.row]]
+        try:
+            i = 2 * self.table.fields.index(key)
+        except ValueError:
+            raise KeyError(key)
+        return Point(self.table._coords[self.row, i:i + 2])
+
+    def __setitem__(self, key, value):
+        if key == 'tool':
+            self.table._tool_index[self.row] = self.table.tool_id(value)
+            return
+        try:
+            i = 2 * self.table.fields.index(key)
+        except ValueError:
+            raise KeyError(key)
+        self.table._coords[self.row, i:i + 2] = HitTable.point_xy(value)
 
-    * ``drills`` (list): Each is a dictionary:
+    def __delitem__(self, key):
+        raise TypeError("Excellon hits can't lose their '%s'" % key)
 
-    ================  ====================================
-    Key               Value
-    ================  ====================================
-    point             (Shapely.Point) Where to drill
-    tool              (str) A key in ``tools``
-    ================  ====================================
+    def __iter__(self):
+        return iter(self.table.fields + ('tool',))
 
-    * ``slots`` (list): Each is a dictionary
+    def __len__(self):
+        return len(self.table.fields) + 1
 
-    ================  ====================================
-    Key               Value
-    ================  ====================================
-    start             (Shapely.Point) Start point of the slot
-    start             (Shapely.Point) Stop point of the slot
-    tool              (str) A key in ``tools``
-    ================  ====================================
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class HitTable(object):
+    """
+    Columnar storage of Excellon hits. Coordinates are kept in one
+    NumPy array, one (x, y) column pair for every name in ``fields``,
+    and the tool of every hit as an index into ``tool_names``.
+
+    For compatibility it behaves like a list of dictionaries with
+    ``fields`` and 'tool' keys: it can be iterated, indexed, appended
+    and extended with such dictionaries. The rows are views on the
+    arrays (see _HitRow).
     """
 
-    defaults = {
-        "zeros": "L",
-        "excellon_format_upper_mm": '3',
-        "excellon_format_lower_mm": '3',
-        "excellon_format_upper_in": '2',
-        "excellon_format_lower_in": '4',
-        "excellon_units": 'INCH',
-        "geo_steps_per_circle": '64'
-    }
+    # Names of the points of one hit
+    fields = ()
 
-    def __init__(self, zeros=None, excellon_format_upper_mm=None, excellon_format_lower_mm=None,
-                 excellon_format_upper_in=None, excellon_format_lower_in=None, excellon_units=None,
-                 geo_steps_per_circle=None):
+    def __init__(self, hits=None):
         """
-        The constructor takes no parameters.
 
-        :return: Excellon object.
-        :rtype: Excellon
+        :param hits: Iterable of hit dictionaries or a HitTable to copy.
         """
+        self._coords = np.empty((16, 2 * len(self.fields)))
+        self._tool_index = np.empty(16, dtype=np.int32)
+        self.count = 0
 
-        if geo_steps_per_circle is None:
-            geo_steps_per_circle = Excellon.defaults['geo_steps_per_circle']
-        self.geo_steps_per_circle = geo_steps_per_circle
+        self.tool_names = []
+        self._tool_ids = {}
 
-        Geometry.__init__(self, geo_steps_per_circle=geo_steps_per_circle)
+        if hits is not None:
+            self.extend(hits)
+
+    @staticmethod
+    def point_xy(point):
+        """
+        :param point: Shapely Point or (x, y).
+        :return: (x, y)
+        """
+        if isinstance(point, BaseGeometry):
+            return point.x, point.y
+        return point
+
+    @property
+    def coords(self):
+        """
+        (n, 2 * len(fields)) array, coordinates of all the hits.
+        """
+        return self._coords[:self.count]
+
+    @property
+    def tool_index(self):
+        """
+        Tool of every hit, index into ``tool_names``.
+        """
+        return self._tool_index[:self.count]
+
+    def tool_id(self, tool):
+        """
+        Index of the tool in ``tool_names``, added if missing.
+
+        :param tool: Tool name.
+        :return: int
+        """
+        try:
+            return self._tool_ids[tool]
+        except KeyError:
+            self._tool_ids[tool] = len(self.tool_names)
+            self.tool_names.append(tool)
+            return self._tool_ids[tool]
+
+    def _reserve(self, n):
+        size = self.count + n
+        if size > len(self._coords):
+            capacity = max(size, 2 * len(self._coords))
+            coords = np.empty((capacity, self._coords.shape[1]))
+            coords[:self.count] = self.coords
+            tool_index = np.empty(capacity, dtype=np.int32)
+            tool_index[:self.count] = self.tool_index
+            self._coords, self._tool_index = coords, tool_index
+
+    def add(self, tool, *points):
+        """
+        Adds one hit.
+
+        :param tool: Tool name.
+        :param points: One (x, y) or Point for each of ``fields``.
+        :return: None
+        """
+        self._reserve(1)
+        self._coords[self.count] = [c for point in points for c in self.point_xy(point)]
+        self._tool_index[self.count] = self.tool_id(tool)
+        self.count += 1
+
+    def add_many(self, tool, coords):
+        """
+        Adds hits of one tool.
+
+        :param tool: Tool name.
+        :param coords: (n, 2 * len(fields)) array.
+        :return: None
+        """
+        coords = np.asarray(coords, dtype=float).reshape((-1, 2 * len(self.fields)))
+        self._reserve(len(coords))
+        self._coords[self.count:self.count + len(coords)] = coords
+        self._tool_index[self.count:self.count + len(coords)] = self.tool_id(tool)
+        self.count += len(coords)
+
+    def append(self, hit):
+        """
+        :param hit: Dictionary with ``fields`` and 'tool' keys.
+        :return: None
+        """
+        self.add(hit['tool'], *[hit[field] for field in self.fields])
+
+    def extend(self, hits):
+        """
+        :param hits: HitTable or iterable of hit dictionaries.
+        :return: None
+        """
+        if isinstance(hits, HitTable):
+            remap = np.array([self.tool_id(tool) for tool in hits.tool_names] or [0], dtype=np.int32)
+            self._reserve(len(hits))
+            self._coords[self.count:self.count + len(hits)] = hits.coords
+            self._tool_index[self.count:self.count + len(hits)] = remap[hits.tool_index]
+            self.count += len(hits)
+        else:
+            for hit in hits:
+                self.append(hit)
+
+    def mask(self, tool):
+        """
+        :param tool: Tool name.
+        :return: Boolean array, True for the hits of the tool.
+        """
+        if tool not in self._tool_ids:
+            return np.zeros(self.count, dtype=bool)
+        return self.tool_index == self._tool_ids[tool]
+
+    def coords_of(self, tool):
+        """
+        :param tool: Tool name.
+        :return: Coordinates of the hits of the tool, in order.
+        """
+        return self.coords[self.mask(tool)]
+
+    def counts(self):
+        """
+        :return: Dictionary, number of hits of every tool name.
+        """
+        counts = np.bincount(self.tool_index, minlength=len(self.tool_names))
+        return {tool: int(n) for tool, n in zip(self.tool_names, counts)}
+
+    def tile(self, offsets):
+        """
+        New table with all the hits repeated for every offset,
+        copies in the order of the offsets.
+
+        :param offsets: (n, 2) array or list of [dx, dy].
+        :return: Table of the same type.
+        """
+        offsets = np.asarray(offsets, dtype=float).reshape((-1, 2))
+        table = type(self)()
+        for tool in self.tool_names:
+            table.tool_id(tool)
+
+        # Same offset for all the points of a hit
+        shift = np.tile(offsets, len(self.fields))
+        count = len(offsets) * self.count
+        table._reserve(count)
+        coords = self.coords[np.newaxis, :, :] + shift[:, np.newaxis, :]
+        table._coords[:count] = coords.reshape((count, 2 * len(self.fields)))
+        table._tool_index[:count] = np.tile(self.tool_index, len(offsets))
+        table.count = count
+        return table
+
+    def transform(self, matrix):
+        """
+        Applies an affine matrix to all the points of all the hits.
+
+        :param matrix: 3x3 affine matrix, see translation_matrix() and others.
+        :return: None
+        """
+        points = self.coords.reshape((-1, 2))
+        points[:] = points.dot(matrix[:2, :2].T) + matrix[:2, 2]
+
+    def to_list(self):
+        """
+        :return: List of plain hit dictionaries, with Shapely Points.
+        """
+        return [dict(hit) for hit in self]
+
+    def to_dict(self):
+        return {'coords': self.coords.tolist(), 'tool_index': self.tool_index.tolist(),
+                'tool_names': list(self.tool_names)}
+
+    @classmethod
+    def from_dict(cls, d):
+        table = cls()
+        for tool in d['tool_names']:
+            table.tool_id(tool)
+        coords = np.array(d['coords'], dtype=float).reshape((-1, 2 * len(cls.fields)))
+        table._reserve(len(coords))
+        table._coords[:len(coords)] = coords
+        table._tool_index[:len(coords)] = d['tool_index']
+        table.count = len(coords)
+        return table
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return (_HitRow(self, row) for row in range(self.count))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [_HitRow(self, row) for row in range(self.count)[index]]
+        return _HitRow(self, range(self.count)[index])
+
+    def __delitem__(self, index):
+        keep = np.ones(self.count, dtype=bool)
+        keep[index] = False
+        n = int(keep.sum())
+        self._coords[:n] = self.coords[keep]
+        self._tool_index[:n] = self.tool_index[keep]
+        self.count = n
+
+    def __repr__(self):
+        return "%s(%d hits)" % (type(self).__name__, self.count)
+
+
+class DrillTable(HitTable):
+    """
+    Drill hits, {'point': Point, 'tool': str} when used as a list.
+    """
+    fields = ('point', )
+
+
+class SlotTable(HitTable):
+    """
+    Slots, {'start': Point, 'stop': Point, 'tool': str} when used as a list.
+    """
+    fields = ('start', 'stop')
+
+
+class Excellon(Geometry):
+    """
+    *ATTRIBUTES*
+
+    * ``tools`` (dict): The key is the tool name and the value is
+      a dictionary specifying the tool:
+
+    ================  ====================================
+    Key               Value
+    ================  ====================================
+    C                 Diameter of the tool
+    Others            Not supported (Ignored).
+    ================  ====================================
+
+    * ``drills`` (DrillTable): Used as a list, each is a dictionary:
+
+    ================  ====================================
+    Key               Value
+    ================  ====================================
+    point             (Shapely.Point) Where to drill
+    tool              (str) A key in ``tools``
+    ================  ====================================
+
+    Lists of such dictionaries assigned to ``drills`` are
+    converted to a DrillTable.
+
+    * ``slots`` (SlotTable): Used as a list, each is a dictionary
+
+    ================  ====================================
+    Key               Value
+    ================  ====================================
+    start             (Shapely.Point) Start point of the slot
+    start             (Shapely.Point) Stop point of the slot
+    tool              (str) A key in ``tools``
+    ================  ====================================
+    """
+
+    defaults = {
+        "zeros": "L",
+        "excellon_format_upper_mm": '3',
+        "excellon_format_lower_mm": '3',
+        "excellon_format_upper_in": '2',
+        "excellon_format_lower_in": '4',
+        "excellon_units": 'INCH',
+        "geo_steps_per_circle": '64'
+    }
+
+    # Drills and slots live in the instance dictionary, so FlatCAMObj
+    # can defer loading them (see FlatCAMObj.from_dict_lazy()).
+    @property
+    def drills(self):
+        try:
+            return self.__dict__['drills']
+        except KeyError:
+            raise AttributeError('drills')
+
+    @drills.setter
+    def drills(self, value):
+        self.__dict__['drills'] = value if isinstance(value, DrillTable) else DrillTable(value)
+
+    @property
+    def slots(self):
+        try:
+            return self.__dict__['slots']
+        except KeyError:
+            raise AttributeError('slots')
+
+    @slots.setter
+    def slots(self, value):
+        self.__dict__['slots'] = value if isinstance(value, SlotTable) else SlotTable(value)
+
+    def __init__(self, zeros=None, excellon_format_upper_mm=None, excellon_format_lower_mm=None,
+                 excellon_format_upper_in=None, excellon_format_lower_in=None, excellon_units=None,
+                 geo_steps_per_circle=None):
+        """
+        The constructor takes no parameters.
+
+        :return: Excellon object.
+        :rtype: Excellon
+        """
+
+        if geo_steps_per_circle is None:
+            geo_steps_per_circle = Excellon.defaults['geo_steps_per_circle']
+        self.geo_steps_per_circle = geo_steps_per_circle
+
+        Geometry.__init__(self, geo_steps_per_circle=geo_steps_per_circle)
 
         # dictionary to store tools, see above for description
         self.tools = {}
-        # list to store the drills, see above for description
-        self.drills = []
+        # table to store the drills, see above for description
+        self.drills = DrillTable()
 
-        # self.slots (list) to store the slots; each is a dictionary
-        self.slots = []
+        # self.slots (table) to store the slots; each is a dictionary when used as a list
+        self.slots = SlotTable()
 
         # it serve to flag if a start routing or a stop routing was encountered
         # if a stop is encounter and this flag is still 0 (so there is no stop for a previous start) issue error
@@ -3607,13 +4222,7 @@ class Excellon(Geometry):
                                 )
                             )
 
-                            self.slots.append(
-                                {
-                                    'start': Point(slot_start_x, slot_start_y),
-                                    'stop': Point(slot_stop_x, slot_stop_y),
-                                    'tool': current_tool
-                                }
-                            )
+                            self.slots.add(current_tool, (slot_start_x, slot_start_y), (slot_stop_x, slot_stop_y))
                             continue
 
                         # Slot coordinates with period: Use literally. ##
@@ -3676,13 +4285,7 @@ class Excellon(Geometry):
                                 )
                             )
 
-                            self.slots.append(
-                                {
-                                    'start': Point(slot_start_x, slot_start_y),
-                                    'stop': Point(slot_stop_x, slot_stop_y),
-                                    'tool': current_tool
-                                }
-                            )
+                            self.slots.add(current_tool, (slot_start_x, slot_start_y), (slot_stop_x, slot_stop_y))
                         continue
 
                     ## Coordinates without period ##
@@ -3738,20 +4341,14 @@ class Excellon(Geometry):
                                 self.routing_flag = 1
                                 slot_stop_x = x
                                 slot_stop_y = y
-                                self.slots.append(
-                                    {
-                                        'start': Point(slot_start_x, slot_start_y),
-                                        'stop': Point(slot_stop_x, slot_stop_y),
-                                        'tool': current_tool
-                                    }
-                                )
+                                self.slots.add(current_tool, (slot_start_x, slot_start_y), (slot_stop_x, slot_stop_y))
                                 continue
 
                         if self.match_routing_start is None and self.match_routing_stop is None:
                             if repeat == 0:
                                 # signal that there are drill operations
                                 self.defaults['excellon_drills'] = True
-                                self.drills.append({'point': Point((x, y)), 'tool': current_tool})
+                                self.drills.add(current_tool, (x, y))
                             else:
                                 coordx = x
                                 coordy = y
@@ -3760,7 +4357,7 @@ class Excellon(Geometry):
                                         coordx = (repeat * x) + repeating_x
                                     if repeating_y:
                                         coordy = (repeat * y) + repeating_y
-                                    self.drills.append({'point': Point((coordx, coordy)), 'tool': current_tool})
+                                    self.drills.add(current_tool, (coordx, coordy))
                                     repeat -= 1
                             repeating_x = repeating_y = 0
                             log.debug("{:15} {:8} {:8}".format(eline, x, y))
@@ -3819,13 +4416,7 @@ class Excellon(Geometry):
                                 self.routing_flag = 1
                                 slot_stop_x = x
                                 slot_stop_y = y
-                                self.slots.append(
-                                    {
-                                        'start': Point(slot_start_x, slot_start_y),
-                                        'stop': Point(slot_stop_x, slot_stop_y),
-                                        'tool': current_tool
-                                    }
-                                )
+                                self.slots.add(current_tool, (slot_start_x, slot_start_y), (slot_stop_x, slot_stop_y))
                                 continue
 
                         if self.match_routing_start is None and self.match_routing_stop is None:
@@ -3833,7 +4424,7 @@ class Excellon(Geometry):
                             if repeat == 0:
                                 # signal that there are drill operations
                                 self.defaults['excellon_drills'] = True
-                                self.drills.append({'point': Point((x, y)), 'tool': current_tool})
+                                self.drills.add(current_tool, (x, y))
                             else:
                                 coordx = x
                                 coordy = y
@@ -3842,7 +4433,7 @@ class Excellon(Geometry):
                                         coordx = (repeat * x) + repeating_x
                                     if repeating_y:
                                         coordy = (repeat * y) + repeating_y
-                                    self.drills.append({'point': Point((coordx, coordy)), 'tool': current_tool})
+                                    self.drills.add(current_tool, (coordx, coordy))
                                     repeat -= 1
                             repeating_x = repeating_y = 0
                             log.debug("{:15} {:8} {:8}".format(eline, x, y))
@@ -4018,26 +4609,36 @@ class Excellon(Geometry):
         """
         self.solid_geometry = []
         try:
-            for drill in self.drills:
-                # poly = drill['point'].buffer(self.tools[drill['tool']]["C"]/2.0)
-                if drill['tool'] == '':
-                    self.app.inform.emit("[warning] Excellon.create_geometry() -> a drill location was skipped "
-                                         "due of not having a tool associated.\n"
-                                         "Check the resulting GCode.")
-                    log.debug("Excellon.create_geometry() -> a drill location was skipped "
-                              "due of not having a tool associated")
+            if self.drills.counts().get(''):
+                self.app.inform.emit("[warning] Excellon.create_geometry() -> a drill location was skipped "
+                                     "due of not having a tool associated.\n"
+                                     "Check the resulting GCode.")
+                log.debug("Excellon.create_geometry() -> a drill location was skipped "
+                          "due of not having a tool associated")
+
+            # Drills of a tool are all the same circle, translated.
+            # Tools without drills are not looked up.
+            counts = self.drills.counts()
+            order = []
+            circles = []
+            for tool in self.drills.tool_names:
+                if tool == '' or not counts[tool]:
                     continue
-                tooldia = self.tools[drill['tool']]['C']
-                poly = drill['point'].buffer(tooldia / 2.0, int(int(self.geo_steps_per_circle) / 4))
-                self.solid_geometry.append(poly)
-
-            for slot in self.slots:
-                slot_tooldia = self.tools[slot['tool']]['C']
-                start = slot['start']
-                stop = slot['stop']
-
-                lines_string = LineString([start, stop])
-                poly = lines_string.buffer(slot_tooldia / 2.0, int(int(self.geo_steps_per_circle) / 4))
+                mask = self.drills.mask(tool)
+                order.append(np.flatnonzero(mask))
+                circles += circles_at(self.drills.coords[mask], self.tools[tool]['C'], self.geo_steps_per_circle)
+            if circles:
+                # Keep the order of the drills in the file.
+                self.solid_geometry += [circles[i] for i in np.argsort(np.concatenate(order), kind='stable')]
+
+            # Radius of every slot, from the tools used by slots only
+            slot_radii = np.zeros(len(self.slots.tool_names))
+            for i in np.unique(self.slots.tool_index).tolist():
+                slot_radii[i] = self.tools[self.slots.tool_names[i]]['C'] / 2.0
+            slot_radii = slot_radii[self.slots.tool_index]
+            for (x0, y0, x1, y1), radius in zip(self.slots.coords.tolist(), slot_radii.tolist()):
+                lines_string = LineString([(x0, y0), (x1, y1)])
+                poly = lines_string.buffer(radius, int(int(self.geo_steps_per_circle) / 4))
                 self.solid_geometry.append(poly)
         except Exception as e:
             log.debug("Excellon geometry creation failed due of ERROR: %s" % str(e))
@@ -4138,6 +4739,20 @@ class Excellon(Geometry):
 
         return factor
 
+    def transform_drills(self, matrix):
+        """
+        Applies an affine matrix to the drill points and to the slot ends,
+        in place in the drill and slot tables, and creates the geometry again.
+        Tool sizes are untouched.
+
+        :param matrix: 3x3 affine matrix, see translation_matrix() and others.
+        :return: None
+        """
+        self.drills.transform(matrix)
+        self.slots.transform(matrix)
+
+        self.create_geometry()
+
     def scale(self, xfactor, yfactor=None, point=None):
         """
         Scales geometry on the XY plane in the object by a given factor.
@@ -4157,16 +4772,7 @@ class Excellon(Geometry):
         else:
             px, py = point
 
-        # Drills
-        for drill in self.drills:
-            drill['point'] = affinity.scale(drill['point'], xfactor, yfactor, origin=(px, py))
-
-        # Slots
-        for slot in self.slots:
-            slot['stop'] = affinity.scale(slot['stop'], xfactor, yfactor, origin=(px, py))
-            slot['start'] = affinity.scale(slot['start'], xfactor, yfactor, origin=(px, py))
-
-        self.create_geometry()
+        self.transform_drills(scale_matrix(xfactor, yfactor, (px, py)))
 
     def offset(self, vect):
         """
@@ -4179,17 +4785,7 @@ class Excellon(Geometry):
 
         dx, dy = vect
 
-        # Drills
-        for drill in self.drills:
-            drill['point'] = affinity.translate(drill['point'], xoff=dx, yoff=dy)
-
-        # Slots
-        for slot in self.slots:
-            slot['stop'] = affinity.translate(slot['stop'], xoff=dx, yoff=dy)
-            slot['start'] = affinity.translate(slot['start'],xoff=dx, yoff=dy)
-
-        # Recreate geometry
-        self.create_geometry()
+        self.transform_drills(translation_matrix(dx, dy))
 
     def mirror(self, axis, point):
         """
@@ -4200,21 +4796,9 @@ class Excellon(Geometry):
         :type point: list
         :return: None
         """
-        px, py = point
         xscale, yscale = {"X": (1.0, -1.0), "Y": (-1.0, 1.0)}[axis]
 
-        # Modify data
-        # Drills
-        for drill in self.drills:
-            drill['point'] = affinity.scale(drill['point'], xscale, yscale, origin=(px, py))
-
-        # Slots
-        for slot in self.slots:
-            slot['stop'] = affinity.scale(slot['stop'], xscale, yscale, origin=(px, py))
-            slot['start'] = affinity.scale(slot['start'], xscale, yscale, origin=(px, py))
-
-        # Recreate geometry
-        self.create_geometry()
+        self.transform_drills(scale_matrix(xscale, yscale, point))
 
     def skew(self, angle_x=None, angle_y=None, point=None):
         """
@@ -4238,28 +4822,9 @@ class Excellon(Geometry):
             angle_y = 0.0
 
         if point is None:
-            # Drills
-            for drill in self.drills:
-                drill['point'] = affinity.skew(drill['point'], angle_x, angle_y,
-                                               origin=(0, 0))
-
-            # Slots
-            for slot in self.slots:
-                slot['stop'] = affinity.skew(slot['stop'], angle_x, angle_y, origin=(0, 0))
-                slot['start'] = affinity.skew(slot['start'], angle_x, angle_y, origin=(0, 0))
-        else:
-            px, py = point
-            # Drills
-            for drill in self.drills:
-                drill['point'] = affinity.skew(drill['point'], angle_x, angle_y,
-                                               origin=(px, py))
+            point = (0, 0)
 
-            # Slots
-            for slot in self.slots:
-                slot['stop'] = affinity.skew(slot['stop'], angle_x, angle_y, origin=(px, py))
-                slot['start'] = affinity.skew(slot['start'], angle_x, angle_y, origin=(px, py))
-
-        self.create_geometry()
+        self.transform_drills(skew_matrix(angle_x, angle_y, point))
 
     def rotate(self, angle, point=None):
         """
@@ -4269,26 +4834,11 @@ class Excellon(Geometry):
         :return:
         """
         if point is None:
-            # Drills
-            for drill in self.drills:
-                drill['point'] = affinity.rotate(drill['point'], angle, origin='center')
-
-            # Slots
-            for slot in self.slots:
-                slot['stop'] = affinity.rotate(slot['stop'], angle, origin='center')
-                slot['start'] = affinity.rotate(slot['start'], angle, origin='center')
-        else:
-            px, py = point
-            # Drills
-            for drill in self.drills:
-                drill['point'] = affinity.rotate(drill['point'], angle, origin=(px, py))
-
-            # Slots
-            for slot in self.slots:
-                slot['stop'] = affinity.rotate(slot['stop'], angle, origin=(px, py))
-                slot['start'] = affinity.rotate(slot['start'], angle, origin=(px, py))
+            # Each drill rotates around itself, the drills stay in place
+            self.create_geometry()
+            return
 
-        self.create_geometry()
+        self.transform_drills(rotation_matrix(angle, point))
 
 
 class AttrDict(dict):
@@ -4418,32 +4968,103 @@ class CNCjob(Geometry):
             self.app.log.error('Exception ocurred inside a postprocessor: ' + traceback.format_exc())
             return ''
 
-    def optimized_travelling_salesman(self, points, start=None):
+    def doformat_linear(self, p, coords, **kwargs):
         """
-        As solving the problem in the brute force way is too slow,
-        this function implements a simple heuristic: always
-        go to the nearest city.
+        Linear moves to every point in coords. Same result as calling
+        doformat(p.linear_code, x=x, y=y, **kwargs) for every point,
+        but if the postprocessor provides linear_format() all the points
+        are formatted at once.
 
-        Even if this algorithm is extremely simple, it works pretty well
-        giving a solution only about 25% longer than the optimal one (cit. Wikipedia),
-        and runs very fast in O(N^2) time complexity.
+        :param p: Postprocessor.
+        :param coords: Sequence of (x, y) points.
+        :param kwargs: Other parameters for linear_code().
+        :return: G-code for the moves.
+        :rtype: str
+        """
+        if len(coords) == 0:
+            return ""
+
+        attributes = AttrDict()
+        attributes.update(self.postdata)
+        attributes.update(kwargs)
+        try:
+            line_format = p.linear_format(attributes)
+            if line_format is not None:
+                xy = np.asarray(coords, dtype=float)[:, :2]
+                return ((line_format + "\n") * len(xy)) % tuple(xy.ravel().tolist())
+        except Exception:
+            self.app.log.error('Exception ocurred inside a postprocessor: ' + traceback.format_exc())
+
+        return "".join([self.doformat(p.linear_code, x=pt[0], y=pt[1], **kwargs) for pt in coords])
+
+    def optimized_travelling_salesman(self, points, start=None):
+        """
+        Orders the points to make the path through them short.
+        See order_points().
 
-        >>> optimized_travelling_salesman([[i,j] for i in range(5) for j in range(5)])
-        [[0, 0], [0, 1], [0, 2], [0, 3], [0, 4], [1, 4], [1, 3], [1, 2], [1, 1], [1, 0], [2, 0], [2, 1], [2, 2],
-        [2, 3], [2, 4], [3, 4], [3, 3], [3, 2], [3, 1], [3, 0], [4, 0], [4, 1], [4, 2], [4, 3], [4, 4]]
         >>> optimized_travelling_salesman([[0,0],[10,0],[6,0]])
         [[0, 0], [6, 0], [10, 0]]
+
+        :param points: List of (x, y).
+        :param start: Where the path starts, points[0] by default.
+        :return: The points in visiting order.
+        :rtype: list
         """
+        if not points:
+            return []
         if start is None:
             start = points[0]
-        must_visit = points
-        path = [start]
-        # must_visit.remove(start)
-        while must_visit:
-            nearest = min(must_visit, key=lambda x: distance(path[-1], x))
-            path.append(nearest)
-            must_visit.remove(nearest)
-        return path
+        return [points[i] for i in order_points(points, start=start)]
+
+    def ortools_drill_order(self, locations, search_time):
+        """
+        Orders the drills with the Google OR-Tools routing solver, using
+        the Guided Local Search metaheuristic. The distances are computed
+        when the solver asks for them, there is no distance matrix.
+
+        :param locations: List of (x, y).
+        :param search_time: Search time limit in seconds.
+        :return: Indexes into locations in visiting order.
+        :rtype: list
+        """
+        node_list = []
+        tsp_size = len(locations)
+        if tsp_size == 0:
+            log.warning('Specify an instance greater than 0.')
+            return node_list
+
+        # The number of routes is 1 in the TSP. Nodes are indexed from 0 to
+        # tsp_size - 1. The depot is the starting node of the route.
+        manager = pywrapcp.RoutingIndexManager(tsp_size, 1, 0)
+        routing = pywrapcp.RoutingModel(manager)
+        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+        search_parameters.local_search_metaheuristic = (
+            routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH)
+
+        # Set search time limit in milliseconds.
+        search_parameters.time_limit.FromMilliseconds(int(search_time * 1000))
+
+        def dist_callback(from_index, to_index):
+            from_node = manager.IndexToNode(from_index)
+            to_node = manager.IndexToNode(to_index)
+            return int(distance(locations[from_node], locations[to_node]))
+
+        routing.SetArcCostEvaluatorOfAllVehicles(routing.RegisterTransitCallback(dist_callback))
+
+        # Solve, returns a solution if any.
+        assignment = routing.SolveWithParameters(search_parameters)
+        if not assignment:
+            log.warning('No solution found.')
+            return node_list
+
+        # Solution cost.
+        log.info("Total distance: " + str(assignment.ObjectiveValue()))
+
+        index = routing.Start(0)
+        while not routing.IsEnd(index):
+            node_list.append(manager.IndexToNode(index))
+            index = assignment.Value(routing.NextVar(index))
+        return node_list
 
     def generate_from_excellon_by_tool(self, exobj, tools="all", drillz = 3.0,
                                        toolchange=False, toolchangez=0.1, toolchangexy="0.0, 0.0",
@@ -4520,262 +5141,83 @@ class CNCjob(Geometry):
             log.debug("Tools selected and sorted are: %s" % str(tools))
 
         # Points (Group by tool)
-        points = {}
-        for drill in exobj.drills:
-            if drill['tool'] in tools:
-                try:
-                    points[drill['tool']].append(drill['point'])
-                except KeyError:
-                    points[drill['tool']] = [drill['point']]
+        counts = exobj.drills.counts()
+        points = {tool: exobj.drills.coords_of(tool) for tool in tools if counts.get(tool)}
 
         #log.debug("Found %d drills." % len(points))
 
-        self.gcode = []
+        chunks = []
+        write = chunks.append
 
         # Basic G-Code macros
         self.pp_excellon = self.app.postprocessors[self.pp_excellon_name]
         p = self.pp_excellon
 
         # Initialization
-        gcode = self.doformat(p.start_code)
-        gcode += self.doformat(p.feedrate_code)
-        gcode += self.doformat(p.lift_code, x=0, y=0)
-        gcode += self.doformat(p.startz_code)
-
-        # Distance callback
-        class CreateDistanceCallback(object):
-            """Create callback to calculate distances between points."""
-
-            def __init__(self):
-                """Initialize distance array."""
-                locations = create_data_array()
-                size = len(locations)
-                self.matrix = {}
-
-                for from_node in range(size):
-                    self.matrix[from_node] = {}
-                    for to_node in range(size):
-                        if from_node == to_node:
-                            self.matrix[from_node][to_node] = 0
-                        else:
-                            x1 = locations[from_node][0]
-                            y1 = locations[from_node][1]
-                            x2 = locations[to_node][0]
-                            y2 = locations[to_node][1]
-                            self.matrix[from_node][to_node] = distance_euclidian(x1, y1, x2, y2)
-
-            def Distance(self, from_index, to_index):
-                #[balmer] https://github.com/google/or-tools/issues/1177 (add IndexToNode)
-                from_node = manager.IndexToNode(from_index)
-                to_node = manager.IndexToNode(to_index)
-                return int(self.matrix[from_node][to_node])
-
-        # Create the data.
-        def create_data_array():
-            locations = []
-            for point in points[tool]:
-                locations.append((point.coords.xy[0][0], point.coords.xy[1][0]))
-            return locations
-
-        current_platform = platform.architecture()[0]
-        if current_platform == '64bit':
-            if excellon_optimization_type == 'M':
-                log.debug("Using OR-Tools Metaheuristic Guided Local Search drill path optimization.")
-                for tool in tools:
-                    self.tool=tool
-                    self.postdata['toolC']=exobj.tools[tool]["C"]
-
-                    ################################################
-                    # Create the data.
-                    node_list = []
-                    locations = create_data_array()
-                    tsp_size = len(locations)
-                    num_routes = 1  # The number of routes, which is 1 in the TSP.
-                    # Nodes are indexed from 0 to tsp_size - 1. The depot is the starting node of the route.
-                    depot = 0
-                    # Create routing model.
-                    if tsp_size > 0:
-                        routing = pywrapcp.RoutingModel(tsp_size, num_routes, depot)
-                        search_parameters = pywrapcp.RoutingModel.DefaultSearchParameters()
-                        search_parameters.local_search_metaheuristic = (
-                            routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH)
-
-                        # Set search time limit in milliseconds.
-                        if float(self.app.defaults["excellon_search_time"]) != 0:
-                            search_parameters.time_limit_ms = int(float(self.app.defaults["excellon_search_time"]) * 1000)
-                        else:
-                            search_parameters.time_limit_ms = 3000
-
-                        # Callback to the distance function. The callback takes two
-                        # arguments (the from and to node indices) and returns the distance between them.
-                        dist_between_locations = CreateDistanceCallback()
-                        dist_callback = dist_between_locations.Distance
-                        routing.SetArcCostEvaluatorOfAllVehicles(dist_callback)
-
-                        # Solve, returns a solution if any.
-                        assignment = routing.SolveWithParameters(search_parameters)
-
-                        if assignment:
-                            # Solution cost.
-                            log.info("Total distance: " + str(assignment.ObjectiveValue()))
-
-                            # Inspect solution.
-                            # Only one route here; otherwise iterate from 0 to routing.vehicles() - 1.
-                            route_number = 0
-                            node = routing.Start(route_number)
-                            start_node = node
-
-                            while not routing.IsEnd(node):
-                                node_list.append(node)
-                                node = assignment.Value(routing.NextVar(node))
-                        else:
-                            log.warning('No solution found.')
-                    else:
-                        log.warning('Specify an instance greater than 0.')
-                    ################################################
-
-                    # Only if tool has points.
-                    if tool in points:
-                        # Tool change sequence (optional)
-                        if toolchange:
-                            gcode += self.doformat(p.toolchange_code)
-                            gcode += self.doformat(p.spindle_code)  # Spindle start
-                            if self.dwell is True:
-                                gcode += self.doformat(p.dwell_code)  # Dwell time
-                        else:
-                            gcode += self.doformat(p.spindle_code)
-                            if self.dwell is True:
-                                gcode += self.doformat(p.dwell_code)  # Dwell time
-
-                        # Drillling!
-                        oldx = 0
-                        oldy = 0
-                        measured_distance = 0
-                        for k in node_list:
-                            locx = locations[k][0]
-                            locy = locations[k][1]
-                            gcode += self.doformat(p.rapid_code, x=locx, y=locy)
-                            gcode += self.doformat(p.down_code, x=locx, y=locy)
-                            gcode += self.doformat(p.up_to_zero_code, x=locx, y=locy)
-                            gcode += self.doformat(p.lift_code, x=locx, y=locy)
-                            measured_distance += abs(distance_euclidian(locx, locy, oldx, oldy))
-                            oldx = locx
-                            oldy = locy
-                        log.debug("The total travel distance with Metaheuristics is: %s" % str(measured_distance) + '\n')
-            elif excellon_optimization_type == 'B':
-                log.debug("Using OR-Tools Basic drill path optimization.")
-                for tool in tools:
-                    self.tool=tool
-                    self.postdata['toolC']=exobj.tools[tool]["C"]
-
-                    ################################################
-                    node_list = []
-                    locations = create_data_array()
-                    tsp_size = len(locations)
-                    num_routes = 1  # The number of routes, which is 1 in the TSP.
-
-                    # Nodes are indexed from 0 to tsp_size - 1. The depot is the starting node of the route.
-                    depot = 0
-
-                    # Create routing model.
-                    if tsp_size > 0:
-                        manager = pywrapcp.RoutingIndexManager(tsp_size, num_routes, depot)
-                        routing = pywrapcp.RoutingModel(manager)
-                        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-
-                        # Callback to the distance function. The callback takes two
-                        # arguments (the from and to node indices) and returns the distance between them.
-                        dist_between_locations = CreateDistanceCallback()
-                        dist_callback = dist_between_locations.Distance
-                        routing.SetArcCostEvaluatorOfAllVehicles(routing.RegisterTransitCallback(dist_callback))
-
-                        # Solve, returns a solution if any.
-                        assignment = routing.SolveWithParameters(search_parameters)
-
-                        if assignment:
-                            # Solution cost.
-                            log.info("Total distance: " + str(assignment.ObjectiveValue()))
-
-                            # Inspect solution.
-                            # Only one route here; otherwise iterate from 0 to routing.vehicles() - 1.
-                            route_number = 0
-                            node = routing.Start(route_number)
-                            start_node = node
-
-                            while not routing.IsEnd(node):
-                                node_list.append(node)
-                                node = assignment.Value(routing.NextVar(node))
-                        else:
-                            log.warning('No solution found.')
-                    else:
-                        log.warning('Specify an instance greater than 0.')
-                    ################################################
-
-                    # Only if tool has points.
-                    if tool in points:
-                        # Tool change sequence (optional)
-                        if toolchange:
-                            gcode += self.doformat(p.toolchange_code)
-                            gcode += self.doformat(p.spindle_code)  # Spindle start)
-                            if self.dwell is True:
-                                gcode += self.doformat(p.dwell_code)  # Dwell time
-                        else:
-                            gcode += self.doformat(p.spindle_code)
-                            if self.dwell is True:
-                                gcode += self.doformat(p.dwell_code)  # Dwell time
-
-                        # Drillling!
-                        oldx = 0
-                        oldy = 0
-                        measured_distance = 0
-                        for k in node_list:
-                            locx = locations[k][0]
-                            locy = locations[k][1]
-                            gcode += self.doformat(p.rapid_code, x=locx, y=locy)
-                            gcode += self.doformat(p.down_code, x=locx, y=locy)
-                            gcode += self.doformat(p.up_to_zero_code, x=locx, y=locy)
-                            gcode += self.doformat(p.lift_code, x=locx, y=locy)
-                            measured_distance += abs(distance_euclidian(locx, locy, oldx, oldy))
-                            oldx = locx
-                            oldy = locy
-                        log.debug("The total travel distance with Basic Algorithm is: %s" % str(measured_distance) + '\n')
-            else:
-                self.app.inform.emit("[error_notcl] Wrong optimization type selected.")
-                return
-        else:
-            log.debug("Using Travelling Salesman drill path optimization.")
-            for tool in tools:
-                self.tool = tool
-                self.postdata['toolC'] = exobj.tools[tool]["C"]
-
-                # Only if tool has points.
-                if tool in points:
-                    # Tool change sequence (optional)
-                    if toolchange:
-                        gcode += self.doformat(p.toolchange_code)
-                        gcode += self.doformat(p.spindle_code)  # Spindle start)
-                        if self.dwell is True:
-                            gcode += self.doformat(p.dwell_code)  # Dwell time
-                    else:
-                        gcode += self.doformat(p.spindle_code)
-                        if self.dwell is True:
-                            gcode += self.doformat(p.dwell_code)  # Dwell time
+        write(self.doformat(p.start_code))
+        write(self.doformat(p.feedrate_code))
+        write(self.doformat(p.lift_code, x=0, y=0))
+        write(self.doformat(p.startz_code))
 
-                    # Drillling!
-                    altPoints = []
-                    for point in points[tool]:
-                        altPoints.append((point.coords.xy[0][0], point.coords.xy[1][0]))
+        if excellon_optimization_type not in ['M', 'B']:
+            self.app.inform.emit("[error_notcl] Wrong optimization type selected.")
+            return
+
+        # The search time is also the time budget for the basic optimization.
+        try:
+            search_time = float(self.app.defaults["excellon_search_time"])
+        except (KeyError, TypeError, ValueError):
+            search_time = 0
+        if search_time <= 0:
+            search_time = 3.0
+
+        # Where the tool is.
+        oldx, oldy = 0, 0
 
-                    for point in self.optimized_travelling_salesman(altPoints):
-                        gcode += self.doformat(p.rapid_code, x=point[0], y=point[1])
-                        gcode += self.doformat(p.down_code, x=point[0], y=point[1])
-                        gcode += self.doformat(p.up_to_zero_code, x=point[0], y=point[1])
-                        gcode += self.doformat(p.lift_code, x=point[0], y=point[1])
+        for tool in tools:
+            self.tool = tool
+            self.postdata['toolC'] = exobj.tools[tool]["C"]
 
-        gcode += self.doformat(p.spindle_stop_code)  # Spindle stop
-        gcode += self.doformat(p.end_code, x=0, y=0)
+            # Only if tool has points.
+            if tool not in points:
+                continue
 
-        self.gcode = gcode
+            # Tool change sequence (optional)
+            if toolchange:
+                write(self.doformat(p.toolchange_code))
+                write(self.doformat(p.spindle_code))  # Spindle start
+                if self.dwell is True:
+                    write(self.doformat(p.dwell_code))  # Dwell time
+                oldx, oldy = self.toolchange_xy
+            else:
+                write(self.doformat(p.spindle_code))
+                if self.dwell is True:
+                    write(self.doformat(p.dwell_code))  # Dwell time
+
+            locations = [(x, y) for x, y in points[tool].tolist()]
+            if excellon_optimization_type == 'M' and platform.architecture()[0] == '64bit':
+                log.debug("Using OR-Tools Metaheuristic Guided Local Search drill path optimization.")
+                node_list = self.ortools_drill_order(locations, search_time)
+            else:
+                log.debug("Using nearest neighbour and 2-opt drill path optimization.")
+                node_list = order_points(locations, start=(oldx, oldy), time_limit=search_time)
+
+            # Drillling!
+            measured_distance = 0
+            for k in node_list:
+                locx, locy = locations[k]
+                write(self.doformat(p.rapid_code, x=locx, y=locy))
+                write(self.doformat(p.down_code, x=locx, y=locy))
+                write(self.doformat(p.up_to_zero_code, x=locx, y=locy))
+                write(self.doformat(p.lift_code, x=locx, y=locy))
+                measured_distance += distance_euclidian(locx, locy, oldx, oldy)
+                oldx, oldy = locx, locy
+            log.debug("The total travel distance for tool %s is: %s" % (str(tool), str(measured_distance)))
+
+        write(self.doformat(p.spindle_stop_code))  # Spindle stop
+        write(self.doformat(p.end_code, x=0, y=0))
+
+        self.gcode = "".join(chunks)
 
     def generate_from_multitool_geometry(self, geometry, append=True,
                                          tooldia=None, offset=0.0, tolerance=0, z_cut=1.0, z_move=2.0,
@@ -4783,7 +5225,8 @@ class CNCjob(Geometry):
                                          spindlespeed=None, dwell=False, dwelltime=1.0,
                                          multidepth=False, depthpercut=None,
                                          toolchange=False, toolchangez=1.0, toolchangexy="0.0, 0.0", extracut=False,
-                                         startz=None, endz=2.0, pp_geometry_name=None, tool_no=1):
+                                         startz=None, endz=2.0, pp_geometry_name=None, tool_no=1,
+                                         instances=None):
         """
         Algorithm to generate from multitool Geometry.
 
@@ -4800,7 +5243,9 @@ class CNCjob(Geometry):
         :param depthpercut: Maximum depth in each pass.
         :param extracut: Adds (or not) an extra cut at the end of each path
             overlapping the first point in path to ensure complete copper removal
-        :return: None
+        :param instances: Panel instances of the geometry, list of [dx, dy]. The paths
+            are ordered once and cut for every instance, see instance_paths().
+        :return: G-code
         """
 
         log.debug("Generate_from_multitool_geometry()")
@@ -4855,20 +5300,10 @@ class CNCjob(Geometry):
             self.app.inform.emit("[warning] The Cut Z parameter is zero. "
                                  "There will be no cut, skipping %s file" % self.options['name'])
 
-        ## Index first and last points in paths
-        # What points to index.
-        def get_pts(o):
-            return [o.coords[0], o.coords[-1]]
-
-        # Create the indexed storage.
-        storage = FlatCAMRTreeStorage()
-        storage.get_points = get_pts
-
-        # Store the geometry
+        # Store the geometry, indexing first and last points in paths
         log.debug("Indexing geometry before generating G-Code...")
-        for shape in flat_geometry:
-            if shape is not None:  # TODO: This shouldn't have happened.
-                storage.insert(shape)
+        storage = FlatCAMRTreeStorage([shape for shape in flat_geometry if shape is not None],
+                                      get_points=FlatCAMRTree.get_endpoints)
 
         # self.input_geometry_bounds = geometry.bounds()
 
@@ -4886,31 +5321,32 @@ class CNCjob(Geometry):
         self.pp_geometry = self.app.postprocessors[self.pp_geometry_name]
         p = self.pp_geometry
 
-        self.gcode = self.doformat(p.start_code)
+        chunks = []
+        write = chunks.append
+
+        write(self.doformat(p.start_code))
 
-        self.gcode += self.doformat(p.feedrate_code)        # sets the feed rate
-        self.gcode += self.doformat(p.lift_code, x=0, y=0)  # Move (up) to travel height
-        self.gcode += self.doformat(p.startz_code)
+        write(self.doformat(p.feedrate_code))        # sets the feed rate
+        write(self.doformat(p.lift_code, x=0, y=0))  # Move (up) to travel height
+        write(self.doformat(p.startz_code))
 
         if toolchange:
-            self.gcode += self.doformat(p.toolchange_code)
-            self.gcode += self.doformat(p.spindle_code)     # Spindle start
+            write(self.doformat(p.toolchange_code))
+            write(self.doformat(p.spindle_code))     # Spindle start
             if self.dwell is True:
-                self.gcode += self.doformat(p.dwell_code)   # Dwell time
+                write(self.doformat(p.dwell_code))   # Dwell time
         else:
-            self.gcode += self.doformat(p.spindle_code)     # Spindle start
+            write(self.doformat(p.spindle_code))     # Spindle start
             if self.dwell is True:
-                self.gcode += self.doformat(p.dwell_code)   # Dwell time
+                write(self.doformat(p.dwell_code))   # Dwell time
 
         ## Iterate over geometry paths getting the nearest each time.
-        log.debug("Starting G-Code...")
-        path_count = 0
+        log.debug("Ordering paths...")
+        paths = []
         current_pt = (0, 0)
         pt, geo = storage.nearest(current_pt)
         try:
             while True:
-                path_count += 1
-
                 # Remove before modifying, otherwise deletion will fail.
                 storage.remove(geo)
 
@@ -4919,30 +5355,57 @@ class CNCjob(Geometry):
                 if pt != geo.coords[0] and pt == geo.coords[-1]:
                     geo.coords = list(geo.coords)[::-1]
 
-                #---------- Single depth/pass --------
-                if not multidepth:
-                    self.gcode += self.create_gcode_single_pass(geo, extracut, tolerance)
-
-                #--------- Multi-pass ---------
-                else:
-                    self.gcode += self.create_gcode_multi_pass(geo, extracut, tolerance,
-                                                               postproc=p, current_point=current_pt)
-
+                paths.append(geo)
                 current_pt = geo.coords[-1]
                 pt, geo = storage.nearest(current_pt) # Next
 
         except StopIteration:  # Nothing found in storage.
             pass
 
+        log.debug("Starting G-Code...")
+        path_count = 0
+        current_pt = (0, 0)
+        for geo in self.instance_paths(paths, instances):
+            path_count += 1
+
+            #---------- Single depth/pass --------
+            if not multidepth:
+                write(self.create_gcode_single_pass(geo, extracut, tolerance))
+
+            #--------- Multi-pass ---------
+            else:
+                write(self.create_gcode_multi_pass(geo, extracut, tolerance,
+                                                   postproc=p, current_point=current_pt))
+
+            current_pt = geo.coords[-1]
+
         log.debug("Finishing G-Code... %s paths traced." % path_count)
 
         # Finish
-        self.gcode += self.doformat(p.spindle_stop_code)
-        self.gcode += self.doformat(p.lift_code, x=current_pt[0], y=current_pt[1])
-        self.gcode += self.doformat(p.end_code, x=0, y=0)
+        write(self.doformat(p.spindle_stop_code))
+        write(self.doformat(p.lift_code, x=current_pt[0], y=current_pt[1]))
+        write(self.doformat(p.end_code, x=0, y=0))
 
+        self.gcode = "".join(chunks)
         return self.gcode
     
+    @staticmethod
+    def instance_paths(paths, instances=None):
+        """
+        Paths to cut for all the instances of a panel. The paths are
+        ordered once, for the source geometry, and every instance repeats
+        them in the same order, translated. Instances are translated one
+        at a time, as the paths are consumed.
+
+        :param paths: List of paths, in the order they are to be cut.
+        :param instances: List of [dx, dy], see Geometry.instances.
+        :return: Iterator over the paths of all the instances.
+        """
+        if not instances:
+            return iter(paths)
+        return itertools.chain.from_iterable(transform_geometry(paths, translation_matrix(dx, dy))
+                                             for dx, dy in instances)
+
     @staticmethod
     def sort_by_travel_distance(flat_geometry):
         points = []
@@ -5002,7 +5465,8 @@ class CNCjob(Geometry):
 
         Algorithm description:
         ----------------------
-        Uses RTree to find the nearest path to follow.
+        Uses RTree to find the nearest path to follow. The panel instances
+        of the geometry, if any, are cut one after the other in the same order.
 
         :param geometry:
         :param append:
@@ -5013,7 +5477,7 @@ class CNCjob(Geometry):
         :param depthpercut: Maximum depth in each pass.
         :param extracut: Adds (or not) an extra cut at the end of each path
             overlapping the first point in path to ensure complete copper removal
-        :return: None
+        :return: G-code
         """
 
         if not isinstance(geometry, Geometry):
@@ -5095,47 +5559,51 @@ class CNCjob(Geometry):
         self.pp_geometry = self.app.postprocessors[self.pp_geometry_name]
         p = self.pp_geometry
 
-        self.gcode = self.doformat(p.start_code)
+        chunks = []
+        write = chunks.append
+
+        write(self.doformat(p.start_code))
 
-        self.gcode += self.doformat(p.feedrate_code)        # sets the feed rate
-        self.gcode += self.doformat(p.lift_code, x=0, y=0)  # Move (up) to travel height
-        self.gcode += self.doformat(p.startz_code)
+        write(self.doformat(p.feedrate_code))        # sets the feed rate
+        write(self.doformat(p.lift_code, x=0, y=0))  # Move (up) to travel height
+        write(self.doformat(p.startz_code))
 
         if toolchange:
-            self.gcode += self.doformat(p.toolchange_code)
-            self.gcode += self.doformat(p.spindle_code)     # Spindle start
+            write(self.doformat(p.toolchange_code))
+            write(self.doformat(p.spindle_code))     # Spindle start
             if self.dwell is True:
-                self.gcode += self.doformat(p.dwell_code)   # Dwell time
+                write(self.doformat(p.dwell_code))   # Dwell time
         else:
-            self.gcode += self.doformat(p.spindle_code)     # Spindle start
+            write(self.doformat(p.spindle_code))     # Spindle start
             if self.dwell is True:
-                self.gcode += self.doformat(p.dwell_code)   # Dwell time
+                write(self.doformat(p.dwell_code))   # Dwell time
 
         ## Iterate over geometry paths getting the nearest each time.
         log.debug("Starting G-Code...")
         path_count = 0
         current_pt = (0, 0)
-        for geo in flat_geometry:
+        for geo in self.instance_paths(flat_geometry, geometry.instances):
             path_count += 1
 
             #---------- Single depth/pass --------
             if not multidepth:
-                self.gcode += self.create_gcode_single_pass(geo, extracut, tolerance)
+                write(self.create_gcode_single_pass(geo, extracut, tolerance))
 
             #--------- Multi-pass ---------
             else:
-                self.gcode += self.create_gcode_multi_pass(geo, extracut, tolerance,
-                                                            postproc=p, current_point=current_pt)
+                write(self.create_gcode_multi_pass(geo, extracut, tolerance,
+                                                   postproc=p, current_point=current_pt))
 
             current_pt = geo.coords[-1]
 
         log.debug("Finishing G-Code... %s paths traced." % path_count)
 
         # Finish
-        self.gcode += self.doformat(p.spindle_stop_code)
-        self.gcode += self.doformat(p.lift_code, x=current_pt[0], y=current_pt[1])
-        self.gcode += self.doformat(p.end_code, x=0, y=0)
+        write(self.doformat(p.spindle_stop_code))
+        write(self.doformat(p.lift_code, x=current_pt[0], y=current_pt[1]))
+        write(self.doformat(p.end_code, x=0, y=0))
 
+        self.gcode = "".join(chunks)
         return self.gcode
 
     def create_gcode_single_pass(self, geometry, extracut, tolerance):
@@ -5215,47 +5683,28 @@ class CNCjob(Geometry):
         gcode_multi_pass += self.doformat(postproc.lift_code, x=current_point[0], y=current_point[1])
         return gcode_multi_pass
 
-    def codes_split(self, gline):
-        """
-        Parses a line of G-Code such as "G01 X1234 Y987" into
-        a dictionary: {'G': 1.0, 'X': 1234.0, 'Y': 987.0}
-
-        :param gline: G-Code line string
-        :return: Dictionary with parsed line.
-        """
-
-        command = {}
-
-        if 'Roland' in self.pp_excellon_name or 'Roland' in self.pp_geometry_name:
-            match_z = re.search(r"^Z(\s*-?\d+\.\d+?),(\s*\s*-?\d+\.\d+?),(\s*\s*-?\d+\.\d+?)*;$", gline)
-            if match_z:
-                command['G'] = 0
-                command['X'] = float(match_z.group(1).replace(" ", "")) * 0.025
-                command['Y'] = float(match_z.group(2).replace(" ", "")) * 0.025
-                command['Z'] = float(match_z.group(3).replace(" ", "")) * 0.025
-
-        else:
-            match = re.search(r'^\s*([A-Z])\s*([\+\-\.\d\s]+)', gline)
-            while match:
-                command[match.group(1)] = float(match.group(2).replace(" ", ""))
-                gline = gline[match.end():]
-                match = re.search(r'^\s*([A-Z])\s*([\+\-\.\d\s]+)', gline)
-        return command
-
     def gcode_parse(self):
         """
         G-Code parser (from self.gcode). Generates dictionary with
-        single-segment LineString's and "kind" indicating cut or travel,
-        fast or feedrate speed.
+        LineString's, one per tool height, and "kind" indicating cut
+        or travel, fast or feedrate speed.
+
+        The whole program is split into words at once (``gcode_lex()``)
+        and the tool paths are built from them with array operations
+        (``gcode_toolpaths()``).
         """
 
-        kind = ["C", "F"]  # T=travel, C=cut, F=fast, S=slow
+        if '%' in self.gcode:
+            return "fail"
 
-        # Results go here
-        geometry = []        
+        roland = 'Roland' in self.pp_excellon_name or 'Roland' in self.pp_geometry_name
+        words = gcode_lex(self.gcode, roland=roland)
 
-        # Last known instruction
-        current = {'X': 0.0, 'Y': 0.0, 'Z': 0.0, 'G': 0}
+        ## Units. Lines with G20/G21 are not used for anything else.
+        units = np.isin(words["G"], (20.0, 21.0))
+        if units.any():
+            self.units = {20.0: "IN", 21.0: "MM"}[words["G"][units][-1]]
+            words = {letter: words[letter][~units] for letter in words}
 
         # Current path: temporary storage until tool is
         # lifted or lowered.
@@ -5263,82 +5712,12 @@ class CNCjob(Geometry):
             pos_xy = [float(eval(a)) for a in self.app.defaults["excellon_toolchangexy"].split(",")]
         else:
             pos_xy = [float(eval(a)) for a in self.app.defaults["geometry_toolchangexy"].split(",")]
-        path = [pos_xy]
-        # path = [(0, 0)]
 
-        # Process every instruction
-        for line in StringIO(self.gcode):
-            if '%MO' in line or '%' in line:
-                return "fail"
+        coords, path_index, kinds = gcode_toolpaths(words, pos_xy, self.steps_per_circle, check_z=not roland)
 
-            gobj = self.codes_split(line)
+        paths = shapely.linestrings(coords, indices=path_index) if kinds else []
 
-            ## Units
-            if 'G' in gobj and (gobj['G'] == 20.0 or gobj['G'] == 21.0):
-                self.units = {20.0: "IN", 21.0: "MM"}[gobj['G']]
-                continue
-
-            ## Changing height
-            if 'Z' in gobj:
-                if 'Roland' in self.pp_excellon_name or 'Roland' in self.pp_geometry_name:
-                    pass
-                elif ('X' in gobj or 'Y' in gobj) and gobj['Z'] != current['Z']:
-                    log.warning("Non-orthogonal motion: From %s" % str(current))
-                    log.warning("  To: %s" % str(gobj))
-
-                current['Z'] = gobj['Z']
-                # Store the path into geometry and reset path
-                if len(path) > 1:
-                    geometry.append({"geom": LineString(path),
-                                     "kind": kind})
-                    path = [path[-1]]  # Start with the last point of last path.
-
-            if 'G' in gobj:
-                current['G'] = int(gobj['G'])
-                
-            if 'X' in gobj or 'Y' in gobj:
-                # TODO: I think there is a problem here, current['X] (and the rest of current[...] are not initialized
-                if 'X' in gobj:
-                    x = gobj['X']
-                    # current['X'] = x
-                else:
-                    x = current['X']
-                
-                if 'Y' in gobj:
-                    y = gobj['Y']
-                else:
-                    y = current['Y']
-
-                kind = ["C", "F"]  # T=travel, C=cut, F=fast, S=slow
-
-                if current['Z'] > 0:
-                    kind[0] = 'T'
-                if current['G'] > 0:
-                    kind[1] = 'S'
-
-                if current['G'] in [0, 1]:  # line
-                    path.append((x, y))
-
-                arcdir = [None, None, "cw", "ccw"]
-                if current['G'] in [2, 3]:  # arc
-                    center = [gobj['I'] + current['X'], gobj['J'] + current['Y']]
-                    radius = sqrt(gobj['I']**2 + gobj['J']**2)
-                    start = arctan2(-gobj['J'], -gobj['I'])
-                    stop = arctan2(-center[1] + y, -center[0] + x)
-                    path += arc(center, radius, start, stop,
-                                arcdir[current['G']],
-                                int(self.steps_per_circle / 4))
-
-            # Update current instruction
-            for code in gobj:
-                current[code] = gobj[code]
-
-        # There might not be a change in height at the
-        # end, therefore, see here too if there is
-        # a final path.
-        if len(path) > 1:
-            geometry.append({"geom": LineString(path),
-                             "kind": kind})
+        geometry = [{"geom": geom, "kind": kind} for geom, kind in zip(paths, kinds)]
 
         self.gcode_parsed = geometry
         return geometry
@@ -5380,16 +5759,22 @@ class CNCjob(Geometry):
         
     def plot2(self, tooldia=None, dpi=75, margin=0.1, gcode_parsed=None,
               color={"T": ["#F0E24D4C", "#B5AB3A4C"], "C": ["#5E6CFFFF", "#4650BDFF"]},
-              alpha={"T": 0.3, "C": 1.0}, tool_tolerance=0.0005, obj=None, visible=False):
+              alpha={"T": 0.3, "C": 1.0}, tool_tolerance=0.0005, obj=None, visible=False, exact=None):
         """
         Plots the G-code job onto the given axes.
 
+        By default all the paths are drawn at once as thick lines of
+        the width of the tool (obj.add_toolpaths()). With ``exact`` every path
+        is buffered with the tool instead, which is much slower.
+
         :param tooldia: Tool diameter.
         :param dpi: Not used!
         :param margin: Not used!
         :param color: Color specification.
         :param alpha: Transparency specification.
         :param tool_tolerance: Tolerance when drawing the toolshape.
+        :param exact: Draw the exact tool shape. None takes it from
+            the "cncjob_plot_exact" application default.
         :return: None
         """
 
@@ -5399,7 +5784,22 @@ class CNCjob(Geometry):
         if tooldia is None:
             tooldia = self.tooldia
 
-        if tooldia == 0:
+        if exact is None:
+            exact = self.app.defaults.get("cncjob_plot_exact", False)
+
+        if not exact:
+            coords, index = paths_coords([geo['geom'] for geo in gcode_parsed])
+            # Travel on top of cuts.
+            layers = np.array([geo['kind'][0] != 'C' for geo in gcode_parsed], dtype=int)
+            obj.add_toolpaths(coords=coords, index=index, layers=layers,
+                              colors=[color["C"][1], color["T"][1]], face_colors=[color["C"][0], color["T"][0]],
+                              width=tooldia, visible=visible)
+
+            if tooldia != 0:
+                first = np.flatnonzero(np.diff(index, prepend=-1) != 0)
+                obj.annotation.set(text=[str(n) for n in range(1, len(first) + 1)],
+                                   pos=[tuple(c) for c in coords[first].tolist()], visible=obj.options['plot'])
+        elif tooldia == 0:
             for geo in gcode_parsed:
                 obj.add_shape(shape=geo['geom'], color=color[geo['kind'][0]][1], visible=visible)
         else:
@@ -5482,11 +5882,11 @@ class CNCjob(Geometry):
             gcode += self.doformat(p.feedrate_code, feedrate=feedrate)
 
         # Cutting...
-        for pt in path[1:]:
-            gcode += self.doformat(p.linear_code, x=pt[0], y=pt[1], z=z_cut)  # Linear motion to point
+        gcode += self.doformat_linear(p, path[1:], z=z_cut)  # Linear motion to points
 
         # Up to travelling height.
         if up:
+            pt = path[-1]
             gcode += self.doformat(p.lift_code, x=pt[0], y=pt[1], z_move=z_move)  # Stop cutting
         return gcode
 
@@ -5553,8 +5953,7 @@ class CNCjob(Geometry):
                 gcode += self.doformat(p.down_code, x=path[0][0], y=path[0][1], z_cut=z_cut)  # Start cutting
 
         # Cutting...
-        for pt in path[1:]:
-            gcode += self.doformat(p.linear_code, x=pt[0], y=pt[1], z=z_cut)  # Linear motion to point
+        gcode += self.doformat_linear(p, path[1:], z=z_cut)  # Linear motion to points
 
         # this line is added to create an extra cut over the first point in patch
         # to make sure that we remove the copper leftovers
@@ -5688,6 +6087,20 @@ class CNCjob(Geometry):
             bounds_coords = minx, miny, maxx, maxy
         return bounds_coords
 
+    @staticmethod
+    def transform_parsed(gcode_parsed, matrix):
+        """
+        Applies an affine matrix to the geometry of parsed G-code,
+        all the elements in one pass.
+
+        :param gcode_parsed: List of dicts, see gcode_parse().
+        :param matrix: 3x3 affine matrix, see translation_matrix() and others.
+        :return: None
+        """
+        geoms = transform_geometry([g['geom'] for g in gcode_parsed], matrix)
+        for g, geom in zip(gcode_parsed, geoms):
+            g['geom'] = geom
+
     def scale(self, xfactor, yfactor=None, point=None):
         """
         Scales all the geometry on the XY plane in the object by the
@@ -5711,8 +6124,7 @@ class CNCjob(Geometry):
         else:
             px, py = point
 
-        for g in self.gcode_parsed:
-            g['geom'] = affinity.scale(g['geom'], xfactor, yfactor, origin=(px, py))
+        self.transform_parsed(self.gcode_parsed, scale_matrix(xfactor, yfactor, (px, py)))
 
         self.create_geometry()
 
@@ -5768,16 +6180,14 @@ class CNCjob(Geometry):
             # offset Gcode
             self.gcode = offset_g(self.gcode)
             # offset geometry
-            for g in self.gcode_parsed:
-                g['geom'] = affinity.translate(g['geom'], xoff=dx, yoff=dy)
+            self.transform_parsed(self.gcode_parsed, translation_matrix(dx, dy))
             self.create_geometry()
         else:
             for k, v in self.cnc_tools.items():
                 # offset Gcode
                 v['gcode'] = offset_g(v['gcode'])
                 # offset gcode_parsed
-                for g in v['gcode_parsed']:
-                    g['geom'] = affinity.translate(g['geom'], xoff=dx, yoff=dy)
+                self.transform_parsed(v['gcode_parsed'], translation_matrix(dx, dy))
                 v['solid_geometry'] = cascaded_union([geo['geom'] for geo in v['gcode_parsed']])
 
     def mirror(self, axis, point):
@@ -5787,11 +6197,9 @@ class CNCjob(Geometry):
         :param point: tupple of coordinates (x,y)
         :return:
         """
-        px, py = point
         xscale, yscale = {"X": (1.0, -1.0), "Y": (-1.0, 1.0)}[axis]
 
-        for g in self.gcode_parsed:
-            g['geom'] = affinity.scale(g['geom'], xscale, yscale, origin=(px, py))
+        self.transform_parsed(self.gcode_parsed, scale_matrix(xscale, yscale, point))
 
         self.create_geometry()
 
@@ -5810,11 +6218,7 @@ class CNCjob(Geometry):
         See shapely manual for more information:
         http://toblerity.org/shapely/manual.html#affine-transformations
         """
-        px, py = point
-
-        for g in self.gcode_parsed:
-            g['geom'] = affinity.skew(g['geom'], angle_x, angle_y,
-                                      origin=(px, py))
+        self.transform_parsed(self.gcode_parsed, skew_matrix(angle_x, angle_y, point))
 
         self.create_geometry()
 
@@ -5826,10 +6230,7 @@ class CNCjob(Geometry):
         :return:
         """
 
-        px, py = point
-
-        for g in self.gcode_parsed:
-            g['geom'] = affinity.rotate(g['geom'], angle, origin=(px, py))
+        self.transform_parsed(self.gcode_parsed, rotation_matrix(angle, point))
 
         self.create_geometry()
 
@@ -5910,6 +6311,190 @@ def arc_angle(start, stop, direction):
     return angle
 
 
+# Valid start of a G-code line: the words up to the first thing
+# that is not a word (a comment, a checksum, ...). A word is a letter
+# and a number, spaces are allowed in between and in the number.
+GCODE_LINE_RE = re.compile(r'^[^\S\n]*(?:[A-Z][^\S\n]*[+\-.\d][+\-.\d \t\r\f\v]*)*', re.MULTILINE)
+# Value of a word.
+GCODE_VALUE_RE = re.compile(r'[A-Z][^\S\n]*([+\-.\d \t\r\f\v]*)')
+# Roland RML lines, "Z x,y,z;"
+GCODE_ROLAND_RE = re.compile(r'^Z([^\S\n]*-?\d+\.\d+?),([^\S\n]*-?\d+\.\d+?),([^\S\n]*-?\d+\.\d+?)*;$',
+                             re.MULTILINE)
+
+
+def gcode_lex(gcode, letters="GXYZIJF", roland=False):
+    """
+    Splits a whole G-code program into words in one pass.
+
+    For every line and every letter in ``letters`` the value of the
+    word is returned, or NaN if the line has no such word. A line is
+    read up to the first thing that is not a word and if a letter is
+    repeated the last one wins.
+
+    :param gcode: G-code program.
+    :type gcode: str
+    :param letters: Words to return.
+    :param roland: Roland RML program instead. Every "Z x,y,z;" line
+        is a G0 move and other lines are ignored.
+    :return: Dictionary of arrays, one per letter, all of the same length.
+    :rtype: dict
+    """
+    if roland:
+        rows = np.array([[float(v.replace(" ", "")) for v in m] for m in GCODE_ROLAND_RE.findall(gcode)],
+                        dtype=float).reshape(-1, 3) * 0.025
+        columns = {letter: np.full(len(rows), np.nan) for letter in letters}
+        for letter, k in (("X", 0), ("Y", 1), ("Z", 2)):
+            if letter in columns:
+                columns[letter] = rows[:, k]
+        if "G" in columns:
+            columns["G"] = np.zeros(len(rows))
+        return columns
+
+    # Only words and line ends are left, so every capital letter
+    # starts a word.
+    text = "\n".join(GCODE_LINE_RE.findall(gcode))
+    chars = np.frombuffer(text.encode('ascii', 'replace'), dtype=np.uint8)
+    is_letter = (chars >= ord("A")) & (chars <= ord("Z"))
+    line = np.cumsum(chars == ord("\n"))[is_letter]
+    codes = chars[is_letter]
+
+    values = GCODE_VALUE_RE.findall(text)
+    try:
+        values = np.fromiter(map(float, values), dtype=float, count=len(values))
+    except ValueError:
+        # Spaces inside a number, "X1 000".
+        values = np.fromiter((float(v.replace(" ", "")) for v in values), dtype=float, count=len(values))
+
+    n_lines = int(line[-1]) + 1 if len(line) > 0 else 0
+    columns = {}
+    for letter in letters:
+        k = np.flatnonzero(codes == ord(letter))
+        # Last occurrence in a line wins.
+        k = k[np.diff(np.append(line[k], -1)) != 0]
+        column = np.full(n_lines, np.nan)
+        column[line[k]] = values[k]
+        columns[letter] = column
+    return columns
+
+
+def paths_coords(paths):
+    """
+    Coordinates of a list of LineStrings, in one array.
+
+    :param paths: List of LineStrings.
+    :return: ((n, 2) coordinates, index of the path of every coordinate)
+    :rtype: tuple
+    """
+    return shapely.get_coordinates(paths, return_index=True)
+
+
+def fill_forward(values, initial):
+    """
+    Replaces every NaN by the last value before it.
+
+    :param values: 1D array.
+    :param initial: Used before the first value.
+    :return: (filled values, filled values of the previous element)
+    :rtype: tuple
+    """
+    index = np.where(np.isnan(values), 0, np.arange(1, len(values) + 1))
+    np.maximum.accumulate(index, out=index)
+    filled = np.append(initial, values)[index]
+    return filled, np.append(initial, filled)[:-1]
+
+
+def gcode_toolpaths(words, start, steps_per_circle, check_z=True):
+    """
+    Turns the words of a G-code program, as returned by
+    ``gcode_lex()``, into tool paths in the XY plane. A new path
+    starts at every Z word and every path starts at the last point of
+    the previous one. The kind of every path is "AB", where A is "T"
+    (travel, Z > 0) or "C" (cut) and B is "F" (fast, G0) or "S" (slow),
+    from the last move in the path.
+
+    :param words: Dictionary with the G, X, Y, Z, I and J arrays.
+    :param start: Start position of the tool (x, y).
+    :param steps_per_circle: Arc resolution.
+    :param check_z: Log a warning if there are moves in XY and Z at once.
+    :return: (coordinates, path index of every coordinate, kind of every path)
+    :rtype: tuple
+    """
+    g, x, y, z = words["G"], words["X"], words["Y"], words["Z"]
+
+    has_z = ~np.isnan(z)
+    is_move = ~np.isnan(x) | ~np.isnan(y)
+    z_now, z_before = fill_forward(z, 0.0)
+    x_now, x_before = fill_forward(x, 0.0)
+    y_now, y_before = fill_forward(y, 0.0)
+    # The G word of the line is truncated, the modal value from
+    # earlier lines is not.
+    g_line = np.where(np.isnan(g), fill_forward(g, 0.0)[1], np.trunc(g))
+
+    if check_z:
+        skew = np.flatnonzero(has_z & is_move & (z != z_before))
+        if len(skew) > 0:
+            log.warning("Non-orthogonal motion in %d moves, first to X%s Y%s Z%s" %
+                        (len(skew), x_now[skew[0]], y_now[skew[0]], z[skew[0]]))
+
+    moves = np.flatnonzero(is_move)
+    # Path of every line, the Z word ends the path before the move.
+    path = np.cumsum(has_z)[moves]
+    g_move = g_line[moves]
+    linear = (g_move == 0) | (g_move == 1)
+    circular = (g_move == 2) | (g_move == 3)
+
+    # Arcs
+    a = moves[circular]
+    i = np.nan_to_num(words["I"][a])
+    j = np.nan_to_num(words["J"][a])
+    cx = i + x_before[a]
+    cy = j + y_before[a]
+    radius = np.sqrt(i ** 2 + j ** 2)
+    angle_start = np.arctan2(-j, -i)
+    angle_stop = np.arctan2(-cy + y_now[a], -cx + x_now[a])
+    ccw = g_move[circular] == 3
+    angle_stop = np.where(ccw & (angle_stop <= angle_start), angle_stop + 2 * pi, angle_stop)
+    angle_stop = np.where(~ccw & (angle_stop >= angle_start), angle_stop - 2 * pi, angle_stop)
+    angle = np.abs(angle_stop - angle_start)
+    steps = np.maximum(np.ceil(angle / (2 * pi) * int(steps_per_circle / 4)).astype(int), 2)
+    delta = np.where(ccw, 1.0, -1.0) * angle / steps
+
+    # Points of every move, in order.
+    counts = np.zeros(len(moves), dtype=int)
+    counts[linear] = 1
+    counts[circular] = steps + 1
+    offsets = np.cumsum(counts) - counts
+    n_points = int(counts.sum())
+    if n_points == 0:
+        return np.empty((0, 2)), np.empty(0, dtype=int), []
+
+    points = np.empty((n_points, 2))
+    points[offsets[linear], 0] = x_now[moves[linear]]
+    points[offsets[linear], 1] = y_now[moves[linear]]
+    arc_points = np.repeat(offsets[circular], steps + 1)
+    k = np.arange(len(arc_points)) - np.repeat(np.cumsum(steps + 1) - (steps + 1), steps + 1)
+    theta = np.repeat(angle_start, steps + 1) + np.repeat(delta, steps + 1) * k
+    points[arc_points + k, 0] = np.repeat(cx, steps + 1) + np.repeat(radius, steps + 1) * np.cos(theta)
+    points[arc_points + k, 1] = np.repeat(cy, steps + 1) + np.repeat(radius, steps + 1) * np.sin(theta)
+    point_path = np.repeat(path, counts)
+
+    # Paths with at least one point, as [first, last) in points.
+    first = np.flatnonzero(np.diff(point_path, prepend=-1) != 0)
+    last = np.append(first[1:], n_points)
+
+    # Every path starts with the point before it.
+    stream = np.vstack((np.asarray(start, dtype=float).reshape(1, 2), points))
+    lengths = last - first + 1
+    index = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(first, lengths)
+
+    # Kind from the last move of every path.
+    last_move = moves[np.searchsorted(path, point_path[first], side='right') - 1]
+    kinds = [["T" if travel else "C", "S" if slow else "F"]
+             for travel, slow in zip((z_now[last_move] > 0).tolist(), (g_line[last_move] > 0).tolist())]
+
+    return stream[index], np.repeat(np.arange(len(first)), lengths), kinds
+
+
 # def find_polygon(poly, point):
 #     """
 #     Find an object that object.contains(Point(point)) in
@@ -5944,6 +6529,7 @@ def to_dict(obj):
 
     * ApertureMacro
     * BaseGeometry
+    * DrillTable, SlotTable
 
     :param obj: Shapely geometry.
     :type obj: BaseGeometry
@@ -5960,6 +6546,11 @@ def to_dict(obj):
             "__class__": "Shply",
             "__inst__": sdumps(obj)
         }
+    if isinstance(obj, HitTable):
+        return {
+            "__class__": type(obj).__name__,
+            "__inst__": obj.to_dict()
+        }
     return obj
 
 
@@ -5978,6 +6569,10 @@ def dict2obj(d):
             am = ApertureMacro()
             am.from_dict(d['__inst__'])
             return am
+        if d['__class__'] == "DrillTable":
+            return DrillTable.from_dict(d['__inst__'])
+        if d['__class__'] == "SlotTable":
+            return SlotTable.from_dict(d['__inst__'])
         return d
     else:
         return d
@@ -6299,12 +6894,601 @@ def distance_euclidian(x1, y1, x2, y2):
     return sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
 
 
+def _about_origin(matrix, origin):
+    """
+    Moves the fixed point of a linear transform from (0, 0) to origin.
+
+    :param matrix: 3x3 affine matrix.
+    :param origin: (x, y) point left in place.
+    :return: 3x3 affine matrix.
+    """
+    px, py = origin
+    return translation_matrix(px, py).dot(matrix).dot(translation_matrix(-px, -py))
+
+
+def translation_matrix(dx, dy):
+    """
+    3x3 affine matrix, as for affinity.translate(geo, dx, dy).
+    Points are column vectors (x, y, 1).
+
+    :param dx: Offset along X.
+    :param dy: Offset along Y.
+    :return: numpy.array
+    """
+    return np.array([[1.0, 0.0, dx],
+                     [0.0, 1.0, dy],
+                     [0.0, 0.0, 1.0]])
+
+
+def scale_matrix(xfactor, yfactor, origin=(0, 0)):
+    """
+    3x3 affine matrix, as for affinity.scale(geo, xfactor, yfactor, origin=origin).
+
+    :param xfactor: Scale factor along X.
+    :param yfactor: Scale factor along Y.
+    :param origin: (x, y) point left in place.
+    :return: numpy.array
+    """
+    return _about_origin(np.diag([xfactor, yfactor, 1.0]), origin)
+
+
+def rotation_matrix(angle, origin=(0, 0)):
+    """
+    3x3 affine matrix, as for affinity.rotate(geo, angle, origin=origin).
+
+    :param angle: Counter-clockwise angle in degrees.
+    :param origin: (x, y) point left in place.
+    :return: numpy.array
+    """
+    a = math.radians(angle)
+    return _about_origin(np.array([[cos(a), -sin(a), 0.0],
+                                   [sin(a), cos(a), 0.0],
+                                   [0.0, 0.0, 1.0]]), origin)
+
+
+def skew_matrix(angle_x, angle_y, origin=(0, 0)):
+    """
+    3x3 affine matrix, as for affinity.skew(geo, angle_x, angle_y, origin=origin).
+
+    :param angle_x: Shear angle along X in degrees.
+    :param angle_y: Shear angle along Y in degrees.
+    :param origin: (x, y) point left in place.
+    :return: numpy.array
+    """
+    return _about_origin(np.array([[1.0, math.tan(math.radians(angle_x)), 0.0],
+                                   [math.tan(math.radians(angle_y)), 1.0, 0.0],
+                                   [0.0, 0.0, 1.0]]), origin)
+
+
+def transform_geometry(geometry, matrix):
+    """
+    Applies an affine matrix to a geometry or to nested lists of geometries.
+    Coordinates of all the geometries are packed into one array and
+    transformed at once, then the geometries are rebuilt from it.
+
+    :param geometry: Shapely geometry, list or nested lists of such. None items are kept.
+    :param matrix: 3x3 affine matrix, see translation_matrix() and others.
+    :return: Transformed geometry in the same nesting.
+    """
+    leaves = []
+
+    def collect(obj):
+        if type(obj) is list:
+            for g in obj:
+                collect(g)
+        else:
+            leaves.append(obj)
+
+    collect(geometry)
+    if not leaves:
+        return geometry
+
+    geoms = np.empty(len(leaves), dtype=object)
+    geoms[:] = leaves
+    linear, shift = matrix[:2, :2].T, matrix[:2, 2]
+    moved = iter(shapely.transform(geoms, lambda coords: coords.dot(linear) + shift))
+
+    def rebuild(obj):
+        if type(obj) is list:
+            return [rebuild(g) for g in obj]
+        return next(moved)
+
+    return rebuild(geometry)
+
+
+def tile_geometry(geometry, offsets):
+    """
+    Copies of a geometry translated by every offset. Like
+    transform_geometry(), the coordinates of all the copies are
+    translated in a single array operation.
+
+    :param geometry: Shapely geometry, list or nested lists of such. None items are kept.
+    :param offsets: (n, 2) array or list of [dx, dy], one for every copy.
+    :return: List with a copy of geometry, in the same nesting, for every offset.
+    """
+    offsets = np.asarray(offsets, dtype=float).reshape((-1, 2))
+    leaves = []
+
+    def collect(obj):
+        if type(obj) is list:
+            for g in obj:
+                collect(g)
+        else:
+            leaves.append(obj)
+
+    collect(geometry)
+
+    geoms = np.empty(len(leaves), dtype=object)
+    geoms[:] = leaves
+    copies = np.tile(geoms, len(offsets))
+    # Offset of every coordinate of every copy
+    shift = np.repeat(np.repeat(offsets, len(leaves), axis=0),
+                      shapely.get_num_coordinates(copies), axis=0)
+    moved = iter(shapely.transform(copies, lambda coords: coords + shift))
+
+    def rebuild(obj):
+        if type(obj) is list:
+            return [rebuild(g) for g in obj]
+        return next(moved)
+
+    return [rebuild(geometry) for _ in range(len(offsets))]
+
+
+def grid_offsets(rows, columns, dx, dy):
+    """
+    Offsets of the cells of a panel, row by row.
+
+    :param rows: Number of rows.
+    :param columns: Number of columns.
+    :param dx: Distance between columns.
+    :param dy: Distance between rows.
+    :return: List of [x, y] offsets, the first one is [0, 0].
+    """
+    return [[col * dx, row * dy] for row in range(rows) for col in range(columns)]
+
+
+@functools.lru_cache(maxsize=256)
+def circle_template(diameter, steps_per_circle):
+    """
+    Exterior coordinates of a circle centered on the origin, the same as
+    Point(0, 0).buffer(diameter / 2, int(steps_per_circle / 4)). Results
+    are cached, so the returned array is read-only.
+
+    :param diameter: Circle diameter.
+    :param steps_per_circle: Number of segments in the circle.
+    :return: (N, 2) numpy.array. Empty if the circle has no area.
+    """
+    circle = Point(0, 0).buffer(diameter / 2.0, int(int(steps_per_circle) / 4))
+    if circle.is_empty:
+        coords = np.empty((0, 2))
+    else:
+        coords = np.array(circle.exterior.coords)
+    coords.setflags(write=False)
+    return coords
+
+
+def circles_at(centers, diameter, steps_per_circle, exterior=False):
+    """
+    Circles of the same diameter at many centers. The cached
+    circle_template() is translated to all the centers in a single
+    array operation.
+
+    :param centers: (N, 2) array or list of [x, y] circle centers.
+    :param diameter: Circle diameter.
+    :param steps_per_circle: Number of segments in a circle.
+    :param exterior: Return the exterior LinearRing of every circle
+        instead of the Polygon.
+    :return: List of Polygon or LinearRing, one per center.
+    """
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    template = circle_template(diameter, steps_per_circle)
+
+    if len(template) == 0:
+        # Same as the exterior of an empty buffer.
+        empty = LinearRing() if exterior else Polygon()
+        return [empty] * len(centers)
+
+    coords = template[np.newaxis, :, :] + centers[:, np.newaxis, :]
+    if exterior:
+        return list(shapely.linearrings(coords))
+    return list(shapely.polygons(coords))
+
+
+class PointGrid(object):
+    """
+    Uniform grid over a set of points, for nearest point queries while
+    points are being removed from the set.
+    """
+
+    def __init__(self, xy, ids):
+        """
+
+        :param xy: Coordinates of all the points, (N, 2) array.
+        :param ids: Indexes in xy of the points to put in the grid.
+        """
+        self.x = xy[:, 0].tolist()
+        self.y = xy[:, 1].tolist()
+
+        pts = xy[ids]
+        self.x0, self.y0 = pts.min(axis=0).tolist()
+        width, height = (pts.max(axis=0) - pts.min(axis=0)).tolist()
+
+        # About 2 points per cell. The second term keeps the cells
+        # reasonable when all the points are on a line.
+        area = max(width * height, 2 * max(width, height) ** 2 / len(ids))
+        self.size = math.sqrt(2 * area / len(ids)) or 1.0
+        self.nx = int(width / self.size) + 1
+        self.ny = int(height / self.size) + 1
+
+        self.cells = {}
+        gx = ((pts[:, 0] - self.x0) / self.size).astype(int).tolist()
+        gy = ((pts[:, 1] - self.y0) / self.size).astype(int).tolist()
+        for i, cx, cy in zip(np.asarray(ids).tolist(), gx, gy):
+            self.cells.setdefault((cx, cy), []).append(i)
+        self.count = len(ids)
+
+    def cell(self, x, y):
+        return (min(max(int((x - self.x0) / self.size), 0), self.nx - 1),
+                min(max(int((y - self.y0) / self.size), 0), self.ny - 1))
+
+    def nearest(self, x, y, k=1):
+        """
+        :param x: X coordinate.
+        :param y: Y coordinate.
+        :param k: Number of points.
+        :return: Indexes of the k points nearest to (x, y), nearest first.
+        :rtype: list
+        """
+        k = min(k, self.count)
+        if k == 0:
+            return []
+
+        gx, gy = self.cell(x, y)
+        px, py, cells = self.x, self.y, self.cells
+        found = []
+        r = 0
+        while True:
+            # Cells at Chebyshev distance r from the cell of (x, y).
+            for cx in range(gx - r, gx + r + 1):
+                if r == 0 or cx == gx - r or cx == gx + r:
+                    rows = range(gy - r, gy + r + 1)
+                else:
+                    rows = (gy - r, gy + r)
+                for cy in rows:
+                    ids = cells.get((cx, cy))
+                    if ids:
+                        for i in ids:
+                            found.append(((px[i] - x) ** 2 + (py[i] - y) ** 2, i))
+
+            # Any point not found yet is at least r cells away.
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= (r * self.size) ** 2:
+                    return [i for _, i in found[:k]]
+            r += 1
+
+    def remove(self, i):
+        key = self.cell(self.x[i], self.y[i])
+        ids = self.cells[key]
+        ids.remove(i)
+        if not ids:
+            del self.cells[key]
+        self.count -= 1
+
+
+def nearest_neighbour_route(xy, start):
+    """
+    Orders the points by always going to the nearest point
+    not visited yet.
+
+    :param xy: Coordinates, (N, 2) array.
+    :param start: (x, y) to start from.
+    :return: Indexes of the points in visiting order.
+    :rtype: numpy.ndarray
+    """
+    n = len(xy)
+    route = np.empty(n, dtype=np.intp)
+    visited = np.zeros(n, dtype=bool)
+    x, y = float(start[0]), float(start[1])
+    step = 0
+    while step < n:
+        # The grid is rebuilt over the remaining points when most of
+        # them are gone, so the searches do not have to cross empty cells.
+        remaining = np.flatnonzero(~visited)
+        grid = PointGrid(xy, remaining)
+        target = len(remaining) // 4
+        while grid.count > target:
+            i = grid.nearest(x, y)[0]
+            grid.remove(i)
+            visited[i] = True
+            route[step] = i
+            step += 1
+            x, y = grid.x[i], grid.y[i]
+    return route
+
+
+def neighbour_lists(xy, k, per_cell=6):
+    """
+    Approximate nearest neighbours of every point. The candidates for
+    each point are the points in its cell of a uniform grid and the 8
+    cells around it, up to per_cell points from each cell.
+
+    :param xy: Coordinates, (N, 2) array.
+    :param k: Number of neighbours.
+    :param per_cell: Maximum candidates taken from each cell.
+    :return: Indexes of up to k near points for every point, nearest
+        first, (N, k) array. Padded with the point itself when there are
+        not enough candidates.
+    :rtype: numpy.ndarray
+    """
+    n = len(xy)
+    lo = xy.min(axis=0)
+    width, height = (xy.max(axis=0) - lo).tolist()
+    area = max(width * height, 2 * max(width, height) ** 2 / n)
+    size = math.sqrt(2 * area / n) or 1.0
+
+    cells = ((xy - lo) / size).astype(np.int64) + 1
+    rows = int(cells[:, 1].max()) + 2
+    keys = cells[:, 0] * rows + cells[:, 1]
+    order = np.argsort(keys, kind='stable')
+    unique_keys, first, counts = np.unique(keys[order], return_index=True, return_counts=True)
+
+    candidates = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            neighbour_keys = keys + dx * rows + dy
+            found = np.searchsorted(unique_keys, neighbour_keys)
+            found = np.minimum(found, len(unique_keys) - 1)
+            exists = unique_keys[found] == neighbour_keys
+            for t in range(per_cell):
+                valid = exists & (counts[found] > t)
+                candidates.append(np.where(valid, order[np.minimum(first[found] + t, n - 1)], -1))
+    candidates = np.stack(candidates, axis=1)
+
+    d = xy[candidates] - xy[:, None, :]
+    dist = np.hypot(d[..., 0], d[..., 1])
+    dist[(candidates < 0) | (candidates == np.arange(n)[:, None])] = np.inf
+    k = min(k, candidates.shape[1])
+    nearest = np.argsort(dist, axis=1, kind='stable')[:, :k]
+    neighbours = np.take_along_axis(candidates, nearest, axis=1)
+    missing = np.isinf(np.take_along_axis(dist, nearest, axis=1))
+    neighbours[missing] = np.repeat(np.arange(n)[:, None], k, axis=1)[missing]
+    return neighbours
+
+
+def _length(x, y, a, b):
+    return np.hypot(x[a] - x[b], y[a] - y[b])
+
+
+def two_opt_pass(xy, route, neighbours):
+    """
+    Applies 2-opt moves to the route: reverses sections of it when
+    that makes it shorter. Only moves that connect a point to one of
+    its neighbours are considered. route[0] is not moved.
+
+    :param xy: Coordinates, (N, 2) array.
+    :param route: Indexes of the points in visiting order. Modified in place.
+    :param neighbours: From neighbour_lists().
+    :return: Number of moves applied.
+    :rtype: int
+    """
+    m = len(route)
+    k = neighbours.shape[1]
+    x = np.ascontiguousarray(xy[:, 0])
+    y = np.ascontiguousarray(xy[:, 1])
+    pos = np.empty(len(xy), dtype=np.intp)
+    pos[route] = np.arange(m)
+
+    starts = []
+    ends = []
+    gains = []
+
+    # Replace edges (a, b) and (c, c next) with (a, c) and (b, c next),
+    # b being the point after a.
+    i = np.repeat(np.arange(m - 1), k)
+    a = route[i]
+    b = route[i + 1]
+    c = neighbours[route[:-1]].ravel()
+    j = pos[c]
+    ok = (j != i) & (j != i + 1)
+    i, a, b, c, j = i[ok], a[ok], b[ok], c[ok], j[ok]
+    has_next = j + 1 < m
+    c_next = route[np.minimum(j + 1, m - 1)]
+    gain = _length(x, y, a, b) - _length(x, y, a, c) + \
+        np.where(has_next, _length(x, y, c, c_next) - _length(x, y, b, c_next), 0)
+    starts.append(np.minimum(i, j) + 1)
+    ends.append(np.maximum(i, j))
+    gains.append(gain)
+
+    # Replace edges (p, a) and (c previous, c) with (a, c) and
+    # (p, c previous), p being the point before a.
+    i = np.repeat(np.arange(1, m), k)
+    a = route[i]
+    p = route[i - 1]
+    c = neighbours[route[1:]].ravel()
+    j = pos[c]
+    ok = (j >= 1) & (j != i) & (j != i - 1)
+    i, a, p, c, j = i[ok], a[ok], p[ok], c[ok], j[ok]
+    c_prev = route[j - 1]
+    gain = _length(x, y, p, a) + _length(x, y, c_prev, c) - _length(x, y, p, c_prev) - _length(x, y, a, c)
+    starts.append(np.minimum(i, j))
+    ends.append(np.maximum(i, j) - 1)
+    gains.append(gain)
+
+    starts = np.concatenate(starts)
+    ends = np.concatenate(ends)
+    gains = np.concatenate(gains)
+
+    # Apply the best moves first, skipping those that depend
+    # on a part of the route already changed in this pass.
+    improving = np.flatnonzero(gains > 1e-9)
+    improving = improving[np.argsort(-gains[improving], kind='stable')]
+    dirty = np.zeros(m + 1, dtype=bool)
+    applied = 0
+    for s, e in zip(starts[improving].tolist(), ends[improving].tolist()):
+        if dirty[s - 1] or dirty[s] or dirty[e] or dirty[e + 1]:
+            continue
+        route[s:e + 1] = route[s:e + 1][::-1]
+        dirty[s:e + 1] = True
+        applied += 1
+    return applied
+
+
+def or_opt_pass(xy, route, neighbours, max_length=3):
+    """
+    Applies Or-opt moves to the route: moves sections of up to
+    max_length points, possibly reversed, next to one of the neighbours
+    of their first or last point when that makes the route shorter.
+    route[0] is not moved.
+
+    :param xy: Coordinates, (N, 2) array.
+    :param route: Indexes of the points in visiting order. Modified in place.
+    :param neighbours: From neighbour_lists().
+    :param max_length: Maximum number of points in a section.
+    :return: Number of moves applied.
+    :rtype: int
+    """
+    m = len(route)
+    k = neighbours.shape[1]
+    x = np.ascontiguousarray(xy[:, 0])
+    y = np.ascontiguousarray(xy[:, 1])
+    pos = np.empty(len(xy), dtype=np.intp)
+    pos[route] = np.arange(m)
+
+    candidates = []
+    for length in range(1, max_length + 1):
+        if m - length < 1:
+            break
+
+        # Section route[i:i + length], preceded by p and followed by n.
+        i = np.arange(1, m - length + 1)
+        s0 = route[i]
+        s1 = route[i + length - 1]
+        p = route[i - 1]
+        has_next = i + length < m
+        n = route[np.minimum(i + length, m - 1)]
+        removed = _length(x, y, p, s0) + \
+            np.where(has_next, _length(x, y, s1, n) - _length(x, y, p, n), 0)
+
+        # Insert between route[q] and route[q + 1]:
+        #   after a neighbour of s0, or before it reversed,
+        #   before a neighbour of s1, or after it reversed.
+        for end, after, reverse in [(0, True, False), (0, False, True), (1, False, False), (1, True, True)]:
+            ii = np.repeat(np.arange(len(i)), k)
+            c = neighbours[(s0, s1)[end]].ravel()
+            q = pos[c] if after else pos[c] - 1
+            ok = (q >= 0) & ((q < i[ii] - 1) | (q > i[ii] + length - 1))
+            ii, q = ii[ok], q[ok]
+            u = route[q]
+            has_w = q + 1 < m
+            w = route[np.minimum(q + 1, m - 1)]
+            first, last = (s1[ii], s0[ii]) if reverse else (s0[ii], s1[ii])
+            added = _length(x, y, u, first) + \
+                np.where(has_w, _length(x, y, last, w) - _length(x, y, u, w), 0)
+            gain = removed[ii] - added
+            candidates.append((gain, i[ii], np.full(len(ii), length), q, np.full(len(ii), reverse)))
+
+    if not candidates:
+        return 0
+
+    gains = np.concatenate([c[0] for c in candidates])
+    starts = np.concatenate([c[1] for c in candidates])
+    lengths = np.concatenate([c[2] for c in candidates])
+    targets = np.concatenate([c[3] for c in candidates])
+    reverses = np.concatenate([c[4] for c in candidates])
+
+    # The moves are applied to a linked list, so a move only changes
+    # the points next to it and the other moves stay valid.
+    following = np.full(len(xy), -1, dtype=np.intp)
+    following[route[:-1]] = route[1:]
+    following = following.tolist()
+    route_list = route.tolist()
+
+    improving = np.flatnonzero(gains > 1e-9)
+    improving = improving[np.argsort(-gains[improving], kind='stable')]
+    changed = [False] * len(xy)
+    applied = 0
+    for s, length, q, reverse in zip(starts[improving].tolist(), lengths[improving].tolist(),
+                                     targets[improving].tolist(), reverses[improving].tolist()):
+        section = route_list[s:s + length]
+        p = route_list[s - 1]
+        n = route_list[s + length] if s + length < m else -1
+        u = route_list[q]
+        w = route_list[q + 1] if q + 1 < m else -1
+        involved = section + [p, n, u, w]
+        if any(changed[node] for node in involved if node >= 0):
+            continue
+
+        following[p] = n
+        if reverse:
+            section.reverse()
+        for a, b in zip([u] + section, section + [w]):
+            following[a] = b
+        for node in involved:
+            if node >= 0:
+                changed[node] = True
+        applied += 1
+
+    if applied:
+        node = route_list[0]
+        for i in range(m):
+            route[i] = node
+            node = following[node]
+    return applied
+
+
+def order_points(points, start=(0, 0), time_limit=3.0):
+    """
+    Finds a short path through all the points. The path is built
+    by going to the nearest point each time and then improved with
+    2-opt and Or-opt moves until no move helps or time_limit runs out.
+    Runs in about O(N log N) time and O(N) memory.
+
+    :param points: Sequence of (x, y).
+    :param start: (x, y) where the path starts. It is not in the result.
+    :param time_limit: Time budget in seconds, checked between
+        improvement passes. 0 disables the improvement.
+    :return: Indexes into points in visiting order.
+    :rtype: list
+    """
+    xy = np.asarray(points, dtype=float).reshape(-1, 2)
+    n = len(xy)
+    if n < 2:
+        return list(range(n))
+
+    deadline = time.time() + time_limit
+    route = nearest_neighbour_route(xy, start)
+    if n < 4 or time_limit <= 0:
+        return route.tolist()
+
+    # The start is an extra point at the beginning of the route
+    # that is never moved.
+    xy = np.vstack([xy, start])
+    route = np.concatenate([[n], route])
+    neighbours = neighbour_lists(xy, min(8, n))
+    while time.time() < deadline:
+        applied = two_opt_pass(xy, route, neighbours)
+        if time.time() >= deadline:
+            break
+        applied += or_opt_pass(xy, route, neighbours)
+        if applied == 0:
+            break
+    return route[1:].tolist()
+
+
+
 class FlatCAMRTree(object):
     """
     Indexes geometry (Any object with "cooords" property containing
     a list of tuples with x, y values). Objects are indexed by
     all their points by default. To index by arbitrary points,
-    override self.points2obj.
+    override self.get_points.
+
+    Indexed points are packed in arrays. The points of an object get
+    consecutive ids, so an object only keeps its first point id and
+    its number of points. Deleting from the R-tree is slow, so removed
+    points are only marked as such, until they outnumber the indexed
+    ones and the R-tree is rebuilt without them.
     """
 
     def __init__(self):
@@ -6312,54 +7496,192 @@ class FlatCAMRTree(object):
         self.rti = rtindex.Index()
 
         ## Track object-point relationship
-        # Each is list of points in object.
-        self.obj2points = []
+        # Coordinates, owner object and state of every point, by point id.
+        self.points = np.zeros((0, 2))
+        self.points2obj = np.zeros(0, dtype=np.int64)
+        self.point_indexed = np.zeros(0, dtype=bool)
+        self.npoints = 0
+
+        # First point id and number of points of every object, by
+        # object id. Removed objects have no points.
+        self.obj_start = np.zeros(0, dtype=np.int64)
+        self.obj_count = np.zeros(0, dtype=np.int64)
 
-        # Index is index in rtree, value is index of
-        # object in obj2points.
-        self.points2obj = []
+        # Number of points in the index, and of removed points still in it
+        self.nindexed = 0
+        self.nremoved = 0
 
         self.get_points = lambda go: go.coords
 
-    def grow_obj2points(self, idx):
+    @staticmethod
+    def get_endpoints(o):
+        """
+        Points to index paths by: their first and last points.
+        """
+        return [o.coords[0], o.coords[-1]]
+
+    @staticmethod
+    def get_endpoints_many(objs):
+        """
+        First and last points of many paths at once.
+
+        :param objs: LineStrings and LinearRings.
+        :return: Number of points of each path, (N, 2) array of the points.
+        """
+        geos = np.empty(len(objs), dtype=object)
+        geos[:] = objs
+        pts = shapely.get_coordinates(np.stack([shapely.get_point(geos, 0), shapely.get_point(geos, -1)], axis=1))
+        if len(pts) != 2 * len(objs):
+            raise ValueError("Expected paths only.")
+        return np.full(len(objs), 2), pts
+
+    @staticmethod
+    def as_points(pts):
+        """
+        :param pts: Sequence of (x, y) or (x, y, z) points.
+        :return: (N, 2) array.
         """
-        Increases the size of self.obj2points to fit
-        idx + 1 items.
+        pts = np.asarray(pts, dtype=float)
+        if pts.size == 0:
+            return np.zeros((0, 2))
+        return pts.reshape((len(pts), -1))[:, :2]
 
-        :param idx: Index to fit into list.
+    def grow_objects(self, idx):
+        """
+        Increases the size of the object arrays to fit
+        idx + 1 objects, doubling them.
+
+        :param idx: Index to fit into the arrays.
         :return: None
         """
-        if len(self.obj2points) > idx:
-            # len == 2, idx == 1, ok.
+        if len(self.obj_start) > idx:
             return
-        else:
-            # len == 2, idx == 2, need 1 more.
-            # range(2, 3)
-            for i in range(len(self.obj2points), idx + 1):
-                self.obj2points.append([])
+
+        size = max(idx + 1, 2 * len(self.obj_start))
+        self.obj_start = np.concatenate([self.obj_start, np.zeros(size - len(self.obj_start), dtype=np.int64)])
+        self.obj_count = np.concatenate([self.obj_count, np.zeros(size - len(self.obj_count), dtype=np.int64)])
+
+    def add_points(self, objids, counts, pts):
+        """
+        Stores the points of objects after the points stored before.
+
+        :param objids: Object ids.
+        :param counts: Number of points of each object.
+        :param pts: (N, 2) array of the points of all the objects.
+        :return: Id of the first point.
+        """
+        start, size = self.npoints, self.npoints + len(pts)
+        if size > len(self.points):
+            grown = max(size, 2 * len(self.points))
+            self.points = np.concatenate([self.points, np.zeros((grown - len(self.points), 2))])
+            self.points2obj = np.concatenate([self.points2obj,
+                                              np.zeros(grown - len(self.points2obj), dtype=np.int64)])
+            self.point_indexed = np.concatenate([self.point_indexed,
+                                                 np.zeros(grown - len(self.point_indexed), dtype=bool)])
+
+        objids = np.asarray(objids, dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.int64)
+        if len(objids):
+            self.grow_objects(int(objids.max()))
+
+        self.points[start:size] = pts
+        self.points2obj[start:size] = np.repeat(objids, counts)
+        self.point_indexed[start:size] = True
+        self.obj_start[objids] = start + np.cumsum(counts) - counts
+        self.obj_count[objids] = counts
+        self.npoints = size
+        return start
 
     def insert(self, objid, obj):
-        self.grow_obj2points(objid)
-        self.obj2points[objid] = []
+        pts = self.as_points(self.get_points(obj))
+        if len(self.obj_start) > objid and self.obj_count[objid]:
+            self.remove_obj(objid)
+
+        start = self.add_points([objid], [len(pts)], pts)
+        for i, (x, y) in enumerate(pts.tolist(), start):
+            self.rti.insert(i, (x, y, x, y))
+        self.nindexed += len(pts)
+
+    def insert_many(self, objids, objs):
+        """
+        Indexes many objects at once. An empty index is bulk loaded,
+        which is much faster than inserting the points one by one.
 
-        for pt in self.get_points(obj):
-            self.rti.insert(len(self.points2obj), (pt[0], pt[1], pt[0], pt[1]), obj=objid)
-            self.obj2points[objid].append(len(self.points2obj))
-            self.points2obj.append(objid)
+        :param objids: Ids of the objects, not indexed before.
+        :param objs: The objects.
+        :return: None
+        """
+        if not len(objs):
+            return
+
+        try:
+            if self.get_points is not FlatCAMRTree.get_endpoints:
+                raise ValueError
+            counts, pts = self.get_endpoints_many(objs)
+        except ValueError:
+            pts = [self.as_points(self.get_points(obj)) for obj in objs]
+            counts = [len(p) for p in pts]
+            pts = np.concatenate(pts)
+
+        start = self.add_points(objids, counts, pts)
+
+        if self.nindexed == 0 and self.nremoved == 0:
+            self.rebuild()
+        else:
+            for i, (x, y) in enumerate(pts.tolist(), start):
+                self.rti.insert(i, (x, y, x, y))
+            self.nindexed += len(pts)
+
+    def indexed_ids(self):
+        """
+        :return: Ids of the points of the objects not removed.
+        """
+        return np.flatnonzero(self.point_indexed[:self.npoints])
+
+    def rebuild(self):
+        """
+        Bulk loads a new index with the points of the objects
+        not removed.
+
+        :return: None
+        """
+        ids = self.indexed_ids()
+        self.nindexed = len(ids)
+        self.nremoved = 0
+        if not len(ids):
+            self.rti = rtindex.Index()
+            return
 
-    def remove_obj(self, objid, obj):
-        # Use all ptids to delete from index
-        for i, pt in enumerate(self.get_points(obj)):
-            self.rti.delete(self.obj2points[objid][i], (pt[0], pt[1], pt[0], pt[1]))
+        pts = self.points[ids]
+        self.rti = rtindex.Index((i, (x, y, x, y), None) for i, (x, y) in zip(ids.tolist(), pts.tolist()))
+
+    def remove_obj(self, objid, obj=None):
+        start, count = int(self.obj_start[objid]), int(self.obj_count[objid])
+        self.point_indexed[start:start + count] = False
+        self.obj_count[objid] = 0
+        self.nindexed -= count
+        self.nremoved += count
+
+        if self.nremoved > max(self.nindexed, 256):
+            self.rebuild()
 
     def nearest(self, pt):
         """
         Will raise StopIteration if no items are found.
 
-        :param pt:
-        :return:
+        :param pt: Query point.
+        :return: (x, y) of the nearest point, id of its object.
         """
-        return next(self.rti.nearest(pt, objects=True))
+        # Removed points are skipped, asking for more each time.
+        k = 1
+        while True:
+            ids = list(self.rti.nearest((pt[0], pt[1], pt[0], pt[1]), k))
+            for i in ids:
+                if self.point_indexed[i]:
+                    return tuple(self.points[i].tolist()), int(self.points2obj[i])
+            if len(ids) < k:
+                raise StopIteration
+            k *= 4
 
 
 class FlatCAMRTreeStorage(FlatCAMRTree):
@@ -6368,15 +7690,34 @@ class FlatCAMRTreeStorage(FlatCAMRTree):
     as storage for the geometry.
     """
 
-    def __init__(self):
+    def __init__(self, objects=None, get_points=None):
+        """
+
+        :param objects: Objects to store, bulk loaded.
+        :param get_points: Points of an object to index.
+        """
         # super(FlatCAMRTreeStorage, self).__init__()
         super().__init__()
 
+        if get_points is not None:
+            self.get_points = get_points
+
         self.objects = []
 
         # Optimization attempt!
         self.indexes = {}
 
+        # Geometry of a stored object measured by hit_test().
+        self.get_geometry = lambda go: go
+
+        # Index of object bounding boxes for hit_test(), built on
+        # first use and then kept up to date.
+        self.bbox_rti = None
+        self.bboxes = {}
+
+        if objects is not None:
+            self.insert_many(objects)
+
     def insert(self, obj):
         self.objects.append(obj)
         idx = len(self.objects) - 1
@@ -6393,6 +7734,9 @@ class FlatCAMRTreeStorage(FlatCAMRTree):
         # super(FlatCAMRTreeStorage, self).insert(idx, obj)
         super().insert(idx, obj)
 
+        if self.bbox_rti is not None:
+            self.insert_bbox(idx, obj)
+
     #@profile
     def remove(self, obj):
         # See note about self.indexes in insert().
@@ -6405,9 +7749,115 @@ class FlatCAMRTreeStorage(FlatCAMRTree):
         # Remove from index
         self.remove_obj(objidx, obj)
 
+        if objidx in self.bboxes:
+            self.bbox_rti.delete(objidx, self.bboxes.pop(objidx))
+
+    def insert_many(self, objs):
+        """
+        Stores many objects at once, see FlatCAMRTree.insert_many().
+
+        :param objs: Objects to store.
+        :return: None
+        """
+        objs = list(objs)
+        start = len(self.objects)
+        self.objects.extend(objs)
+        for idx, obj in enumerate(objs, start):
+            self.indexes[id(obj)] = idx
+
+        super().insert_many(range(start, len(self.objects)), objs)
+
+        if self.bbox_rti is not None:
+            for idx, obj in enumerate(objs, start):
+                self.insert_bbox(idx, obj)
+
     def get_objects(self):
         return (o for o in self.objects if o is not None)
 
+    @staticmethod
+    def geometry_bounds(geo):
+        """
+        Bounds of a geometry or of a nested list of geometries.
+
+        :param geo: Shapely geometry or list of such.
+        :return: (xmin, ymin, xmax, ymax) or None if empty.
+        """
+        if isinstance(geo, BaseGeometry):
+            return None if geo.is_empty else geo.bounds
+
+        bounds = [b for b in (FlatCAMRTreeStorage.geometry_bounds(g) for g in geo or []) if b is not None]
+        if not bounds:
+            return None
+        return (min(b[0] for b in bounds), min(b[1] for b in bounds),
+                max(b[2] for b in bounds), max(b[3] for b in bounds))
+
+    @staticmethod
+    def geometry_distance(point, geo):
+        """
+        Distance from a point to a geometry as it is drawn: polygons
+        by their outline.
+
+        :param point: Shapely Point.
+        :param geo: Shapely geometry or list of such.
+        :return: Distance, Inf for empty geometry.
+        """
+        if isinstance(geo, (Polygon, MultiPolygon)):
+            return point.distance(geo.boundary)
+        if isinstance(geo, BaseGeometry):
+            return Inf if geo.is_empty else point.distance(geo)
+        return min((FlatCAMRTreeStorage.geometry_distance(point, g) for g in geo or []), default=Inf)
+
+    def insert_bbox(self, idx, obj):
+        bbox = self.geometry_bounds(self.get_geometry(obj))
+        if bbox is not None:
+            self.bbox_rti.insert(idx, bbox)
+            self.bboxes[idx] = bbox
+
+    def hit_test(self, pt, tolerance, k=None):
+        """
+        Finds the objects which geometry passes within a distance
+        of a point, nearest first.
+
+        :param pt: Query point.
+        :param tolerance: Maximum distance from the point.
+        :param k: Maximum number of objects to return, all if None.
+        :return: List of objects.
+        :rtype: list
+        """
+        if self.bbox_rti is None:
+            geos = [(idx, self.get_geometry(obj)) for idx, obj in enumerate(self.objects) if obj is not None]
+
+            # Bounds of single geometries at once, nested lists one by one.
+            single = [(idx, geo) for idx, geo in geos if isinstance(geo, BaseGeometry)]
+            if single:
+                bounds = shapely.bounds(np.array([geo for _, geo in single], dtype=object))
+                for (idx, _), bbox in zip(single, bounds.tolist()):
+                    if not np.isnan(bbox[0]):
+                        self.bboxes[idx] = tuple(bbox)
+            for idx, geo in geos:
+                if not isinstance(geo, BaseGeometry):
+                    bbox = self.geometry_bounds(geo)
+                    if bbox is not None:
+                        self.bboxes[idx] = bbox
+
+            # Bulk loading is much faster than inserting one by one.
+            if self.bboxes:
+                self.bbox_rti = rtindex.Index((idx, bbox, None) for idx, bbox in self.bboxes.items())
+            else:
+                self.bbox_rti = rtindex.Index()
+
+        x, y = pt[0], pt[1]
+        point = Point(x, y)
+
+        hits = []
+        for idx in self.bbox_rti.intersection((x - tolerance, y - tolerance, x + tolerance, y + tolerance)):
+            distance = self.geometry_distance(point, self.get_geometry(self.objects[idx]))
+            if distance <= tolerance:
+                hits.append((distance, idx))
+
+        hits.sort()
+        return [self.objects[idx] for _, idx in hits[:k]]
+
     def nearest(self, pt):
         """
         Returns the nearest matching points and the object
@@ -6418,8 +7868,8 @@ class FlatCAMRTreeStorage(FlatCAMRTree):
           matching point.
         :rtype: tuple
         """
-        tidx = super(FlatCAMRTreeStorage, self).nearest(pt)
-        return (tidx.bbox[0], tidx.bbox[1]), self.objects[tidx.object]
+        match, objidx = super(FlatCAMRTreeStorage, self).nearest(pt)
+        return match, self.objects[objidx]
 
 
 # class myO:
@@ -78,24 +78,28 @@ class ToolMove(FlatCAMTool):
 
                     proc = self.app.proc_container.new("Moving ...")
 
-                    def job_move(app_obj):
-                        obj_list = self.app.collection.get_selected()
+                    # Plotted shapes move right away, geometry follows in the worker
+                    obj_list = self.app.collection.get_selected()
+                    replot = [not sel_obj.transform_shapes(translation_matrix(dx, dy)) for sel_obj in obj_list]
 
+                    def job_move(app_obj):
                         try:
                             if not obj_list:
                                 self.app.inform.emit("[warning_notcl] No object(s) selected.")
                                 return "fail"
                             else:
-                                for sel_obj in obj_list:
+                                for sel_obj, plot in zip(obj_list, replot):
 
                                     sel_obj.offset((dx, dy))
-                                    sel_obj.plot()
+                                    if plot:
+                                        sel_obj.plot()
                                     # Update the object bounding box options
                                     a,b,c,d = sel_obj.bounds()
                                     sel_obj.options['xmin'] = a
                                     sel_obj.options['ymin'] = b
                                     sel_obj.options['xmax'] = c
                                     sel_obj.options['ymax'] = d
+                                    self.app.collection.spatial_index.update(sel_obj)
                                     # self.app.collection.set_active(sel_obj.options['name'])
                         except Exception as e:
                             proc.done()
@@ -655,23 +655,17 @@ class NonCopperClear(FlatCAMTool, Gerber):
 
                 if area.geoms:
                     if len(area.geoms) > 0:
-                        for p in area.geoms:
-                            try:
-                                if pol_method == 'standard':
-                                    cp = self.clear_polygon(p, tool, self.app.defaults["gerber_circle_steps"],
-                                                            overlap=over, contour=contour, connect=connect)
-                                elif pol_method == 'seed':
-                                    cp = self.clear_polygon2(p, tool, self.app.defaults["gerber_circle_steps"],
-                                                             overlap=over, contour=contour, connect=connect)
-                                else:
-                                    cp = self.clear_polygon3(p, tool, self.app.defaults["gerber_circle_steps"],
-                                                             overlap=over, contour=contour, connect=connect)
-                                if cp:
-                                    cleared_geo += list(cp.get_objects())
-                            except:
-                                log.warning("Polygon can not be cleared.")
+                        # Polygons are cleared in the process pool, results come back in order.
+                        results = PolygonClearing(pool=self.app.pool).clear(
+                            area.geoms, tool, self.app.defaults["gerber_circle_steps"], method=pol_method,
+                            overlap=over, contour=contour, connect=connect)
+                        for paths, error in results:
+                            if error is not None:
+                                log.warning("Polygon can not be cleared. %s" % error)
                                 app_obj.poly_not_cleared = True
                                 continue
+                            if paths:
+                                cleared_geo += paths
 
                         # check if there is a geometry at all in the cleared geometry
                         if cleared_geo:
@@ -785,24 +779,16 @@ class NonCopperClear(FlatCAMTool, Gerber):
 
                 if area.geoms:
                     if len(area.geoms) > 0:
-                        for p in area.geoms:
-                            try:
-                                if pol_method == 'standard':
-                                    cp = self.clear_polygon(p, tool_used, self.app.defaults["gerber_circle_steps"],
-                                                            overlap=over, contour=contour, connect=connect)
-                                elif pol_method == 'seed':
-                                    cp = self.clear_polygon2(p, tool_used,
-                                                             self.app.defaults["gerber_circle_steps"],
-                                                             overlap=over, contour=contour, connect=connect)
-                                else:
-                                    cp = self.clear_polygon3(p, tool_used,
-                                                             self.app.defaults["gerber_circle_steps"],
-                                                             overlap=over, contour=contour, connect=connect)
-                                cleared_geo.append(list(cp.get_objects()))
-                            except:
+                        results = PolygonClearing(pool=self.app.pool).clear(
+                            area.geoms, tool_used, self.app.defaults["gerber_circle_steps"], method=pol_method,
+                            overlap=over, contour=contour, connect=connect)
+                        for p, (paths, error) in zip(area.geoms, results):
+                            if paths is None:
                                 log.warning("Polygon can't be cleared.")
                                 # this polygon should be added to a list and then try clear it with a smaller tool
                                 rest_geo.append(p)
+                                continue
+                            cleared_geo.append(paths)
 
                         # check if there is a geometry at all in the cleared geometry
                         if cleared_geo:
@@ -925,47 +925,32 @@ class ToolPaint(FlatCAMTool, Gerber):
                         current_uid = int(k)
                         break
 
-                for geo in recurse(obj.solid_geometry):
-                    try:
+                try:
+                    polys_buf = []
+                    for geo in recurse(obj.instanced(obj.solid_geometry)):
                         if not isinstance(geo, Polygon):
                             geo = Polygon(geo)
-                        poly_buf = geo.buffer(-paint_margin)
-
-                        if paint_method == "seed":
-                            # Type(cp) == FlatCAMRTreeStorage | None
-                            cp = self.clear_polygon2(poly_buf,
-                                                     tooldia=tool_dia,
-                                                     steps_per_circle=self.app.defaults["geometry_circle_steps"],
-                                                     overlap=over,
-                                                     contour=cont,
-                                                     connect=conn)
-
-                        elif paint_method == "lines":
-                            # Type(cp) == FlatCAMRTreeStorage | None
-                            cp = self.clear_polygon3(poly_buf,
-                                                     tooldia=tool_dia,
-                                                     steps_per_circle=self.app.defaults["geometry_circle_steps"],
-                                                     overlap=over,
-                                                     contour=cont,
-                                                     connect=conn)
-
-                        else:
-                            # Type(cp) == FlatCAMRTreeStorage | None
-                            cp = self.clear_polygon(poly_buf,
-                                                     tooldia=tool_dia,
-                                                     steps_per_circle=self.app.defaults["geometry_circle_steps"],
-                                                     overlap=over,
-                                                     contour=cont,
-                                                     connect=conn)
+                        polys_buf.append(geo.buffer(-paint_margin))
+                except Exception as e:
+                    log.debug("Could not Paint the polygons. %s" % str(e))
+                    self.app.inform.emit(
+                        "[error] Could not do Paint All. Try a different combination of parameters. "
+                        "Or a different Method of paint\n%s" % str(e))
+                    return
 
-                        if cp is not None:
-                            total_geometry += list(cp.get_objects())
-                    except Exception as e:
-                        log.debug("Could not Paint the polygons. %s" % str(e))
+                # Polygons are painted in the process pool, results come back in order.
+                results = PolygonClearing(pool=self.app.pool).clear(
+                    polys_buf, tool_dia, self.app.defaults["geometry_circle_steps"], method=paint_method,
+                    overlap=over, contour=cont, connect=conn)
+                for paths, error in results:
+                    if error is not None:
+                        log.debug("Could not Paint the polygons. %s" % error)
                         self.app.inform.emit(
                             "[error] Could not do Paint All. Try a different combination of parameters. "
-                            "Or a different Method of paint\n%s" % str(e))
+                            "Or a different Method of paint\n%s" % error)
                         return
+                    if paths is not None:
+                        total_geometry += paths
 
                 # add the solid_geometry to the current too in self.paint_tools dictionary and then reset the
                 # temporary list that stored that solid_geometry
@@ -1013,7 +998,7 @@ class ToolPaint(FlatCAMTool, Gerber):
             geo_obj.solid_geometry = []
 
             for tool_dia in sorted_tools:
-                for geo in recurse(obj.solid_geometry):
+                for geo in recurse(obj.instanced(obj.solid_geometry)):
                     try:
                         geo = Polygon(geo) if not isinstance(geo, Polygon) else geo
                         poly_buf = geo.buffer(-paint_margin)
@@ -1,5 +1,5 @@
 from FlatCAMTool import FlatCAMTool
-from copy import copy, deepcopy
+from copy import copy
 from ObjectCollection import *
 import time
 
@@ -153,6 +153,18 @@ class Panelize(FlatCAMTool):
         self.constrain_sel = OptionalInputSection(
             self.constrain_cb, [self.x_width_lbl, self.x_width_entry, self.y_height_lbl, self.y_height_entry])
 
+        ## Instanced
+        self.instanced_cb = FCCheckBox("Instanced panel")
+        self.instanced_cb.setToolTip(
+            "Store the geometry of the object only once, together with\n"
+            "the position of every copy in the panel. The CNC Job\n"
+            "repeats the same toolpaths for every copy.\n"
+            "Only for Gerber and Geometry objects. DXF and SVG export\n"
+            "and the Paint Tool work on all the copies. An instanced\n"
+            "panel can not be edited in the Geometry Editor."
+        )
+        form_layout.addRow(self.instanced_cb)
+
 
         ## Buttons
         hlay_2 = QtWidgets.QHBoxLayout()
@@ -174,9 +186,6 @@ class Panelize(FlatCAMTool):
         self.type_obj_combo.currentIndexChanged.connect(self.on_type_obj_index_changed)
         self.type_box_combo.currentIndexChanged.connect(self.on_type_box_index_changed)
 
-        # list to hold the temporary objects
-        self.objs = []
-
         # final name for the panel object
         self.outname = ""
 
@@ -266,15 +275,8 @@ class Panelize(FlatCAMTool):
                     rows -= 1
                     panel_lengthy = ((ymax - ymin) * rows) + (spacing_rows * (rows - 1))
 
-        def clean_temp():
-            # deselect all  to avoid  delete selected object when run  delete  from  shell
-            self.app.collection.set_all_inactive()
-
-            for del_obj in self.objs:
-                self.app.collection.set_active(del_obj.options['name'])
-                self.app.on_delete()
-
-            self.objs[:] = []
+        offsets = grid_offsets(rows, columns, lenghtx, lenghty)
+        instanced = self.instanced_cb.isChecked()
 
         def panelize():
             if panel_obj is not None:
@@ -282,54 +284,11 @@ class Panelize(FlatCAMTool):
 
                 self.app.progress.emit(10)
 
-                if isinstance(panel_obj, FlatCAMExcellon):
-                    currenty = 0.0
-                    self.app.progress.emit(0)
-
-                    def initialize_local_excellon(obj_init, app):
-                        obj_init.tools = panel_obj.tools
-                        # drills are offset, so they need to be deep copied
-                        obj_init.drills = deepcopy(panel_obj.drills)
-                        obj_init.offset([float(currentx), float(currenty)])
-                        obj_init.create_geometry()
-                        self.objs.append(obj_init)
-
-                    self.app.progress.emit(0)
-                    for row in range(rows):
-                        currentx = 0.0
-                        for col in range(columns):
-                            local_outname = self.outname + ".tmp." + str(col) + "." + str(row)
-                            self.app.new_object("excellon", local_outname, initialize_local_excellon, plot=False,
-                                                autoselected=False)
-                            currentx += lenghtx
-                        currenty += lenghty
-                else:
-                    currenty = 0
-                    self.app.progress.emit(0)
-
-                    def initialize_local_geometry(obj_init, app):
-                        obj_init.solid_geometry = panel_obj.solid_geometry
-                        obj_init.offset([float(currentx), float(currenty)]),
-                        self.objs.append(obj_init)
-
-                    self.app.progress.emit(0)
-                    for row in range(rows):
-                        currentx = 0
-
-                        for col in range(columns):
-                            local_outname = self.outname + ".tmp." + str(col) + "." + str(row)
-                            self.app.new_object("geometry", local_outname, initialize_local_geometry, plot=False,
-                                                autoselected=False)
-                            currentx += lenghtx
-                        currenty += lenghty
-
                 def job_init_geometry(obj_fin, app_obj):
-                    FlatCAMGeometry.merge(self.objs, obj_fin)
+                    FlatCAMGeometry.panelize(panel_obj, offsets, obj_fin, instanced=instanced)
 
                 def job_init_excellon(obj_fin, app_obj):
-                    # merge expects tools to exist in the target object
-                    obj_fin.tools = panel_obj.tools.copy()
-                    FlatCAMExcellon.merge(self.objs, obj_fin)
+                    FlatCAMExcellon.panelize(panel_obj, offsets, obj_fin)
 
                 if isinstance(panel_obj, FlatCAMExcellon):
                     self.app.progress.emit(50)
@@ -343,7 +302,6 @@ class Panelize(FlatCAMTool):
                 return "ERROR: Obj is None"
 
         panelize()
-        clean_temp()
         if self.constrain_flag is False:
             self.app.inform.emit("[success]Panel done...")
         else:
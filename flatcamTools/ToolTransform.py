@@ -498,6 +498,26 @@ class ToolTransform(FlatCAMTool):
                                    'params': [axis, value]})
         return
 
+    def transform_objects(self, obj_list, matrix, transform):
+        """
+        Moves the plotted shapes of all the objects by the matrix first, so the
+        result shows at once, then applies the same transform to their geometry.
+        CNCJob objects are skipped.
+
+        :param obj_list: Objects to transform.
+        :param matrix: 3x3 affine matrix of the transform.
+        :param transform: Function applying the transform to the geometry of an object.
+        :return: None
+        """
+        obj_list = [obj for obj in obj_list if not isinstance(obj, FlatCAMCNCjob)]
+        replot = [not obj.transform_shapes(matrix) for obj in obj_list]
+
+        for obj, plot in zip(obj_list, replot):
+            transform(obj)
+            if plot:
+                obj.plot()
+            self.app.object_changed.emit(obj)
+
     def on_rotate_action(self, num):
         obj_list = self.app.collection.get_selected()
         xminlist = []
@@ -530,19 +550,18 @@ class ToolTransform(FlatCAMTool):
 
                     self.app.progress.emit(20)
 
+                    px = 0.5 * (xminimal + xmaximal)
+                    py = 0.5 * (yminimal + ymaximal)
                     for sel_obj in obj_list:
-                        px = 0.5 * (xminimal + xmaximal)
-                        py = 0.5 * (yminimal + ymaximal)
                         if isinstance(sel_obj, FlatCAMCNCjob):
                             self.app.inform.emit("CNCJob objects can't be rotated.")
-                        else:
-                            sel_obj.rotate(-num, point=(px, py))
-                            sel_obj.plot()
-                            self.app.object_changed.emit(sel_obj)
 
                         # add information to the object that it was changed and how much
                         sel_obj.options['rotate'] = num
 
+                    self.transform_objects(obj_list, rotation_matrix(-num, (px, py)),
+                                           lambda obj: obj.rotate(-num, point=(px, py)))
+
                     self.app.inform.emit('Object(s) were rotated ...')
                     self.app.progress.emit(100)
 
@@ -596,26 +615,25 @@ class ToolTransform(FlatCAMTool):
                             self.app.inform.emit("CNCJob objects can't be mirrored/flipped.")
                         else:
                             if axis is 'X':
-                                obj.mirror('X', (px, py))
                                 # add information to the object that it was changed and how much
                                 # the axis is reversed because of the reference
                                 if 'mirror_y' in obj.options:
                                     obj.options['mirror_y'] = not obj.options['mirror_y']
                                 else:
                                     obj.options['mirror_y'] = True
-                                obj.plot()
                                 self.app.inform.emit('Flipped on the Y axis ...')
                             elif axis is 'Y':
-                                obj.mirror('Y', (px, py))
                                 # add information to the object that it was changed and how much
                                 # the axis is reversed because of the reference
                                 if 'mirror_x' in obj.options:
                                     obj.options['mirror_x'] = not obj.options['mirror_x']
                                 else:
                                     obj.options['mirror_x'] = True
-                                obj.plot()
                                 self.app.inform.emit('Flipped on the X axis ...')
-                            self.app.object_changed.emit(obj)
+
+                    xscale, yscale = {"X": (1.0, -1.0), "Y": (-1.0, 1.0)}[axis]
+                    self.transform_objects(obj_list, scale_matrix(xscale, yscale, (px, py)),
+                                           lambda obj: obj.mirror(axis, (px, py)))
 
                     self.app.progress.emit(100)
 
@@ -653,16 +671,15 @@ class ToolTransform(FlatCAMTool):
                         if isinstance(obj, FlatCAMCNCjob):
                             self.app.inform.emit("CNCJob objects can't be skewed.")
                         else:
+                            # add information to the object that it was changed and how much
                             if axis is 'X':
-                                obj.skew(num, 0, point=(xminimal, yminimal))
-                                # add information to the object that it was changed and how much
                                 obj.options['skew_x'] = num
                             elif axis is 'Y':
-                                obj.skew(0, num, point=(xminimal, yminimal))
-                                # add information to the object that it was changed and how much
                                 obj.options['skew_y'] = num
-                            obj.plot()
-                            self.app.object_changed.emit(obj)
+
+                    angle_x, angle_y = (num, 0) if axis == 'X' else (0, num)
+                    self.transform_objects(obj_list, skew_matrix(angle_x, angle_y, (xminimal, yminimal)),
+                                           lambda obj: obj.skew(angle_x, angle_y, point=(xminimal, yminimal)))
                     self.app.inform.emit('Object(s) were skewed on %s axis ...' % str(axis))
                     self.app.progress.emit(100)
 
@@ -713,12 +730,12 @@ class ToolTransform(FlatCAMTool):
                         if isinstance(obj, FlatCAMCNCjob):
                             self.app.inform.emit("CNCJob objects can't be scaled.")
                         else:
-                            obj.scale(xfactor, yfactor, point=(px, py))
                             # add information to the object that it was changed and how much
                             obj.options['scale_x'] = xfactor
                             obj.options['scale_y'] = yfactor
-                            obj.plot()
-                            self.app.object_changed.emit(obj)
+
+                    self.transform_objects(obj_list, scale_matrix(xfactor, yfactor, (px, py)),
+                                           lambda obj: obj.scale(xfactor, yfactor, point=(px, py)))
                     self.app.inform.emit('Object(s) were scaled on %s axis ...' % str(axis))
                     self.app.progress.emit(100)
                 except Exception as e:
@@ -754,16 +771,15 @@ class ToolTransform(FlatCAMTool):
                         if isinstance(obj, FlatCAMCNCjob):
                             self.app.inform.emit("CNCJob objects can't be offseted.")
                         else:
+                            # add information to the object that it was changed and how much
                             if axis is 'X':
-                                obj.offset((num, 0))
-                                # add information to the object that it was changed and how much
                                 obj.options['offset_x'] = num
                             elif axis is 'Y':
-                                obj.offset((0, num))
-                                # add information to the object that it was changed and how much
                                 obj.options['offset_y'] = num
-                            obj.plot()
-                            self.app.object_changed.emit(obj)
+
+                    dx, dy = (num, 0) if axis == 'X' else (0, num)
+                    self.transform_objects(obj_list, translation_matrix(dx, dy),
+                                           lambda obj: obj.offset((dx, dy)))
                     self.app.inform.emit('Object(s) were offseted on %s axis ...' % str(axis))
                     self.app.progress.emit(100)
 
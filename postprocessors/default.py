@@ -111,6 +111,10 @@ M0""".format(toolchangez=self.coordinate_format%(p.coords_decimals, toolchangez)
     def linear_code(self, p):
         return ('G01 ' + self.position_code(p)).format(**p)
 
+    def linear_format(self, p):
+        coordinate_format = self.coordinate_format.replace('*', str(p.coords_decimals))
+        return 'G01 X' + coordinate_format + ' Y' + coordinate_format
+
     def end_code(self, p):
         coords_xy = p['toolchange_xy']
         gcode = ('G00 Z' + self.feedrate_format %(p.fr_decimals, p.endz) + "\n")
@@ -50,8 +50,8 @@ class TclCommandDrillcncjob(TclCommandSignaled):
             ('endz', 'Z distance at job end (example: 30.0).'),
             ('ppname_e', 'This is the Excellon postprocessor name: case_sensitive, no_quotes'),
             ('outname', 'Name of the resulting Geometry object.'),
-            ('opt_type', 'Name of move optimization type. R by default from Rtree or '
-                         'T from Travelling Salesman Algorithm')
+            ('opt_type', 'Name of move optimization type. B by default for nearest neighbour and 2-opt or '
+                         'M for OR-Tools Metaheuristic')
         ]),
         'examples': ['drillcncjob test.TXT -drillz -1.5 -travelz 14 -feedrate 222 -feedrate_rapid 456 -spindlespeed 777'
                      ' -toolchange True -toolchangez 33 -endz 22 -ppname_e default\n'
@@ -1,5 +1,5 @@
 from ObjectCollection import *
-from copy import copy,deepcopy
+from copy import copy
 
 from tclCommands.TclCommand import TclCommand
 
@@ -27,7 +27,8 @@ class TclCommandPanelize(TclCommand):
         ('spacing_columns', float),
         ('spacing_rows', float),
         ('box', str),
-        ('outname', str)
+        ('outname', str),
+        ('instanced', bool)
     ])
 
     # array of mandatory options for current Tcl command: required = {'name','outname'}
@@ -44,7 +45,9 @@ class TclCommandPanelize(TclCommand):
             ('spacing_rows', 'Spacing between rows.'),
             ('columns', 'Number of columns.'),
             ('rows', 'Number of rows;'),
-            ('outname', 'Name of the new geometry object.')
+            ('outname', 'Name of the new geometry object.'),
+            ('instanced', 'Store the geometry once with the offset of every copy. Not for Excellon objects. '
+                          '(True or False)')
         ]),
         'examples': []
     }
@@ -99,55 +102,20 @@ class TclCommandPanelize(TclCommand):
         lenghtx = xmax - xmin + spacing_columns
         lenghty = ymax - ymin + spacing_rows
 
-        currenty = 0
-
-        def initialize_local(obj_init, app):
-            obj_init.solid_geometry = obj.solid_geometry
-            obj_init.offset([float(currentx), float(currenty)])
-            objs.append(obj_init)
-
-        def initialize_local_excellon(obj_init, app):
-            obj_init.tools = obj.tools
-            # drills are offset, so they need to be deep copied
-            obj_init.drills = deepcopy(obj.drills) 
-            obj_init.offset([float(currentx), float(currenty)])
-            obj_init.create_geometry()
-            objs.append(obj_init)
+        offsets = grid_offsets(args['rows'], args['columns'], lenghtx, lenghty)
+        instanced = 'instanced' in args and args['instanced']
 
         def initialize_geometry(obj_init, app):
-            FlatCAMGeometry.merge(objs, obj_init)
+            FlatCAMGeometry.panelize(obj, offsets, obj_init, instanced=instanced)
 
         def initialize_excellon(obj_init, app):
-            # merge expects tools to exist in the target object
-            obj_init.tools = obj.tools.copy()
-            FlatCAMExcellon.merge(objs, obj_init)
-
-        objs = []
-        if obj is not None:           
-
-            for row in range(args['rows']):
-                currentx = 0
-                for col in range(args['columns']):
-                    local_outname = outname + ".tmp." + str(col) + "." + str(row)
-                    if isinstance(obj, FlatCAMExcellon):
-                        self.app.new_object("excellon", local_outname, initialize_local_excellon, plot=False,
-                                            autoselected=False)
-                    else:
-                        self.app.new_object("geometry", local_outname, initialize_local, plot=False, autoselected=False)
-
-                    currentx += lenghtx
-                currenty += lenghty
+            FlatCAMExcellon.panelize(obj, offsets, obj_init)
 
+        if obj is not None:
             if isinstance(obj, FlatCAMExcellon):
                 self.app.new_object("excellon", outname, initialize_excellon)
             else:
                 self.app.new_object("geometry", outname, initialize_geometry)
-
-            # deselect all  to avoid  delete selected object when run  delete  from  shell
-            self.app.collection.set_all_inactive()
-            for delobj in objs:
-                self.app.collection.set_active(delobj.options['name'])
-                self.app.on_delete()
         else:
             return "ERROR: obj is None"
 
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from camlib import order_points, nearest_neighbour_route, neighbour_lists
+
+
+def path_length(points, order, start):
+    path = np.vstack([start, np.asarray(points)[order]])
+    return np.hypot(*np.diff(path, axis=0).T).sum()
+
+
+class OrderPointsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.points = np.random.RandomState(0).uniform(0, 100, (2000, 2))
+
+    def test_permutation(self):
+        order = order_points(self.points, start=(0, 0), time_limit=1)
+        self.assertEqual(sorted(order), list(range(len(self.points))))
+
+    def test_improves_nearest_neighbour(self):
+        nn = nearest_neighbour_route(self.points, (0, 0))
+        order = order_points(self.points, start=(0, 0), time_limit=5)
+        self.assertLess(path_length(self.points, order, (0, 0)),
+                        path_length(self.points, nn, (0, 0)))
+
+    def test_nearest_neighbour(self):
+        points = [(float(i) ** 2, 0.0) for i in range(20)]
+        order = nearest_neighbour_route(np.array(points), (26, 0))
+        self.assertEqual(order.tolist()[:4], [5, 4, 3, 2])
+        self.assertEqual(sorted(order.tolist()), list(range(20)))
+
+    def test_line(self):
+        points = [(float(i), 0.0) for i in range(50)]
+        self.assertEqual(order_points(points[::-1], start=(-1, 0)), list(range(50))[::-1])
+
+    def test_duplicates(self):
+        points = [(1.0, 1.0)] * 5 + [(2.0, 2.0)] * 5
+        self.assertEqual(sorted(order_points(points)), list(range(10)))
+
+    def test_small(self):
+        self.assertEqual(order_points([]), [])
+        self.assertEqual(order_points([(3, 4)]), [0])
+        self.assertEqual(order_points([(5, 5), (1, 1)]), [1, 0])
+
+    def test_neighbour_lists(self):
+        neighbours = neighbour_lists(self.points, 4)
+        self.assertEqual(neighbours.shape, (len(self.points), 4))
+        d = np.hypot(*(self.points[:, None, :] - self.points[None, :, :]).transpose(2, 0, 1))
+        np.fill_diagonal(d, np.inf)
+        nearest = np.argmin(d, axis=1)
+        # Approximate, but the nearest point is almost always found.
+        self.assertGreater(np.mean(neighbours[:, 0] == nearest), 0.95)
+
+
+if __name__ == '__main__':
+    unittest.main()
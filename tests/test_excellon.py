@@ -1,4 +1,9 @@
+import json
 import unittest
+from copy import deepcopy
+
+from shapely.geometry import Point
+
 import camlib
 
 
@@ -326,5 +331,84 @@ class ExcellonFormatMETRICTZTest(unittest.TestCase):
         self.assertEqual(self.excellon.drills[0]["point"].coords[0], (9.0, 11.75))
         self.assertEqual(self.excellon.drills[1]["point"].coords[0], (30.25, 10.5))
 
+
+class DrillTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.excellon = camlib.Excellon()
+        self.excellon.tools = {'1': {'C': 0.5}, '2': {'C': 1.0}}
+        self.excellon.drills = [{'point': Point(1, 1), 'tool': '1'},
+                                {'point': Point(2, 3), 'tool': '2'},
+                                {'point': Point(4, 5), 'tool': '1'}]
+        self.excellon.slots = [{'start': Point(0, 0), 'stop': Point(0, 2), 'tool': '2'}]
+
+    def test_list_view(self):
+        drills = self.excellon.drills
+        self.assertIsInstance(drills, camlib.DrillTable)
+        self.assertEqual(len(drills), 3)
+        self.assertEqual([d['tool'] for d in drills], ['1', '2', '1'])
+        self.assertEqual(drills[-1]['point'].coords[0], (4, 5))
+
+        drills[0]['point'] = Point(7, 8)
+        drills.append({'point': Point(9, 9), 'tool': '3'})
+        self.assertEqual(drills.coords.tolist(), [[7, 8], [2, 3], [4, 5], [9, 9]])
+        self.assertEqual(drills.counts(), {'1': 2, '2': 1, '3': 1})
+
+        del drills[1]
+        self.assertEqual(drills.coords_of('1').tolist(), [[7, 8], [4, 5]])
+        self.assertEqual(drills.to_list()[2], {'point': Point(9, 9), 'tool': '3'})
+
+    def test_copy(self):
+        copied = deepcopy(self.excellon.drills)
+        copied.transform(camlib.translation_matrix(1, 0))
+        self.assertEqual(copied[0]['point'].coords[0], (2, 1))
+        self.assertEqual(self.excellon.drills[0]['point'].coords[0], (1, 1))
+
+    def test_tile(self):
+        slots = self.excellon.slots.tile([[0, 0], [10, 20]])
+        self.assertIsInstance(slots, camlib.SlotTable)
+        self.assertEqual(slots.coords.tolist(), [[0, 0, 0, 2], [10, 20, 10, 22]])
+
+        drills = self.excellon.drills.tile([[0, 0], [10, 0]])
+        self.assertEqual([d['tool'] for d in drills], ['1', '2', '1', '1', '2', '1'])
+        self.assertEqual(drills[4]['point'].coords[0], (12, 3))
+        self.assertEqual(len(self.excellon.drills), 3)
+
+    def test_serialize(self):
+        d = json.loads(json.dumps(self.excellon.to_dict(), default=camlib.to_dict), object_hook=camlib.dict2obj)
+        excellon = camlib.Excellon()
+        excellon.from_dict(d)
+        self.assertEqual(excellon.drills.to_list(), self.excellon.drills.to_list())
+        self.assertEqual(excellon.slots.to_list(), self.excellon.slots.to_list())
+
+    def test_geometry(self):
+        self.excellon.create_geometry()
+        self.assertEqual(len(self.excellon.solid_geometry), 4)
+        self.assertAlmostEqual(self.excellon.solid_geometry[1].area, Point(2, 3).buffer(0.5, 16).area)
+        # Drills keep the order of the table
+        for poly, drill in zip(self.excellon.solid_geometry, self.excellon.drills):
+            radius = self.excellon.tools[drill['tool']]['C'] / 2
+            self.assertTrue(poly.equals_exact(drill['point'].buffer(radius, 16), 1e-9))
+
+    def test_geometry_unused_tool(self):
+        # Tools '3' and '4' are left in the tables without hits and are not in self.tools.
+        self.excellon.drills.append({'point': Point(9, 9), 'tool': '3'})
+        self.excellon.drills[3]['tool'] = '1'
+        self.excellon.slots.append({'start': Point(1, 0), 'stop': Point(1, 2), 'tool': '4'})
+        del self.excellon.slots[1]
+        self.assertIn('3', self.excellon.drills.tool_names)
+        self.assertIn('4', self.excellon.slots.tool_names)
+
+        self.assertIsNone(self.excellon.create_geometry())
+        self.assertEqual(len(self.excellon.solid_geometry), 5)
+
+    def test_circles_at(self):
+        rings = camlib.circles_at([(1, 2), (3, 4)], 0.5, 64, exterior=True)
+        self.assertEqual(len(rings), 2)
+        self.assertTrue(rings[1].equals_exact(Point(3, 4).buffer(0.25).exterior, 1e-9))
+        self.assertIs(camlib.circle_template(0.5, 64), camlib.circle_template(0.5, 64))
+        self.assertTrue(camlib.circles_at([(1, 1)], 0, 64)[0].is_empty)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+import FlatCAMApp  # FlatCAMObj can only be imported after the app
+from FlatCAMObj import FlatCAMCNCjob
+
+
+class FakeInform:
+
+    def __init__(self):
+        self.messages = []
+
+    def emit(self, message):
+        self.messages.append(message)
+
+
+class FakeApp:
+
+    def __init__(self):
+        self.inform = FakeInform()
+
+
+class FakeCNCjob(FlatCAMCNCjob):
+
+    def __init__(self, gcode='', cnc_tools=None, ppname='default'):
+        self.app = FakeApp()
+        self.gcode = gcode
+        self.cnc_tools = cnc_tools or {}
+        self.multitool = cnc_tools is not None
+        if not self.cnc_tools:
+            self.cnc_tools = {1: {'data': {'ppname_g': ppname}}}
+
+    def gcode_header(self):
+        return '(G-CODE GENERATED BY FLATCAM)\n(Units: IN)\n\n'
+
+
+def concatenated_export(job, preamble, postamble):
+    """
+    The G-code as export_gcode() built it by concatenating strings.
+    """
+    roland = job.cnc_tools[list(job.cnc_tools)[0]]['data'].get('ppname_g') == 'Roland_MDX_20'
+
+    gcode = '' if roland else job.gcode_header()
+    if job.multitool:
+        for tooluid_key in job.cnc_tools:
+            gcode += job.cnc_tools[tooluid_key]['gcode']
+    else:
+        gcode += job.gcode
+
+    if roland:
+        return preamble + gcode + postamble
+
+    g_idx = gcode.rfind('G20')
+    if g_idx == -1:
+        g_idx = gcode.rfind('G21')
+    if g_idx == -1:
+        return None
+    return gcode[:g_idx] + preamble + '\n' + gcode[g_idx:] + postamble
+
+
+class ExportGCodeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.nc')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def exported(self, job, preamble='', postamble=''):
+        job.export_gcode(self.filename, preamble, postamble)
+        with open(self.filename, 'rb') as f:
+            return f.read()
+
+    def check(self, job, preamble='(pre)', postamble='(post)\n'):
+        expected = concatenated_export(job, preamble, postamble)
+        self.assertEqual(self.exported(job, preamble, postamble), expected.encode())
+
+    def test_single_tool(self):
+        self.check(FakeCNCjob('G20\nG90\nG94\nG00 X1.0000 Y1.0000\nM05\n'))
+
+    def test_multitool(self):
+        tools = {
+            1: {'data': {'ppname_g': 'default'}, 'gcode': 'G21\nG90\nG01 X1.0000 Y2.0000\nM05\n'},
+            2: {'data': {'ppname_g': 'default'}, 'gcode': 'G21\nG90\nG01 X3.0000 Y4.0000\nM05\n'},
+        }
+        self.check(FakeCNCjob(cnc_tools=tools))
+
+    def test_roland(self):
+        self.check(FakeCNCjob(';;^IN;!MC0;V85.0;\nZ0,0,100;\n', ppname='Roland_MDX_20'))
+
+    def test_no_units(self):
+        job = FakeCNCjob('G90\nG00 X1.0000 Y1.0000\n')
+        self.assertIsNone(concatenated_export(job, '', ''))
+        job.export_gcode(self.filename)
+        self.assertTrue(job.app.inform.messages[-1].startswith('[error_notcl]'))
+
+    def test_editor_text(self):
+        job = FakeCNCjob('G20\nG90\nG00 X1.0000 Y1.0000\n')
+        lines = job.export_gcode(preamble='(pre)', postamble='(post)', to_file=True)
+        self.assertEqual(lines.getvalue(), concatenated_export(job, '(pre)', '(post)'))
+
+
+if __name__ == '__main__':
+    unittest.main()
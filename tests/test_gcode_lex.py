@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+
+from camlib import gcode_lex, gcode_toolpaths
+
+
+class GCodeLexTestCase(unittest.TestCase):
+
+    def test_words(self):
+        words = gcode_lex("G01 X1.5 Y-2\n(comment X9)\nG00X3Y4 ; X7\nX 1 .5 X2\n")
+        np.testing.assert_array_equal(words["G"][:4], [1, np.nan, 0, np.nan])
+        np.testing.assert_array_equal(words["X"][:4], [1.5, np.nan, 3, 2])
+        np.testing.assert_array_equal(words["Y"][:4], [-2, np.nan, 4, np.nan])
+        self.assertTrue(np.isnan(words["Z"]).all())
+
+    def test_roland(self):
+        words = gcode_lex(";;^IN;\nZ40.0,80.0,-4.0;\nZ0.0,0.0,40.0;\n", roland=True)
+        np.testing.assert_allclose(words["X"], [1.0, 0.0])
+        np.testing.assert_allclose(words["Z"], [-0.1, 1.0])
+        np.testing.assert_array_equal(words["G"], [0, 0])
+
+
+class GCodeToolpathsTestCase(unittest.TestCase):
+
+    def paths(self, gcode, start=(0, 0)):
+        coords, index, kinds = gcode_toolpaths(gcode_lex(gcode), start, 64)
+        return [coords[index == k].tolist() for k in range(len(kinds))], kinds
+
+    def test_paths(self):
+        paths, kinds = self.paths("G00 Z1\nG00 X1 Y1\nG01 Z-1\nG01 X2\nY2\nG00 Z1\n", start=(5, 5))
+        self.assertEqual(paths, [[[5, 5], [1, 1]], [[1, 1], [2, 1], [2, 2]]])
+        self.assertEqual(kinds, [["T", "F"], ["C", "S"]])
+
+    def test_arc(self):
+        paths, kinds = self.paths("G00 X1 Y0\nG01 Z-1\nG03 X-1 Y0 I-1 J0\n")
+        self.assertEqual(len(paths), 2)
+        arc = np.array(paths[1][1:])
+        np.testing.assert_allclose(np.hypot(arc[:, 0], arc[:, 1]), 1.0)
+        self.assertTrue((arc[:, 1] >= -1e-12).all())
+        np.testing.assert_allclose(arc[-1], [-1, 0], atol=1e-12)
+
+    def test_no_moves(self):
+        paths, kinds = self.paths("M05\n")
+        self.assertEqual(paths, [])
+        self.assertEqual(kinds, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from shapely.geometry import Point
+
+from camlib import Gerber
+
+
+class FlashGeometriesTestCase(unittest.TestCase):
+
+    locations = [[0.0, 0.0], [1.5, -2.0], [10.25, 3.75]]
+
+    def check(self, aperture):
+        flashes = Gerber.create_flash_geometries(self.locations, aperture, 64)
+        self.assertEqual(len(flashes), len(self.locations))
+        for location, flash in zip(self.locations, flashes):
+            expected = Gerber.create_flash_geometry(Point(location), aperture, 64)
+            self.assertAlmostEqual(flash.symmetric_difference(expected).area, 0, places=9)
+
+    def test_circle(self):
+        self.check({'type': 'C', 'size': 0.6})
+
+    def test_rectangle(self):
+        self.check({'type': 'R', 'width': 0.6, 'height': 0.2})
+
+    def test_obround(self):
+        self.check({'type': 'O', 'width': 0.2, 'height': 0.6})
+
+    def test_polygon(self):
+        self.check({'type': 'P', 'diam': 1.0, 'nVertices': 5, 'rotation': 30})
+
+    def test_no_locations(self):
+        self.assertEqual(Gerber.create_flash_geometries([], {'type': 'C', 'size': 0.6}), [])
+
+    def test_parse(self):
+        gerber = Gerber()
+        gerber.parse_lines(["%FSLAX24Y24*%", "%MOIN*%", "%ADD10C,0.1*%", "%ADD11R,0.2X0.2*%",
+                            "D10*", "X0Y0D03*", "X10000D03*", "D11*", "X20000Y0D03*",
+                            "%LPC*%", "D10*", "X20000Y0D03*", "M02*"])
+        # Two round pads and a square one, with one round pad cleared from the square.
+        circle = Point(0, 0).buffer(0.05, int(gerber.steps_per_circle / 4)).area
+        expected = 2 * circle + 0.04 - circle
+        self.assertAlmostEqual(gerber.solid_geometry.area, expected, places=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
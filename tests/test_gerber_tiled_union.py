@@ -0,0 +1,74 @@
+import unittest
+from multiprocessing import Pool
+from random import Random
+
+from shapely.geometry import Point, Polygon
+from shapely.ops import unary_union
+
+from camlib import TiledUnion, Gerber
+
+
+class TiledUnionTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = Pool(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+        cls.pool.join()
+
+    def setUp(self):
+        self.min_parallel = TiledUnion.defaults["min_parallel"]
+        TiledUnion.defaults["min_parallel"] = 10
+
+        rnd = Random(1)
+        self.geometries = [Point(rnd.uniform(0, 50), rnd.uniform(0, 50)).buffer(rnd.uniform(0.5, 3), 8)
+                           for _ in range(400)]
+
+    def tearDown(self):
+        TiledUnion.defaults["min_parallel"] = self.min_parallel
+
+    def test_tiles(self):
+        stage = TiledUnion(pool=self.pool)
+        tiles = stage.make_tiles(self.geometries)
+        self.assertGreater(len(tiles), 1)
+        self.assertEqual(sum(len(t) for t in tiles), len(self.geometries))
+
+    def test_no_pool(self):
+        stage = TiledUnion()
+        self.assertEqual(len(stage.make_tiles(self.geometries)), 1)
+
+    def test_union(self):
+        expected = unary_union(self.geometries)
+        for method in ["union", "buffer", "union_fix"]:
+            result = TiledUnion(pool=self.pool).union(self.geometries, method)
+            self.assertTrue(result.is_valid)
+            self.assertAlmostEqual(result.symmetric_difference(expected).area, 0, places=5)
+
+    def test_polarity(self):
+        clear = [Point(25, 25).buffer(10)]
+
+        stage = TiledUnion(pool=self.pool)
+        stage.add_layer('D', self.geometries)
+        stage.add_layer('C', clear)
+        result = stage.apply(Polygon())
+
+        expected = unary_union(self.geometries).difference(clear[0])
+        self.assertAlmostEqual(result.symmetric_difference(expected).area, 0, places=5)
+
+    def test_parse(self):
+        serial = Gerber()
+        serial.parse_file('tests/gerber_files/detector_copper_top.gbr')
+
+        parallel = Gerber()
+        parallel.pool = self.pool
+        parallel.parse_file('tests/gerber_files/detector_copper_top.gbr')
+
+        self.assertAlmostEqual(serial.solid_geometry.symmetric_difference(parallel.solid_geometry).area,
+                               0, places=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from io import StringIO
+
+from camlib import Gerber
+
+
+class ReadStatementsTestCase(unittest.TestCase):
+
+    def statements(self, text, chunk_size=1048576):
+        return list(Gerber.read_statements(StringIO(text), chunk_size=chunk_size))
+
+    def test_split(self):
+        self.assertEqual(self.statements("G54D11*G36*\n"), ["G54D11*", "G36*"])
+
+    def test_extended(self):
+        self.assertEqual(self.statements("%FSLAX24Y24*%\r\n%MOIN*%\n"), ["%FSLAX24Y24*%", "%MOIN*%"])
+
+    def test_no_star(self):
+        self.assertEqual(self.statements("X1Y2D01*X3\n\n  \n"), ["X1Y2D01*", "X3"])
+
+    def test_no_newline_at_end(self):
+        self.assertEqual(self.statements("D10*\nX1Y2D03*"), ["D10*", "X1Y2D03*"])
+
+    def test_chunks(self):
+        text = "%ADD10C,0.1*%\nD10*\n" + "".join("X%dY%dD01*\n" % (i, i) for i in range(100))
+        self.assertEqual(self.statements(text, chunk_size=7), self.statements(text))
+
+
+class LinearPatternTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.gerber = Gerber()
+
+    def test_same_groups(self):
+        for line in ["X100Y200D01*", "G01X-100Y+200D02*", "G1X5D3*", "Y7*", "X0Y0D1*"]:
+            self.assertEqual(self.gerber.lin_fast_re.search(line).groups(),
+                             self.gerber.lin_re.search(line).groups())
+
+    def test_fallback(self):
+        # Reversed order is only understood by lin_re.
+        self.assertIsNone(self.gerber.lin_fast_re.search("Y200X100D01*"))
+        self.assertIsNotNone(self.gerber.lin_re.search("Y200X100D01*"))
+
+    def test_parse(self):
+        self.gerber.parse_lines(["%FSLAX24Y24*%", "%MOIN*%", "%ADD10C,0.1*%", "D10*",
+                                 "X0Y0D02*", "X10000D01*", "Y10000*", "Y20000X10000D01*", "M02*"])
+        xmin, ymin, xmax, ymax = self.gerber.solid_geometry.bounds
+        self.assertAlmostEqual(xmax, 1.05, places=2)
+        self.assertAlmostEqual(ymax, 2.05, places=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from shapely.geometry import LineString, Point, box
+
+from ObjectCollection import ObjectIndex
+
+
+class FakeObject:
+
+    def __init__(self, geometry):
+        self.solid_geometry = geometry
+        self.multigeo = False
+        xmin, ymin, xmax, ymax = geometry.bounds
+        self.options = {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax}
+
+
+class ObjectIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ObjectIndex()
+        self.ring = FakeObject(Point(0, 0).buffer(10).difference(Point(0, 0).buffer(5)))
+        self.square = FakeObject(box(-2, -2, 2, 2))
+        self.line = FakeObject(LineString([(20, 0), (30, 10)]))
+        for obj in (self.ring, self.square, self.line):
+            self.index.update(obj)
+
+    def test_at(self):
+        # Inside the ring bounds but in its hole, only the square is hit.
+        self.assertEqual(self.index.at(0, 0), [self.square])
+        self.assertEqual(self.index.at(-3, 3), [])
+        self.assertEqual(self.index.at(7, 0), [self.ring])
+
+        # Lines are hit within tolerance
+        self.assertEqual(self.index.at(25, 5.1), [])
+        self.assertEqual(self.index.at(25, 5.1, tolerance=0.2), [self.line])
+
+    def test_in_area(self):
+        self.assertEqual(self.index.in_area((-3, -3, 3, 3), enclosed=True), [self.square])
+        self.assertEqual(self.index.in_area((-3, -3, 3, 3)), [self.square])
+        self.assertEqual(self.index.in_area((-12, -12, 40, 12), enclosed=True), [self.ring, self.square, self.line])
+        self.assertEqual(self.index.in_area((6, -1, 19, 1)), [self.ring])
+
+    def test_update(self):
+        self.square.solid_geometry = box(40, 40, 42, 42)
+        self.square.options.update(xmin=40, ymin=40, xmax=42, ymax=42)
+        self.index.update(self.square)
+        self.assertEqual(self.index.at(0, 0), [])
+        self.assertEqual(self.index.at(41, 41), [self.square])
+
+        self.index.remove(self.square)
+        self.assertEqual(self.index.at(41, 41), [])
+
+    def test_no_bounds(self):
+        obj = FakeObject(box(0, 0, 1, 1))
+        obj.options = {}
+        self.index.update(obj)
+        self.assertEqual(self.index.at(0.5, 0.5), [self.square])
+        self.index.remove(obj)
+
+    def test_instances(self):
+        panel = FakeObject(box(100, 0, 102, 2))
+        panel.instances = [[0, 0], [10, 0]]
+        panel.options.update(xmax=112)
+        self.index.update(panel)
+        self.assertEqual(self.index.at(101, 1), [panel])
+        self.assertEqual(self.index.at(111, 1), [panel])
+        self.assertEqual(self.index.at(106, 1), [])
+        self.assertEqual(self.index.in_area((109, 0.5, 120, 1.5)), [panel])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
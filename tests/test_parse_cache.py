@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from camlib import Gerber, Excellon
+from FlatCAMCache import ParseCache, pack_attrs, unpack_attrs
+
+
+class ParseCacheTestCase(unittest.TestCase):
+
+    gerber_file = 'tests/gerber_files/detector_copper_top.gbr'
+    excellon_file = 'tests/excellon_files/case1.drl'
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = ParseCache(self.path, 8.9)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_pack(self):
+        gerber = Gerber()
+        gerber.parse_file(self.gerber_file)
+        attrs = unpack_attrs(pack_attrs(gerber.to_dict()))
+        self.assertEqual(attrs['apertures'].keys(), gerber.apertures.keys())
+        self.assertTrue(attrs['solid_geometry'].equals_exact(gerber.solid_geometry, 0))
+
+    def test_gerber(self):
+        key = self.cache.make_key(self.gerber_file, follow=False)
+        gerber = Gerber()
+        self.assertFalse(self.cache.load(key, gerber))
+        gerber.parse_file(self.gerber_file)
+        self.cache.store(key, gerber, gerber.ser_attrs)
+
+        cached = Gerber()
+        self.assertTrue(self.cache.load(key, cached))
+        self.assertTrue(cached.solid_geometry.equals_exact(gerber.solid_geometry, 0))
+        self.assertEqual(cached.units, gerber.units)
+
+    def test_excellon(self):
+        excellon = Excellon()
+        excellon.parse_file(self.excellon_file)
+        excellon.create_geometry()
+        key = self.cache.make_key(self.excellon_file)
+        self.cache.store(key, excellon, excellon.ser_attrs)
+
+        cached = Excellon()
+        self.assertTrue(self.cache.load(key, cached))
+        self.assertEqual(cached.tools, excellon.tools)
+        self.assertEqual(len(cached.drills), len(excellon.drills))
+        self.assertTrue(cached.drills[0]['point'].equals(excellon.drills[0]['point']))
+
+    def test_key(self):
+        key = self.cache.make_key(self.gerber_file, follow=False)
+        self.assertEqual(key, self.cache.make_key(self.gerber_file, follow=False))
+        self.assertNotEqual(key, self.cache.make_key(self.gerber_file, follow=True))
+        self.assertNotEqual(key, ParseCache(self.path, 9.0).make_key(self.gerber_file, follow=False))
+        self.assertIsNone(self.cache.make_key('tests/no_such_file.gbr'))
+
+    def test_evict(self):
+        gerber = Gerber()
+        gerber.parse_file(self.gerber_file)
+        for follow in [False, True]:
+            self.cache.store(self.cache.make_key(self.gerber_file, follow=follow), gerber, gerber.ser_attrs)
+        self.assertEqual(len(self.cache.entries()), 2)
+
+        self.cache.max_size = max(size for _, size, _ in self.cache.entries())
+        self.cache.evict()
+        self.assertEqual(len(self.cache.entries()), 1)
+
+    def test_corrupt(self):
+        key = self.cache.make_key(self.gerber_file)
+        with open(self.cache.entry_path(key), 'wb') as f:
+            f.write(b"FCPC garbage")
+        self.assertFalse(self.cache.load(key, Gerber()))
+        self.assertFalse(os.path.exists(self.cache.entry_path(key)))
+
+    def test_failed_store(self):
+        key = self.cache.make_key(self.gerber_file)
+        # The entry cannot replace a directory.
+        os.makedirs(self.cache.entry_path(key))
+        gerber = Gerber()
+        gerber.parse_file(self.gerber_file)
+        self.cache.store(key, gerber, gerber.ser_attrs)
+        self.assertEqual([name for name in os.listdir(self.path) if name.endswith('.tmp')], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
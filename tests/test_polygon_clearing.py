@@ -0,0 +1,71 @@
+import unittest
+from multiprocessing import Pool
+from unittest import mock
+
+from shapely.geometry import Point, box
+
+from camlib import PolygonClearing
+
+
+class PolygonClearingTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = Pool(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+        cls.pool.join()
+
+    def setUp(self):
+        # Different sizes, so the largest first dispatch order
+        # is not the order of the list.
+        self.polygons = [box(10 * i, 0, 10 * i + 1 + i, 1 + i).difference(Point(10 * i + 0.5, 0.5).buffer(0.2))
+                         for i in range(6)]
+        # Too small for the tool.
+        self.polygons.insert(2, box(100, 100, 100.01, 100.01))
+
+    def check(self, results):
+        self.assertEqual(len(results), len(self.polygons))
+        self.assertIsNone(results[2][0])
+        for i, (polygon, (paths, error)) in enumerate(zip(self.polygons, results)):
+            if i == 2:
+                continue
+            self.assertIsNone(error)
+            self.assertTrue(len(paths) > 0)
+            for path in paths:
+                self.assertTrue(polygon.buffer(1e-6).contains(path))
+
+    def test_no_pool(self):
+        self.check(PolygonClearing().clear(self.polygons, 0.1, 16, connect=False))
+
+    def test_pool_same_result(self):
+        with mock.patch("camlib.os.cpu_count", return_value=2):
+            for method in ("standard", "seed", "lines"):
+                serial = PolygonClearing().clear(self.polygons, 0.1, 16, method=method, connect=False)
+                parallel = PolygonClearing(pool=self.pool).clear(self.polygons, 0.1, 16, method=method,
+                                                                 connect=False)
+                self.assertEqual([e for _, e in serial], [e for _, e in parallel])
+                for (a, _), (b, _) in zip(serial, parallel):
+                    if a is None:
+                        self.assertIsNone(b)
+                    else:
+                        self.assertEqual([g.wkb for g in a], [g.wkb for g in b])
+            self.check(PolygonClearing(pool=self.pool).clear(self.polygons, 0.1, 16, connect=False))
+
+    def test_error(self):
+        results = PolygonClearing().clear([Point(0, 0)], 0.1, 16)
+        self.assertIsNone(results[0][0])
+        self.assertIsNotNone(results[0][1])
+
+    def test_closed_pool(self):
+        pool = Pool(1)
+        pool.close()
+        pool.join()
+        with mock.patch("camlib.os.cpu_count", return_value=2):
+            self.check(PolygonClearing(pool=pool).clear(self.polygons, 0.1, 16, connect=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
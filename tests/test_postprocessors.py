@@ -0,0 +1,35 @@
+import os
+import unittest
+from importlib.machinery import SourceFileLoader
+
+from FlatCAMPostProc import postprocessors
+from camlib import AttrDict
+
+
+class LinearFormatTestCase(unittest.TestCase):
+
+    points = [(0.0, 0.0), (1.23456789, -2.5), (-100.00005, 3.99999), (1e-9, -1e-9)]
+
+    def setUp(self):
+        for name in ['default', 'grbl_11']:
+            if name not in postprocessors:
+                SourceFileLoader('FlatCAMPostProcessor', os.path.join('postprocessors', name + '.py')).load_module()
+
+    def check(self, name):
+        pp = postprocessors[name]
+        for decimals in [2, 4, 6]:
+            p = AttrDict(coords_decimals=decimals, fr_decimals=2, feedrate=12.345, z=-0.1)
+            line_format = pp.linear_format(p)
+            for x, y in self.points:
+                p.update(x=x, y=y)
+                self.assertEqual(line_format % (x, y), pp.linear_code(p))
+
+    def test_default(self):
+        self.check('default')
+
+    def test_grbl_11(self):
+        self.check('grbl_11')
+
+
+if __name__ == '__main__':
+    unittest.main()
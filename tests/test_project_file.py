@@ -0,0 +1,63 @@
+import unittest
+from io import BytesIO
+
+from camlib import Gerber
+from FlatCAMProjectFile import ProjectWriter, ProjectReader, split_attrs, decode_json
+
+
+class ProjectFileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.gerber = Gerber()
+        self.gerber.parse_file('tests/gerber_files/detector_copper_top.gbr')
+
+        self.f = BytesIO()
+        writer = ProjectWriter(self.f)
+        writer.write_project({"units": "IN"}, 8.9)
+        for _ in range(3):
+            writer.write_object(self.gerber.to_dict(), ['solid_geometry'])
+        writer.close()
+        self.f.seek(0)
+
+    def test_read(self):
+        d, objs = ProjectReader(self.f).read()
+        self.assertEqual(d["options"], {"units": "IN"})
+        self.assertEqual(d["version"], 8.9)
+
+        objs = list(objs)
+        self.assertEqual(len(objs), 3)
+        attrs, load = objs[2]
+        self.assertNotIn('solid_geometry', attrs)
+        self.assertEqual(attrs['apertures'].keys(), self.gerber.apertures.keys())
+        self.assertTrue(load()['solid_geometry'].equals_exact(self.gerber.solid_geometry, 0))
+
+    def test_verify(self):
+        self.assertEqual(ProjectReader(self.f).verify(), 3)
+
+    def test_corrupt(self):
+        data = bytearray(self.f.getvalue())
+        data[len(data) // 2] ^= 0xFF
+        with self.assertRaises(ValueError):
+            ProjectReader(BytesIO(bytes(data))).verify()
+
+    def test_truncated(self):
+        data = self.f.getvalue()
+        with self.assertRaises(ValueError):
+            ProjectReader(BytesIO(data[:-10])).verify()
+
+    def test_not_binary(self):
+        with self.assertRaises(ValueError):
+            ProjectReader(BytesIO(b'{"objs": []}'))
+
+
+class LazyJSONTestCase(unittest.TestCase):
+
+    def test_decode(self):
+        d = {"solid_geometry": [{"__class__": "Shply", "__inst__": "POINT (1 2)"}], "units": "IN"}
+        attrs, geometry = split_attrs(d, ['solid_geometry'])
+        self.assertEqual(attrs, {"units": "IN"})
+        self.assertEqual(decode_json(geometry)['solid_geometry'][0].coords[0], (1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
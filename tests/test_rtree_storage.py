@@ -0,0 +1,96 @@
+import unittest
+
+from shapely.geometry import LineString, Point, box
+
+from camlib import FlatCAMRTree, FlatCAMRTreeStorage
+
+
+class HitTestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = FlatCAMRTreeStorage()
+        self.storage.get_points = lambda geo: getattr(geo, 'exterior', geo).coords
+        self.long_line = LineString([(0, 0), (100, 0)])
+        self.square = box(-1, -1, 1, 1)
+        self.cross = LineString([(50, -10), (50, 10)])
+        for geo in (self.long_line, self.square, self.cross):
+            self.storage.insert(geo)
+
+    def test_distance_to_geometry(self):
+        # Far from every indexed endpoint, but on the line.
+        self.assertEqual(self.storage.hit_test((30, 0.05), 0.1), [self.long_line])
+        self.assertEqual(self.storage.hit_test((30, 0.5), 0.1), [])
+
+        # Polygons are hit by their outline.
+        self.assertEqual(self.storage.hit_test((0.5, 0.95), 0.1), [self.square])
+        self.assertEqual(self.storage.hit_test((0.5, 0.5), 0.1), [])
+
+    def test_nearest_first(self):
+        self.assertEqual(self.storage.hit_test((50.05, 0.08), 0.1), [self.cross, self.long_line])
+        self.assertEqual(self.storage.hit_test((50.05, 0.08), 0.1, k=1), [self.cross])
+
+    def test_insert_remove(self):
+        self.storage.hit_test((0, 0), 0.1)
+
+        line = LineString([(0, 5), (10, 5)])
+        self.storage.insert(line)
+        self.assertEqual(self.storage.hit_test((5, 5), 0.1), [line])
+
+        self.storage.remove(line)
+        self.storage.remove(self.cross)
+        self.assertEqual(self.storage.hit_test((5, 5), 0.1), [])
+        self.assertEqual(self.storage.hit_test((50, 0), 0.1), [self.long_line])
+
+    def test_get_geometry(self):
+        class Shape:
+            def __init__(self, geo):
+                self.geo = geo
+
+        storage = FlatCAMRTreeStorage()
+        storage.get_points = lambda shape: [pt for geo in shape.geo for pt in geo.coords]
+        storage.get_geometry = lambda shape: shape.geo
+        shape = Shape([LineString([(0, 0), (1, 0)]), LineString([(0, 3), (1, 3)])])
+        storage.insert(shape)
+        self.assertEqual(storage.hit_test((0.5, 3), 0.1), [shape])
+        self.assertEqual(storage.hit_test((0.5, 1.5), 0.1), [])
+        self.assertEqual(storage.hit_test(Point(0.5, 0).coords[0], 0.1), [shape])
+
+
+class BulkStorageTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.paths = [LineString([(i, 0), (i, 0.5), (i + 0.5, 1)]) for i in range(10)]
+        self.storage = FlatCAMRTreeStorage(self.paths, get_points=FlatCAMRTree.get_endpoints)
+
+    def test_bulk_load(self):
+        self.assertEqual(self.storage.nindexed, 20)
+        pt, geo = self.storage.nearest((3.6, 1.1))
+        self.assertEqual(pt, (3.5, 1.0))
+        self.assertIs(geo, self.paths[3])
+
+        # Indexing by other points than the endpoints
+        storage = FlatCAMRTreeStorage(self.paths)
+        self.assertEqual(storage.nindexed, 30)
+        self.assertEqual(storage.nearest((2.1, 0.4)), ((2.0, 0.5), self.paths[2]))
+
+    def test_remove(self):
+        self.storage.remove(self.paths[3])
+        self.assertIs(self.storage.nearest((3.6, 1.1))[1], self.paths[4])
+
+        for path in self.paths[4:]:
+            self.storage.remove(path)
+        self.assertIs(self.storage.nearest((3.6, 1.1))[1], self.paths[2])
+        self.assertEqual(self.storage.nindexed, 6)
+        self.assertEqual(list(self.storage.get_objects()), self.paths[:3])
+
+        # Inserted after a bulk removal
+        self.storage.insert(self.paths[9])
+        self.assertIs(self.storage.nearest((12, 1))[1], self.paths[9])
+
+        for path in self.paths[:3] + [self.paths[9]]:
+            self.storage.remove(path)
+        self.assertRaises(StopIteration, self.storage.nearest, (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
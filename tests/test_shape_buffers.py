@@ -0,0 +1,173 @@
+import unittest
+
+import numpy as np
+from shapely import affinity
+from shapely.geometry import LineString, MultiPolygon, Point, Polygon, box
+
+from camlib import rotation_matrix, scale_matrix, skew_matrix
+from VisPyVisuals import _update_shape_buffers, _update_shapes_buffers, _transform_buffers, VertexArena
+from VisPyTesselators import triangulate_polygons
+
+
+class ShapeBuffersTestCase(unittest.TestCase):
+
+    def buffers(self, geometry, face_color='#FF000080'):
+        return _update_shape_buffers({'geometry': geometry, 'color': '#000000FF', 'face_color': face_color,
+                                      'tolerance': None})
+
+    def test_linestring(self):
+        data = self.buffers(LineString([(0, 0), (1, 0), (1, 1)]))
+        np.testing.assert_array_equal(data['line_pts'], [[0, 0], [1, 0], [1, 0], [1, 1]])
+        self.assertEqual(data['line_colors'].shape, (4, 4))
+        self.assertEqual(len(data['mesh_tris']), 0)
+        self.assertNotIn('geometry', data)
+
+    def test_polygon(self):
+        polygon = Point(0, 0).buffer(2, 4).difference(Point(0, 0).buffer(1, 4))
+        data = self.buffers(polygon)
+        vertices, tris = data['mesh_vertices'], data['mesh_tris']
+        self.assertEqual(tris.shape[1], 3)
+        self.assertLess(tris.max(), len(vertices))
+        self.assertEqual(len(data['mesh_colors']), len(vertices))
+
+        # Triangles cover the polygon, not the hole.
+        area = sum(Polygon(vertices[t]).area for t in tris)
+        self.assertAlmostEqual(area, polygon.area, places=4)
+
+        # Exterior and interior edges.
+        self.assertEqual(len(data['line_pts']), 2 * (len(polygon.exterior.coords) - 1 +
+                                                      len(polygon.interiors[0].coords) - 1))
+
+    def test_no_face(self):
+        data = self.buffers(Point(0, 0).buffer(1, 4), face_color=None)
+        self.assertEqual(len(data['mesh_vertices']), 0)
+        self.assertTrue(len(data['line_pts']) > 0)
+
+    def test_batch(self):
+        shapes = [Point(0, 0).buffer(1), None, MultiPolygon([box(0, 0, 1, 1), box(2, 0, 3, 1)]),
+                  LineString([(0, 0), (1, 1)])]
+        datas = _update_shapes_buffers([{'geometry': s, 'color': 'black', 'face_color': 'red', 'tolerance': 0.01}
+                                        for s in shapes])
+        self.assertEqual([len(d['mesh_tris']) for d in datas[1:]], [0, 4, 0])
+        self.assertEqual([len(d['line_pts']) for d in datas[1:]], [0, 16, 2])
+        self.assertTrue(len(datas[0]['mesh_tris']) > 0)
+
+    def test_lod(self):
+        circle = Point(0, 0).buffer(10, 64)
+        data, = _update_shapes_buffers([{'geometry': circle, 'color': 'black', 'face_color': 'red',
+                                         'tolerance': 0.001}], lods=(8, 64, 512))
+        self.assertEqual(data['bounds'], circle.bounds)
+
+        # Coarser levels have fewer edges
+        counts = [len(d['line_pts']) for d in [data] + data['lod']]
+        self.assertEqual(len(counts), 4)
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertLess(counts[-1], counts[0])
+
+    def test_transform(self):
+        shape = box(0, 0, 4, 2).difference(box(1, 0.5, 2, 1.5))
+        data, = _update_shapes_buffers([{'geometry': shape, 'color': 'black', 'face_color': 'red',
+                                         'tolerance': 0.001}], lods=(8, ))
+        tris = data['mesh_tris'].copy()
+
+        for matrix, move in [(rotation_matrix(30, (1, 1)), lambda g: affinity.rotate(g, 30, origin=(1, 1))),
+                             (scale_matrix(-1, 1, (2, 0)), lambda g: affinity.scale(g, -1, 1, origin=(2, 0))),
+                             (skew_matrix(10, 0, (0, 0)), lambda g: affinity.skew(g, 10, 0, origin=(0, 0)))]:
+            _transform_buffers([data], matrix)
+            shape = move(shape)
+            # Bounds of moved bounding box hold the shape
+            self.assertTrue(np.all(np.array(data['bounds'][:2]) <= np.array(shape.bounds[:2]) + 1e-5))
+            self.assertTrue(np.all(np.array(data['bounds'][2:]) >= np.array(shape.bounds[2:]) - 1e-5))
+            expected = self.buffers(shape)
+            self.assertEqual(sorted(map(tuple, np.round(data['line_pts'], 4).tolist())),
+                             sorted(map(tuple, np.round(expected['line_pts'], 4).tolist())))
+            self.assertAlmostEqual(triangles_area(data['mesh_vertices'], data['mesh_tris']), shape.area, 4)
+
+        # Triangulation is kept, levels of detail move too
+        np.testing.assert_array_equal(data['mesh_tris'], tris)
+        np.testing.assert_allclose(data['lod'][0]['line_pts'].max(axis=0), data['line_pts'].max(axis=0), atol=1e-5)
+
+
+def triangles_area(vertices, tris):
+    a, b, c = vertices[tris[:, 0]], vertices[tris[:, 1]], vertices[tris[:, 2]]
+    return 0.5 * np.abs(np.cross(b - a, c - a)).sum()
+
+
+class TriangulatePolygonsTestCase(unittest.TestCase):
+
+    def test_area(self):
+        polygons = [Point(0, 0).buffer(2, 8),                                   # Convex
+                    box(0, 0, 3, 1),                                            # Convex, reversed
+                    Polygon([(0, 0), (2, 0), (2, 2), (1, 1), (0, 2)]),          # Concave
+                    Point(0, 0).buffer(2, 8).difference(box(-1, -1, 1, 1)),     # Hole
+                    LineString([(0, 0), (1, 0), (1, 1)]).buffer(0.1)]
+        results = triangulate_polygons(polygons)
+        self.assertEqual(len(results), len(polygons))
+        for polygon, (vertices, tris) in zip(polygons, results):
+            self.assertEqual(tris.dtype, np.uint32)
+            self.assertLess(tris.max(), len(vertices))
+            self.assertAlmostEqual(triangles_area(vertices, tris), polygon.area, places=4)
+
+    def test_fan(self):
+        (vertices, tris), = triangulate_polygons([box(0, 0, 1, 1)])
+        self.assertEqual(len(vertices), 4)
+        self.assertEqual(len(tris), 2)
+
+    def test_empty(self):
+        self.assertEqual(triangulate_polygons([]), [])
+        (vertices, tris), = triangulate_polygons([Polygon()])
+        self.assertEqual(len(vertices), 0)
+        self.assertEqual(len(tris), 0)
+
+
+class VertexArenaTestCase(unittest.TestCase):
+
+    @staticmethod
+    def square(x, size=1):
+        vertices = np.array([[x, 0], [x + size, 0], [x + size, size], [x, size]], dtype=np.float32)
+        colors = np.ones((4, 4), dtype=np.float32)
+        tris = np.array([[0, 1, 2], [0, 2, 3]], dtype=np.uint32)
+        return vertices, colors, tris
+
+    def test_add(self):
+        arena = VertexArena(3, capacity=4)
+        slots = arena.add([self.square(0), self.square(2)])
+        self.assertEqual(slots, [(1, 4, 0, 2), (5, 4, 2, 2)])
+        self.assertTrue(arena.resized)
+        np.testing.assert_array_equal(arena.indices[2:4], [[5, 6, 7], [5, 7, 8]])
+        self.assertEqual(arena.bounds(0), (0, 3))
+
+    def test_remove_reuses_ranges(self):
+        arena = VertexArena(3)
+        slots = arena.add([self.square(0), self.square(2), self.square(4)])
+        arena.resized = False
+        arena.take_ranges(arena.dirty_vertices)
+        arena.take_ranges(arena.dirty_indices)
+
+        arena.remove(slots[1])
+        self.assertEqual(arena.bounds(0), (0, 5))
+        self.assertFalse(arena.indices[2:4].any())
+        # Removed and unused primitives are at a NaN vertex, not drawn
+        self.assertTrue(np.isnan(arena.vertices[arena.indices[2:4]]).all())
+        self.assertTrue(np.isnan(arena.vertices[arena.indices[6:]]).all())
+
+        # New shape takes the freed ranges, only they are uploaded
+        slot, = arena.add([self.square(10)])
+        self.assertEqual(slot, slots[1])
+        self.assertFalse(arena.resized)
+        self.assertEqual(arena.take_ranges(arena.dirty_vertices), [[5, 9]])
+        self.assertEqual(arena.take_ranges(arena.dirty_indices), [[2, 4]])
+        self.assertEqual(arena.bounds(0), (0, 11))
+
+    def test_remove_all(self):
+        arena = VertexArena(2)
+        slots = arena.add([self.square(0)[:2] + (np.array([[0, 1], [2, 3]], dtype=np.uint32),)] * 3)
+        for slot in [slots[1], slots[0], slots[2]]:
+            arena.remove(slot)
+        self.assertTrue(arena.empty)
+        self.assertIsNone(arena.bounds(1))
+        self.assertEqual(arena.add([self.square(0)[:2] + (np.array([[0, 1]], dtype=np.uint32),)]), [(1, 4, 0, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
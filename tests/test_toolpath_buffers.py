@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+from shapely.geometry import LineString, Point
+
+from VisPyVisuals import _toolpath_buffers, ToolpathCollectionVisual
+
+
+class ToolpathBuffersTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # Two paths, a travel (layer 1) and a cut (layer 0).
+        self.coords = np.array([[0, 0], [1, 0], [1, 0], [1, 1], [2, 1]], dtype=float)
+        self.index = np.array([0, 0, 1, 1, 1])
+        self.layers = np.array([1, 0])
+        self.colors = [(0, 0, 1, 1), (1, 1, 0, 0.3)]
+        self.face_colors = [(0, 0, 0.5, 1), (0.5, 0.5, 0, 0.3)]
+
+    def test_lines(self):
+        b = _toolpath_buffers(self.coords, self.index, self.layers, 0, self.colors, self.face_colors)
+        self.assertEqual(len(b['mesh_tris']), 0)
+        # Cut segments first.
+        np.testing.assert_array_equal(b['line_pts'], [[1, 0], [1, 1], [1, 1], [2, 1], [0, 0], [1, 0]])
+        np.testing.assert_array_equal(b['line_colors'][:, 3], np.float32([1, 1, 1, 1, 0.3, 0.3]))
+
+    def test_width(self):
+        width = 0.2
+        b = _toolpath_buffers(self.coords, self.index, self.layers, width, self.colors, self.face_colors)
+        vertices, tris = b['mesh_vertices'], b['mesh_tris']
+        self.assertEqual(len(vertices), len(b['mesh_colors']))
+        self.assertLess(tris.max(), len(vertices))
+
+        # Everything within the exact buffer of the paths.
+        exact = LineString(self.coords).buffer(width / 2 + 1e-6)
+        for v in vertices:
+            self.assertTrue(exact.contains(Point(v)))
+
+        # Covers the paths and the width around them.
+        covered = [tuple(v) for v in vertices]
+        self.assertIn((1.0, np.float32(0.1)), covered)
+        self.assertIn((np.float32(0.9), 1.0), covered)
+
+        # Cut triangles are drawn first.
+        alpha = b['mesh_colors'][tris[:, 0], 3]
+        self.assertTrue((np.diff(alpha) <= 0).all())
+
+    def test_single_fill(self):
+        b = _toolpath_buffers(self.coords, self.index, self.layers, 0.2, self.colors, self.face_colors)
+        vertices, tris = b['mesh_vertices'].astype(float), b['mesh_tris']
+        depth = b['mesh_depth'][tris[:, 0]]
+        pts = np.mgrid[-0.2:2.2:0.013, -0.2:1.2:0.013].reshape(2, -1).T
+
+        # inside[t, i]: point i is inside triangle t
+        corners = vertices[tris]
+        edges = [np.cross((q - p)[:, None, :], pts[None, :, :] - p[:, None, :])
+                 for p, q in ((corners[:, 0], corners[:, 1]), (corners[:, 1], corners[:, 2]),
+                              (corners[:, 2], corners[:, 0]))]
+        inside = (np.all([e > 1e-9 for e in edges], axis=0) | np.all([e < -1e-9 for e in edges], axis=0))
+
+        # The quads and joins of the cut overlap at its bend.
+        cut = depth == depth.max()
+        self.assertTrue((inside[cut].sum(axis=0) > 1).any())
+
+        # Drawn with depth_func 'less', every layer writes a point once.
+        layers = np.unique(depth)
+        writes = np.zeros((len(layers), len(pts)), dtype=int)
+        buffer = np.full(len(pts), np.inf)
+        for t in range(len(tris)):
+            passed = inside[t] & (depth[t] < buffer)
+            buffer[passed] = depth[t]
+            writes[np.searchsorted(layers, depth[t]), passed] += 1
+        for layer, layer_writes in zip(layers, writes):
+            np.testing.assert_array_equal(layer_writes, inside[depth == layer].any(axis=0))
+
+        state = ToolpathCollectionVisual()._mesh._vshare.gl_state
+        self.assertTrue(state['depth_test'])
+        self.assertEqual(state['depth_func'], 'less')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from shapely import affinity
+from shapely.geometry import LineString, Point, Polygon
+
+import camlib
+from camlib import transform_geometry, translation_matrix, scale_matrix, rotation_matrix, skew_matrix, \
+    tile_geometry, grid_offsets
+
+
+class TransformGeometryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.square = Polygon([(0, 0), (2, 0), (2, 2), (0, 2)], [[(0.5, 0.5), (1, 0.5), (1, 1)]])
+        self.line = LineString([(0, 0), (3, 1), (4, 5)])
+        self.point = Point(1, 2)
+
+    def test_matrices(self):
+        for matrix, transform in [(translation_matrix(2, -3), lambda g: affinity.translate(g, 2, -3)),
+                                  (scale_matrix(2, -1, (1, 1)), lambda g: affinity.scale(g, 2, -1, origin=(1, 1))),
+                                  (rotation_matrix(37, (2, 1)), lambda g: affinity.rotate(g, 37, origin=(2, 1))),
+                                  (skew_matrix(10, 20, (1, 0)), lambda g: affinity.skew(g, 10, 20, origin=(1, 0)))]:
+            for geom in (self.square, self.line, self.point):
+                self.assertTrue(transform_geometry(geom, matrix).equals_exact(transform(geom), 1e-9))
+
+    def test_nested(self):
+        geometry = [self.square, [self.line, [self.point, None]], []]
+        moved = transform_geometry(geometry, translation_matrix(1, 1))
+
+        self.assertEqual(len(moved), 3)
+        self.assertEqual(moved[2], [])
+        self.assertIsNone(moved[1][1][1])
+        self.assertTrue(moved[1][1][0].equals(Point(2, 3)))
+        self.assertTrue(moved[1][0].equals(affinity.translate(self.line, 1, 1)))
+        # Interiors are kept
+        self.assertEqual(len(moved[0].interiors), 1)
+
+    def test_empty(self):
+        self.assertEqual(transform_geometry([], translation_matrix(1, 1)), [])
+
+    def test_tile(self):
+        offsets = grid_offsets(2, 3, 5, 10)
+        self.assertEqual(offsets, [[0, 0], [5, 0], [10, 0], [0, 10], [5, 10], [10, 10]])
+
+        copies = tile_geometry([self.square, [self.line, None]], offsets)
+        self.assertEqual(len(copies), 6)
+        for (dx, dy), copy in zip(offsets, copies):
+            self.assertTrue(copy[0].equals(affinity.translate(self.square, dx, dy)))
+            self.assertTrue(copy[1][0].equals(affinity.translate(self.line, dx, dy)))
+            self.assertIsNone(copy[1][1])
+        # The source is left as it was
+        self.assertEqual(self.square.bounds, (0, 0, 2, 2))
+
+    def test_instances(self):
+        geometry = camlib.Geometry()
+        geometry.multigeo = False
+        geometry.solid_geometry = [self.square]
+        geometry.instances = [[0, 0], [10, 0]]
+        self.assertEqual(geometry.bounds(), (0, 0, 12, 2))
+
+        # Transforming the source moves the instances along
+        matrix = rotation_matrix(90, (1, 1))
+        geometry.solid_geometry = transform_geometry(geometry.solid_geometry, matrix)
+        geometry.transform_instances(matrix)
+        expected = transform_geometry(tile_geometry([self.square], [[0, 0], [10, 0]]), matrix)
+        for copy, other in zip(geometry.instanced(geometry.solid_geometry), expected):
+            self.assertTrue(copy[0].equals_exact(other[0], 1e-9))
+
+        paths = [self.line]
+        moved = list(camlib.CNCjob.instance_paths(paths, [[0, 0], [1, 2]]))
+        self.assertEqual(len(moved), 2)
+        self.assertTrue(moved[1].equals(affinity.translate(self.line, 1, 2)))
+
+
+class ExcellonTransformTestCase(unittest.TestCase):
+
+    def test_mirror_drills_and_slots(self):
+        excellon = camlib.Excellon()
+        excellon.tools = {'1': {'C': 0.5}}
+        excellon.drills = [{'point': Point(1, 1), 'tool': '1'}, {'point': Point(3, 2), 'tool': '1'}]
+        excellon.slots = [{'start': Point(0, 0), 'stop': Point(0, 4), 'tool': '1'}]
+
+        excellon.mirror('Y', (2, 0))
+
+        self.assertEqual([d['point'].coords[0] for d in excellon.drills], [(3, 1), (1, 2)])
+        self.assertEqual(excellon.slots[0]['start'].coords[0], (4, 0))
+        self.assertEqual(excellon.slots[0]['stop'].coords[0], (4, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()